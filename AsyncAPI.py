@@ -0,0 +1,218 @@
+"""
+Author: Rosenyoung
+This module is an asyncio facade of DataAPI and Orders.
+
+The ibapi callbacks still arrive on the one reader thread of each client. They are handed to the event loop by
+loop.call_soon_threadsafe, so requests and waits are plain futures: any number of them can be pending at the
+same time without a thread each.
+
+    async def main():
+        data_api = await AsyncDataAPI.create(['EUR', 'GBP'], 'FX')
+        order_api = await AsyncOrders.create('FX')
+        await data_api.request_historical_bar()
+        data_api.start_realtime_bars()
+        async for bar in data_api.bars(['EUR']):
+            handle = await order_api.place_orders('EUR', 'MKT', 'buy', 100000, timeout=10)
+
+    asyncio.run(main())
+
+Database reads and writes are blocking and run in the default executor of the loop.
+
+Version 1.0 2026-10-18
+Version 1.1 2026-10-18
+A cancelled historical_bars future, e.g. by the timeout of request_historical_bar, cancels its TWS request.
+"""
+
+import asyncio
+
+import pandas as pd
+
+from DataAPI import DataAPI
+from DataBaseConn import BAR_COLUMNS
+from Orders import Orders
+from OrderHandle import TERMINAL_STATUSES
+
+from loguru import logger
+
+
+def _resolve(future, result=None, exception=None):
+    # Runs on the event loop, the future may have been cancelled meanwhile
+    if future.done():
+        return
+    if exception is not None:
+        future.set_exception(exception)
+    else:
+        future.set_result(result)
+
+
+def _put_nowait(bar_queue, item):
+    try:
+        bar_queue.put_nowait(item)
+    except asyncio.QueueFull:
+        logger.warning(f"Async subscriber queue is full, {item} dropped")
+
+
+async def _wait_connected(client, timeout):
+    # Wait for nextValidId, once per client
+    loop = asyncio.get_running_loop()
+    if not await loop.run_in_executor(None, client.control.wait, timeout):
+        raise TimeoutError(f"No nextValidId from TWS within {timeout} seconds")
+
+
+class AsyncDataAPI:
+    def __init__(self, data_api: DataAPI, loop: asyncio.AbstractEventLoop = None):
+        """
+        data_api: DataAPI - Connected client, its callbacks are bridged onto loop
+        loop - The running loop if None
+        """
+        self.api = data_api
+        self.loop = loop if loop is not None else asyncio.get_running_loop()
+
+    @classmethod
+    async def create(cls, symbol, contract_type, timeout: float = 30, **kwargs):
+        # Connect a new DataAPI and wait for nextValidId. kwargs are passed to DataAPI, e.g. client_id, port
+        data_api = DataAPI(symbol, contract_type, **kwargs)
+        await _wait_connected(data_api, timeout)
+        return cls(data_api)
+
+    def historical_bars(self, symbol: str, duration: int, end_date_time: str = '') -> asyncio.Future:
+        """
+        Request duration seconds of 5 seconds bars of symbol, without saving them.
+        return a future of a DataFrame with the columns of fivesecondbar, it raises ConnectionError
+        with the TWS error code and message if the request fails. Cancelling the future cancels the request.
+        Raise ValueError at once if symbol is not a symbol of the DataAPI.
+        """
+        future = self.loop.create_future()
+
+        def done(bars, error):
+            if error is not None:
+                self.loop.call_soon_threadsafe(_resolve, future, None,
+                                               ConnectionError(f"Historical request of {symbol} failed: {error}"))
+                return
+            df = pd.DataFrame(bars, columns=BAR_COLUMNS)
+            df['DateTime'] = df['DateTime'].astype(int)
+            self.loop.call_soon_threadsafe(_resolve, future, df)
+
+        req_id = self.api.request_historical(symbol, duration, end_date_time, callback=done)
+        # A future given up by the caller, e.g. by wait_for, leaves no pending request behind
+        future.add_done_callback(lambda f: self.api.cancel_historical(req_id) if f.cancelled() else None)
+        return future
+
+    async def request_historical_bar(self, symbols=None, timeout: float = 60) -> int:
+        """
+        Async DataAPI.request_historical_bar + historical_to_database: request the bars missing since the last
+        stored bar of every symbol, concurrently, and save them. Failed requests are logged and skipped.
+        Only the bars of this call are saved, self.api.data is not used.
+        Raise asyncio.TimeoutError after timeout seconds, the requests still pending are cancelled.
+        return the number of bars inserted
+        """
+        symbols = self.api.symbols if symbols is None else symbols
+        await self.loop.run_in_executor(None, self.api.cal_duration, symbols)
+        durations = self.api.durations()
+        results = await asyncio.wait_for(
+            asyncio.gather(*(self.historical_bars(symbol, durations[symbol]) for symbol in symbols),
+                           return_exceptions=True), timeout)
+        bars = []
+        for symbol, result in zip(symbols, results):
+            if isinstance(result, Exception):
+                logger.warning(f"{result}")
+            else:
+                bars.extend(result.values.tolist())
+        return await self.loop.run_in_executor(None, self.api.save_historical_bars, bars)
+
+    def start_realtime_bars(self, symbols=None) -> list:
+        # Request real-time bars of symbols, all symbols if None. Await request_historical_bar first.
+        return self.api.start_realtime_bars(symbols)
+
+    async def bars(self, symbols=None, maxsize: int = 0):
+        """
+        Async iterator of real-time bars (dicts with the columns of fivesecondbar), e.g.
+        async for bar in data_api.bars(['EUR']): ...
+        symbols: list - Only bars of these symbols, all symbols if None
+        maxsize: int - Bars are dropped if maxsize bars are waiting, 0 for unbounded
+        The subscription ends when the loop is left.
+        """
+        bar_queue = asyncio.Queue(maxsize)
+
+        def put(bar):
+            self.loop.call_soon_threadsafe(_put_nowait, bar_queue, bar)
+
+        self.api.subscribe(put, symbols=symbols)
+        try:
+            while True:
+                yield await bar_queue.get()
+        finally:
+            self.api.unsubscribe(put)
+
+
+class AsyncOrders:
+    def __init__(self, orders: Orders, loop: asyncio.AbstractEventLoop = None):
+        """
+        orders: Orders - Connected client, its order handles are bridged onto loop
+        loop - The running loop if None
+        """
+        self.api = orders
+        self.loop = loop if loop is not None else asyncio.get_running_loop()
+
+    @classmethod
+    async def create(cls, contract_type, timeout: float = 30, **kwargs):
+        # Connect a new Orders and wait for nextValidId. kwargs are passed to Orders, e.g. client_id, port
+        orders = Orders(contract_type, **kwargs)
+        await _wait_connected(orders, timeout)
+        return cls(orders)
+
+    def done(self, handle) -> asyncio.Future:
+        # Future of an OrderHandle, resolved with the handle when the order is filled, cancelled or rejected
+        future = self.loop.create_future()
+        handle.add_done_callback(lambda h: self.loop.call_soon_threadsafe(_resolve, future, h))
+        return future
+
+    async def wait(self, handle, timeout: float = None):
+        # Wait until the order is done and return its handle, raise asyncio.TimeoutError on timeout
+        return await asyncio.wait_for(asyncio.shield(self.done(handle)), timeout)
+
+    async def place_orders(self, symbol, order_type, action, amount, price=1.10000, wait: bool = True,
+                           timeout: float = None):
+        """
+        Place an order, see Orders.place_orders.
+        wait: bool - Return when the order is done, otherwise at once
+        return the OrderHandle
+        """
+        handle = self.api.place_orders(symbol, order_type, action, amount, price)
+        if wait:
+            await self.wait(handle, timeout)
+        return handle
+
+    async def place_basket(self, orders: list, wait: bool = True, timeout: float = None) -> list:
+        # Place many orders at once, see Orders.place_basket. Return the OrderHandles when all are done.
+        handles = self.api.place_basket(orders)
+        if wait:
+            await asyncio.wait_for(asyncio.gather(*(self.done(handle) for handle in handles)), timeout)
+        return handles
+
+    async def updates(self, handle):
+        """
+        Async iterator of the status and fill changes of an order, e.g.
+        async for handle in order_api.updates(handle): print(handle.status, handle.filled)
+        Ends after the order is done.
+        """
+        update_queue = asyncio.Queue()
+
+        def put(h):
+            finished = h.status in TERMINAL_STATUSES or h.error is not None
+            self.loop.call_soon_threadsafe(update_queue.put_nowait, finished)
+
+        handle.add_callback(put)
+        try:
+            while True:
+                finished = await update_queue.get()
+                yield handle
+                if finished:
+                    break
+        finally:
+            handle.remove_callback(put)
+
+    async def cancel(self, handle, timeout: float = None):
+        # Cancel an order and wait until it is done, return the handle
+        handle.cancel()
+        return await self.wait(handle, timeout)
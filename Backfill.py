@@ -0,0 +1,356 @@
+"""
+Author: Rosenyoung
+This module backfills 5 seconds bars of any date range for many contracts.
+
+A date range is split into windows small enough for one reqHistoricalData (1 hour for 5 seconds bars by default).
+Windows of different contracts are requested concurrently, while the IB pacing limits for historical data
+are respected:
+- no more than 60 requests in any 10 minutes
+- no more than 6 requests of the same contract in 2 seconds (5 are used to keep a margin)
+- no identical request within 15 seconds, failed windows are retried after 15 seconds
+Every window is written to fivesecondbar with INSERT IGNORE as soon as it completes, so a backfill can be
+stopped and started again without duplicated rows.
+
+The scheduler only needs a client with reqHistoricalData/cancelHistoricalData, and the wrapper must forward
+historicalData, historicalDataEnd and error of the reqIds the scheduler owns. DataAPI.backfill() does that.
+Any other object with the same methods, e.g. a fake client in tests, can be used instead of TWS.
+
+Version 1.0 2026-10-18
+"""
+
+import threading
+import time
+from collections import OrderedDict, deque
+
+from sqlalchemy import text
+
+from DataBaseConn import DataBaseConn, BAR_COLUMNS
+
+from loguru import logger
+
+
+class PacingLimiter:
+    def __init__(self, max_requests: int = 60, period: float = 600, contract_requests: int = 5,
+                 contract_period: float = 2, clock=time.monotonic):
+        """
+        max_requests: int - Max number of requests in any period seconds
+        contract_requests: int - Max number of requests of one contract in any contract_period seconds
+        clock - Function returning seconds, time.monotonic by default
+        """
+        self.max_requests = max_requests
+        self.period = period
+        self.contract_requests = contract_requests
+        self.contract_period = contract_period
+        self.clock = clock
+        self._requests = deque()
+        self._contract_requests = {}
+
+    def delay(self, symbol: str) -> float:
+        # Seconds to wait before a request of symbol is allowed, 0 if it is allowed now
+        now = self.clock()
+        while self._requests and now - self._requests[0] >= self.period:
+            self._requests.popleft()
+        history = self._contract_requests.setdefault(symbol, deque())
+        while history and now - history[0] >= self.contract_period:
+            history.popleft()
+
+        delay = 0.0
+        if len(self._requests) >= self.max_requests:
+            delay = self._requests[0] + self.period - now
+        if len(history) >= self.contract_requests:
+            delay = max(delay, history[0] + self.contract_period - now)
+        return delay
+
+    def record(self, symbol: str):
+        # Record a request sent now
+        now = self.clock()
+        self._requests.append(now)
+        self._contract_requests.setdefault(symbol, deque()).append(now)
+
+
+class BackfillWindow:
+    def __init__(self, symbol: str, start: int, end: int):
+        """
+        One historical request, bars with start <= DateTime < end
+        """
+        self.symbol = symbol
+        self.start = start
+        self.end = end
+        self.req_id = None
+        self.attempts = 0
+        self.sent_at = None
+        self.not_before = 0.0
+        self.bars = []
+
+
+class BackfillScheduler:
+    def __init__(self, client, contracts: dict, next_req_id, database_conn: DataBaseConn = None,
+                 window_seconds: int = 3600, bar_seconds: int = 5, max_in_flight: int = 10,
+                 what_to_show: str = 'MIDPOINT', use_rth: int = 1, max_attempts: int = 3,
+                 retry_delay: float = 15, request_timeout: float = 120, limiter: PacingLimiter = None,
+                 on_window_written=None):
+        """
+        client - EClient (e.g. DataAPI) used to send reqHistoricalData and cancelHistoricalData
+        contracts: dict - symbol -> Contract
+        next_req_id - Function returning a new reqId for every request
+        database_conn: DataBaseConn - Used to write the bars, a new one if None
+        window_seconds: int - Duration of one request, 3600 is the max for 5 seconds bars
+        max_in_flight: int - Max number of requests waiting for data at the same time
+        max_attempts: int - A window is given up after this number of failed requests
+        retry_delay: float - Seconds before a failed window is requested again, IB rejects identical requests
+                     within 15 seconds
+        request_timeout: float - A request without historicalDataEnd after this time is cancelled and retried
+        on_window_written - Function(symbol, start, end, bars) called after a window is written
+        """
+        self.client = client
+        self.contracts = contracts
+        self.next_req_id = next_req_id
+        self.database_conn = database_conn if database_conn is not None else DataBaseConn()
+        self.window_seconds = window_seconds
+        self.bar_seconds = bar_seconds
+        self.max_in_flight = max_in_flight
+        self.what_to_show = what_to_show
+        self.use_rth = use_rth
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.request_timeout = request_timeout
+        self.limiter = limiter if limiter is not None else PacingLimiter()
+        self.on_window_written = on_window_written
+
+        self.insert_sql = text(self.database_conn.insert_ignore_sql('fivesecondbar', BAR_COLUMNS))
+
+        self._condition = threading.Condition()
+        # symbol -> deque of windows waiting to be requested, symbols are served in turn
+        self._pending = OrderedDict()
+        # reqId -> window waiting for data
+        self._in_flight = {}
+        # windows which received historicalDataEnd and wait to be written
+        self._completed = deque()
+
+        self.windows_written = 0
+        self.windows_failed = 0
+        self.bars_written = 0
+
+    def add_range(self, symbol: str, start: int, end: int):
+        """
+        Schedule the bars of symbol with start <= DateTime < end (epoch seconds), split into windows
+        """
+        if symbol not in self.contracts:
+            raise Exception(f"No contract for {symbol}")
+        # Align the windows to the bar size
+        start = start - start % self.bar_seconds
+        with self._condition:
+            windows = self._pending.setdefault(symbol, deque())
+            while start < end:
+                window_end = min(start + self.window_seconds, end)
+                windows.append(BackfillWindow(symbol, start, window_end))
+                start = window_end
+            self._condition.notify_all()
+
+    def owns(self, reqId: int) -> bool:
+        with self._condition:
+            return reqId in self._in_flight
+
+    def on_bar(self, reqId: int, bar):
+        # historicalData forwarded by the wrapper
+        with self._condition:
+            window = self._in_flight.get(reqId)
+        if window is not None:
+            window.bars.append(bar)
+
+    def on_end(self, reqId: int):
+        # historicalDataEnd forwarded by the wrapper
+        with self._condition:
+            window = self._in_flight.pop(reqId, None)
+            if window is not None:
+                self._completed.append(window)
+                self._condition.notify_all()
+
+    def on_error(self, reqId: int, errorCode: int, errorString: str):
+        # error forwarded by the wrapper
+        with self._condition:
+            window = self._in_flight.pop(reqId, None)
+            if window is None:
+                return
+            if errorCode == 162 and 'returned no data' in errorString.lower():
+                # Nothing to backfill in this window, e.g. the market is closed
+                window.bars = []
+                self._completed.append(window)
+            else:
+                logger.warning(f"Backfill {window.symbol} {window.start}-{window.end} error {errorCode}: "
+                               f"{errorString}")
+                self._retry(window)
+            self._condition.notify_all()
+
+    def _retry(self, window):
+        # Must hold the condition
+        if window.attempts >= self.max_attempts:
+            logger.warning(f"Backfill {window.symbol} {window.start}-{window.end} given up after "
+                           f"{window.attempts} attempts")
+            self.windows_failed += 1
+            return
+        window.bars = []
+        window.not_before = time.monotonic() + self.retry_delay
+        self._pending.setdefault(window.symbol, deque()).append(window)
+
+    def _send(self, window):
+        window.req_id = self.next_req_id()
+        window.attempts += 1
+        window.sent_at = time.monotonic()
+        window.bars = []
+        self._in_flight[window.req_id] = window
+        self.limiter.record(window.symbol)
+        # endDateTime in UTC, the bars end at window.end
+        end_date_time = time.strftime('%Y%m%d-%H:%M:%S', time.gmtime(window.end))
+        self.client.reqHistoricalData(window.req_id, self.contracts[window.symbol], end_date_time,
+                                      f"{window.end - window.start} S", f"{self.bar_seconds} secs",
+                                      self.what_to_show, self.use_rth, 2, False, [])
+
+    def _dispatch(self) -> float:
+        """
+        Send as many windows as allowed. Must hold the condition.
+        return seconds until the next window may be sent, None if nothing is waiting
+        """
+        wait = None
+        now = time.monotonic()
+        for symbol in list(self._pending):
+            if len(self._in_flight) >= self.max_in_flight:
+                return wait
+            windows = self._pending[symbol]
+            if not windows:
+                del self._pending[symbol]
+                continue
+            delay = max(self.limiter.delay(symbol), windows[0].not_before - now)
+            if delay > 0:
+                wait = delay if wait is None else min(wait, delay)
+                continue
+            self._send(windows.popleft())
+            # Serve the other symbols before this one again
+            self._pending.move_to_end(symbol)
+            wait = 0.0
+        return wait
+
+    def _check_timeouts(self):
+        # Cancel and retry requests without an answer. Must hold the condition.
+        now = time.monotonic()
+        for req_id, window in list(self._in_flight.items()):
+            if now - window.sent_at > self.request_timeout:
+                del self._in_flight[req_id]
+                self.client.cancelHistoricalData(req_id)
+                logger.warning(f"Backfill {window.symbol} {window.start}-{window.end} timed out")
+                self._retry(window)
+
+    def _write(self, window):
+        # Write the bars of one window, INSERT IGNORE makes it idempotent
+        rows = []
+        for bar in window.bars:
+            date_time = int(bar.date)
+            if window.start <= date_time < window.end:
+                rows.append({'Contract': window.symbol, 'DateTime': date_time, 'Open': bar.open,
+                             'High': bar.high, 'Low': bar.low, 'Close': bar.close, 'Volume': int(bar.volume),
+                             'Average': float(bar.average), 'Count': bar.barCount})
+        if rows:
+            with self.database_conn.engine.begin() as conn:
+                conn.execute(self.insert_sql, rows)
+        self.windows_written += 1
+        self.bars_written += len(rows)
+        if self.on_window_written is not None:
+            self.on_window_written(window.symbol, window.start, window.end, rows)
+
+    def _done(self) -> bool:
+        return not self._in_flight and not self._completed and not any(self._pending.values())
+
+    def run(self, timeout: float = None) -> bool:
+        """
+        Request and write all scheduled windows, block until done.
+        Return False if timeout or if a window has been given up.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._condition:
+                self._check_timeouts()
+                wait = self._dispatch()
+                if self._done():
+                    return self.windows_failed == 0
+                if not self._completed:
+                    # Wake up for a callback, the next allowed request or a timeout check
+                    wait = 1.0 if wait is None else min(max(wait, 0.01), 1.0)
+                    self._condition.wait(wait)
+                completed = list(self._completed)
+                self._completed.clear()
+            for window in completed:
+                try:
+                    self._write(window)
+                except Exception as err:
+                    logger.warning("Error {} occured when writing backfill window {} {}-{}!".format(
+                        err, window.symbol, window.start, window.end))
+                    with self._condition:
+                        self._retry(window)
+            if deadline is not None and time.monotonic() > deadline:
+                logger.warning(f"Backfill timed out, progress: {self.progress()}")
+                return False
+
+    def progress(self) -> dict:
+        # Counters of the backfill
+        with self._condition:
+            return {
+                'pending': sum(len(windows) for windows in self._pending.values()),
+                'in_flight': len(self._in_flight),
+                'windows_written': self.windows_written,
+                'windows_failed': self.windows_failed,
+                'bars_written': self.bars_written,
+            }
+
+
+if __name__ == '__main__':
+    # Backfill 2 days of 2 symbols into a SQLite file with a fake client instead of TWS
+    import calendar
+    import os
+    import tempfile
+    from types import SimpleNamespace
+
+    class FakeHistoricalClient:
+        # Answers every request with one bar per 5 seconds from another thread, like the reader thread of TWS
+        scheduler = None
+
+        def reqHistoricalData(self, reqId, contract, endDateTime, durationStr, barSizeSetting, whatToShow,
+                              useRTH, formatDate, keepUpToDate, chartOptions):
+            end = calendar.timegm(time.strptime(endDateTime, '%Y%m%d-%H:%M:%S'))
+            start = end - int(durationStr.split()[0])
+
+            def answer():
+                for t in range(start, end, 5):
+                    self.scheduler.on_bar(reqId, SimpleNamespace(date=str(t), open=1.1, high=1.1, low=1.1,
+                                                                 close=1.1, volume=-1, average=1.1, barCount=0))
+                self.scheduler.on_end(reqId)
+            threading.Thread(target=answer).start()
+
+        def cancelHistoricalData(self, reqId):
+            pass
+
+    DataBaseConn.configure(url='sqlite:///' + os.path.join(tempfile.mkdtemp(), 'backfill.db'))
+    database_conn = DataBaseConn()
+    with database_conn.connection() as conn:
+        conn.cursor().execute("CREATE TABLE fivesecondbar (Contract TEXT, `DateTime` INTEGER, Open REAL, High REAL, "
+                              "Low REAL, Close REAL, Volume INTEGER, Average REAL, Count INTEGER, "
+                              "PRIMARY KEY (Contract, `DateTime`))")
+
+    client = FakeHistoricalClient()
+    req_ids = iter(range(1, 1000000))
+    # Pacing limits scaled down 100 times so the demo finishes in seconds
+    client.scheduler = BackfillScheduler(client, {'EUR': None, 'GBP': None}, lambda: next(req_ids), database_conn,
+                                         limiter=PacingLimiter(max_requests=60, period=6, contract_period=0.02))
+    end_time = int(time.time())
+    for symbol in ['EUR', 'GBP']:
+        client.scheduler.add_range(symbol, end_time - 2 * 86400, end_time)
+    start_time = time.perf_counter()
+    client.scheduler.run()
+    print(client.scheduler.progress(), f"{time.perf_counter() - start_time:.1f} s")
+    # A second run writes nothing new
+    for symbol in ['EUR', 'GBP']:
+        client.scheduler.add_range(symbol, end_time - 86400, end_time)
+    client.scheduler.run()
+    with database_conn.connection() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT Contract, COUNT(*) FROM fivesecondbar GROUP BY Contract")
+        print(cur.fetchall())
@@ -0,0 +1,147 @@
+"""
+Author: Rosenyoung
+This module keeps the latest 5 seconds bars of one contract in memory, in a fixed-size ring buffer.
+
+The bars live in one preallocated NumPy structured array with the columns of fivesecondbar (without Contract),
+so appending a bar is O(1) and does not allocate. The array is mirrored: every bar is written at position i and
+at i + capacity, which keeps the latest n bars contiguous, and window(n) returns them as a view without copying.
+
+A window stays valid until capacity - n more bars are appended, call copy() on it to keep it longer.
+Windows are read-only, ring.window(n)['Close'] is a strided view of the closes.
+
+Version 1.0 2026-10-18
+"""
+
+import threading
+
+import numpy as np
+import pandas as pd
+
+# One bar of the ring is a BAR_DTYPE record, the columns of fivesecondbar without Contract
+from DataBaseConn import BAR_COLUMNS, BAR_DTYPE, BAR_DTYPES, BAR_FIELDS
+
+
+def to_bar_array(bars) -> np.ndarray:
+    """
+    Convert bars to a structured array of BAR_DTYPE.
+    bars - DataFrame or list of dicts with the columns of fivesecondbar, or a structured array
+    """
+    if isinstance(bars, np.ndarray) and bars.dtype == BAR_DTYPE:
+        return bars
+    df = bars if isinstance(bars, pd.DataFrame) else pd.DataFrame(bars, columns=BAR_COLUMNS)
+    array = np.empty(len(df), dtype=BAR_DTYPE)
+    for field, dtype in BAR_DTYPES.items():
+        values = df[field].to_numpy()
+        if np.issubdtype(dtype, np.integer):
+            values = np.nan_to_num(values.astype(np.float64))
+        array[field] = values
+    return array
+
+
+class BarRing:
+    def __init__(self, capacity: int = 17280, symbol: str = None):
+        """
+        capacity: int - Max number of bars kept, 17280 is one day of 5 seconds bars
+        symbol: str - Contract of the bars, used by to_frame
+        """
+        if capacity < 1:
+            raise ValueError("capacity must be a positive integer")
+        self.capacity = capacity
+        self.symbol = symbol
+        self._buffer = np.zeros(2 * capacity, dtype=BAR_DTYPE)
+        # Number of bars appended since the start, the next bar is written at _count % capacity
+        self._count = 0
+        self._last_time = None
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return min(self._count, self.capacity)
+
+    @property
+    def last_time(self):
+        # DateTime of the latest bar, None if the ring is empty
+        return self._last_time
+
+    @property
+    def appended(self) -> int:
+        # Number of bars appended since the start, including the ones overwritten
+        return self._count
+
+    def append(self, bar: dict) -> bool:
+        """
+        Append one bar, a dict with the columns of fivesecondbar. Return False if the bar is not later than the
+        latest bar, so the ring stays in time order without duplicates. Used by DataAPI for every real-time bar.
+        """
+        date_time = int(bar['DateTime'])
+        record = tuple(bar[field] for field in BAR_FIELDS)
+        with self._lock:
+            if self._last_time is not None and date_time <= self._last_time:
+                return False
+            index = self._count % self.capacity
+            self._buffer[index] = record
+            self._buffer[index + self.capacity] = record
+            self._count += 1
+            self._last_time = date_time
+        return True
+
+    def extend(self, bars) -> int:
+        """
+        Append many bars in time order and return the number appended.
+        bars - DataFrame or list of dicts with the columns of fivesecondbar, or a structured array of BAR_DTYPE
+        Bars not later than the latest bar are skipped.
+        """
+        array = to_bar_array(bars)
+        if len(array) == 0:
+            return 0
+        array = array[np.argsort(array['DateTime'], kind='stable')]
+        keep = np.ones(len(array), dtype=bool)
+        keep[1:] = array['DateTime'][1:] != array['DateTime'][:-1]
+        with self._lock:
+            if self._last_time is not None:
+                keep &= array['DateTime'] > self._last_time
+            array = array[keep]
+            count = len(array)
+            if count == 0:
+                return 0
+            # Only the last capacity bars can be kept
+            written = array[-self.capacity:]
+            indexes = (self._count + count - len(written) + np.arange(len(written))) % self.capacity
+            self._buffer[indexes] = written
+            self._buffer[indexes + self.capacity] = written
+            self._count += count
+            self._last_time = int(array['DateTime'][-1])
+        return count
+
+    def window(self, n: int = None) -> np.ndarray:
+        # Read-only view of the latest n bars (all bars if None) in time order, nothing is copied
+        with self._lock:
+            length = min(self._count, self.capacity)
+            n = length if n is None else max(min(int(n), length), 0)
+            end = self._count % self.capacity + self.capacity
+            view = self._buffer[end - n:end]
+        view.flags.writeable = False
+        return view
+
+    def column(self, name: str, n: int = None) -> np.ndarray:
+        # Read-only view of one column of the latest n bars, e.g. ring.column('Close', 20)
+        return self.window(n)[name]
+
+    def latest(self) -> dict:
+        # The latest bar as a dict with the columns of fivesecondbar, None if the ring is empty
+        window = self.window(1)
+        if len(window) == 0:
+            return None
+        bar = {field: window[field][0].item() for field in BAR_FIELDS}
+        bar['Contract'] = self.symbol
+        return bar
+
+    def to_frame(self, n: int = None) -> pd.DataFrame:
+        # Copy of the latest n bars as a DataFrame with the columns of fivesecondbar
+        df = pd.DataFrame(self.window(n))
+        df.insert(0, 'Contract', self.symbol)
+        return df
+
+    def clear(self):
+        with self._lock:
+            self._count = 0
+            self._last_time = None
@@ -0,0 +1,274 @@
+"""
+Author: Rosenyoung
+This module is a local columnar store of 5 seconds bars, used alongside the mysql database.
+Every contract has its own directory, every column is an append-only binary file of one NumPy dtype:
+
+    barstore/EUR/DateTime.bin, Open.bin, High.bin, Low.bin, Close.bin, Volume.bin, Average.bin, Count.bin
+
+Bars are appended in time order. Reads map the files into memory, so a time-range slice is a view of the
+mapped files and nothing is copied until the data is used.
+
+Version 1.0 2026-10-18
+Version 1.1 2026-10-18
+Real-time bars are queued by put_bar and appended by a background thread, one write and one flush per column
+and symbol for every batch instead of eight writes and flushes per bar on the reader thread.
+"""
+
+import os
+import queue
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+from DataBaseConn import BAR_DTYPES
+
+from loguru import logger
+
+
+class BarStore:
+    def __init__(self, root: str = os.path.join('..', 'data', 'barstore'), max_queue: int = 100000,
+                 batch_size: int = 500, flush_interval: float = 1.0):
+        """
+        root: str - Directory of the store, created if it does not exist
+        max_queue: int - Max number of bars queued by put_bar, bars are dropped if the queue is full
+        batch_size: int - The appender thread appends as soon as this number of bars are queued
+        flush_interval: float - Max seconds a queued bar waits before it is appended
+        """
+        self.root = root
+        os.makedirs(self.root, exist_ok=True)
+
+        self._lock = threading.Lock()
+        # symbol -> number of bars stored
+        self._lengths = {}
+        # symbol -> last DateTime stored
+        self._last_times = {}
+        # symbol -> {column: file object opened for appending}
+        self._files = {}
+        # symbol -> (length, {column: np.memmap}), mapped by read() and mapped again when the store grows
+        self._maps = {}
+
+        # Bars queued by put_bar, appended in batches by the appender thread
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._stop = threading.Event()
+        self._bars_dropped = 0
+        self.thread = threading.Thread(target=self._run, name='BarStore-Appender', daemon=True)
+        self.thread.start()
+
+    def _path(self, symbol, column):
+        return os.path.join(self.root, symbol, column + '.bin')
+
+    def _open(self, symbol):
+        # Open the column files of a symbol for appending, repair columns left longer than others by a crash
+        if symbol in self._files:
+            return
+        os.makedirs(os.path.join(self.root, symbol), exist_ok=True)
+        length = self._stored_length(symbol)
+        files = {}
+        for column, dtype in BAR_DTYPES.items():
+            path = self._path(symbol, column)
+            size = length * np.dtype(dtype).itemsize
+            if os.path.exists(path) and os.path.getsize(path) != size:
+                logger.warning(f"BarStore column {path} is truncated to {length} bars")
+                os.truncate(path, size)
+            files[column] = open(path, 'ab')
+        self._files[symbol] = files
+        self._lengths[symbol] = length
+        self._last_times[symbol] = int(self._map(symbol, length)['DateTime'][-1]) if length > 0 else None
+
+    def _stored_length(self, symbol):
+        # Number of complete bars in the files, the shortest column decides
+        lengths = []
+        for column, dtype in BAR_DTYPES.items():
+            path = self._path(symbol, column)
+            size = os.path.getsize(path) if os.path.exists(path) else 0
+            lengths.append(size // np.dtype(dtype).itemsize)
+        return min(lengths)
+
+    def _map(self, symbol, length):
+        # Return memory maps of the first length bars of a symbol
+        cached = self._maps.get(symbol)
+        if cached is not None and cached[0] == length:
+            return cached[1]
+        if length == 0:
+            maps = {column: np.empty(0, dtype=dtype) for column, dtype in BAR_DTYPES.items()}
+        else:
+            maps = {column: np.memmap(self._path(symbol, column), dtype=dtype, mode='r', shape=(length,))
+                    for column, dtype in BAR_DTYPES.items()}
+        self._maps[symbol] = (length, maps)
+        return maps
+
+    def append(self, symbol: str, bars) -> int:
+        """
+        Append bars of one symbol and return the number of bars appended.
+        bars - DataFrame or list of dicts with the columns of fivesecondbar
+        Bars not later than the last stored bar are skipped, so the store stays sorted and without duplicates.
+        """
+        df = bars if isinstance(bars, pd.DataFrame) else pd.DataFrame(bars)
+        if len(df) == 0:
+            return 0
+        df = df.sort_values('DateTime')
+        date_time = df['DateTime'].to_numpy(dtype=np.int64)
+        with self._lock:
+            self._open(symbol)
+            last_time = self._last_times[symbol]
+            keep = np.ones(len(date_time), dtype=bool) if last_time is None else date_time > last_time
+            # Drop duplicated timestamps inside the new bars
+            keep[1:] &= date_time[1:] != date_time[:-1]
+            count = int(keep.sum())
+            if count == 0:
+                return 0
+            files = self._files[symbol]
+            for column, dtype in BAR_DTYPES.items():
+                values = df[column].to_numpy()[keep]
+                files[column].write(np.nan_to_num(values.astype(np.float64)).astype(dtype).tobytes())
+                files[column].flush()
+            self._lengths[symbol] += count
+            self._last_times[symbol] = int(date_time[keep][-1])
+        return count
+
+    def append_bar(self, bar: dict) -> bool:
+        """
+        Append one bar, a dict with the columns of fivesecondbar. Return False if the bar is not later than the
+        last stored bar. Used by DataAPI for every real-time bar.
+        """
+        symbol = bar['Contract']
+        with self._lock:
+            self._open(symbol)
+            last_time = self._last_times[symbol]
+            if last_time is not None and bar['DateTime'] <= last_time:
+                return False
+            files = self._files[symbol]
+            for column, dtype in BAR_DTYPES.items():
+                files[column].write(np.array([bar[column]], dtype=dtype).tobytes())
+                files[column].flush()
+            self._lengths[symbol] += 1
+            self._last_times[symbol] = int(bar['DateTime'])
+        return True
+
+    def put_bar(self, bar: dict) -> bool:
+        """
+        Queue one bar, a dict with the columns of fivesecondbar, without blocking. Used by DataAPI for every
+        real-time bar. The bar is readable after the appender thread appended it, see flush().
+        Return False if the bar is dropped because the queue is full.
+        """
+        try:
+            self._queue.put_nowait(bar)
+            return True
+        except queue.Full:
+            self._bars_dropped += 1
+            # Only log the first drop of every 1000 to keep the reader thread fast
+            if self._bars_dropped % 1000 == 1:
+                logger.warning(f"BarStore queue is full, {self._bars_dropped} bars dropped so far")
+            return False
+
+    def _collect(self):
+        # Block for the first bar, then collect until the batch is full or the batch deadline passed.
+        try:
+            batch = [self._queue.get(timeout=self.flush_interval)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while not (self._stop.is_set() and self._queue.empty()):
+            batch = self._collect()
+            if not batch:
+                continue
+            symbols = {}
+            for bar in batch:
+                symbols.setdefault(bar['Contract'], []).append(bar)
+            for symbol, bars in symbols.items():
+                try:
+                    self.append(symbol, bars)
+                except Exception as err:
+                    logger.warning("Error {} occured when BarStore appended {} bars of {}!".format(err, len(bars),
+                                                                                                 symbol))
+            for _ in batch:
+                self._queue.task_done()
+
+    def flush(self):
+        # Block until every bar queued by put_bar so far has been appended.
+        self._queue.join()
+
+    def stats(self) -> dict:
+        # Bars waiting in the queue of put_bar and bars dropped because it was full
+        return {'queue_depth': self._queue.qsize(), 'bars_dropped': self._bars_dropped}
+
+    def length(self, symbol: str) -> int:
+        # Number of bars stored for a symbol
+        with self._lock:
+            self._open(symbol)
+            return self._lengths[symbol]
+
+    def last_time(self, symbol: str):
+        # DateTime of the last stored bar, None if there is no bar
+        with self._lock:
+            self._open(symbol)
+            return self._last_times[symbol]
+
+    def read(self, symbol: str, start: int = None, end: int = None) -> dict:
+        """
+        Return the bars of a symbol whose DateTime is between start and end (both included, None for no limit)
+        as a dict of column -> array. The arrays are views of the memory-mapped files, nothing is copied.
+        """
+        with self._lock:
+            self._open(symbol)
+            maps = self._map(symbol, self._lengths[symbol])
+        date_time = maps['DateTime']
+        first = 0 if start is None else int(np.searchsorted(date_time, start, side='left'))
+        last = len(date_time) if end is None else int(np.searchsorted(date_time, end, side='right'))
+        return {column: values[first:last] for column, values in maps.items()}
+
+    def read_frame(self, symbol: str, start: int = None, end: int = None) -> pd.DataFrame:
+        """
+        Same as read() but return a DataFrame with the columns of fivesecondbar, like
+        DataBaseConn.read_historical_data. The data is copied into the DataFrame.
+        """
+        columns = self.read(symbol, start, end)
+        df = pd.DataFrame({column: np.array(values) for column, values in columns.items()})
+        df.insert(0, 'Contract', symbol)
+        return df
+
+    def read_last(self, symbol: str, length: int = 2880) -> dict:
+        # Return the last length bars as views, the same rows as DataBaseConn.read_historical_data(length, symbol)
+        with self._lock:
+            self._open(symbol)
+            maps = self._map(symbol, self._lengths[symbol])
+        return {column: values[-length:] if length > 0 else values[:0] for column, values in maps.items()}
+
+    def sync_from_database(self, symbol: str, database_conn) -> int:
+        """
+        Copy the bars of a symbol which are later than the last stored bar from the fivesecondbar table.
+        Return the number of bars appended.
+        """
+        last_time = self.last_time(symbol)
+        sql = text("SELECT * FROM fivesecondbar WHERE Contract = :symbol AND `DateTime` > :last_time "
+                   "ORDER BY `DateTime`")
+        params = {'symbol': symbol, 'last_time': -1 if last_time is None else last_time}
+        df = pd.read_sql_query(sql, database_conn.engine, params=params)
+        return self.append(symbol, df)
+
+    def close(self, timeout: float = None):
+        # Append the queued bars, stop the appender thread and close the files opened for appending
+        self._stop.set()
+        self.thread.join(timeout)
+        with self._lock:
+            for files in self._files.values():
+                for file in files.values():
+                    file.close()
+            self._files.clear()
+            self._maps.clear()
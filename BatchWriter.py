@@ -0,0 +1,194 @@
+"""
+Author: Rosenyoung
+This module provides a write-behind writer for the database.
+Rows are put into a bounded in-memory queue by the caller and a background thread flushes them to the database
+as multi-row inserts. The caller (usually the ibapi reader thread) never waits for a MySQL round-trip.
+
+A batch is flushed when batch_size rows are waiting or when flush_interval seconds passed since the first row of
+the batch arrived, whichever comes first. When the queue is full new rows are dropped and counted.
+
+Version 1.0 2026-10-18
+Version 1.1 2026-10-18
+Rows can carry their own statement. A batch is split into consecutive runs of the same statement, each run is
+one executemany, and the whole batch is one transaction with one commit.
+Version 1.2 2026-10-18
+An on_flush hook is called with the rows of every committed batch, e.g. to maintain the coverage index.
+Version 1.3 2026-10-18
+Upsert rows can be coalesced by key: within a batch only the last row of every key is written, e.g. the open
+rollup bar which is updated by every real-time bar.
+The writer can be given a DataBaseConn instead of an engine, the current shared engine is used for every batch.
+"""
+
+import queue
+import threading
+import time
+
+from sqlalchemy import text
+
+from DataBaseConn import DataBaseConn
+
+from loguru import logger
+
+
+class BatchWriter:
+    def __init__(self, engine, statement: str = None, max_queue: int = 100000, batch_size: int = 500,
+                 flush_interval: float = 1.0, name: str = 'BatchWriter', on_flush=None, coalesce_key=None):
+        """
+        engine - The sqlalchemy engine used by the flusher thread, or a DataBaseConn whose shared engine is
+                 looked up for every batch, so DataBaseConn.configure takes effect
+        statement: str - Default parameterized statement, e.g. "INSERT IGNORE INTO t (A, B) VALUES (:A, :B)"
+        max_queue: int - Max number of rows waiting in memory, rows are dropped if the queue is full
+        batch_size: int - Flush as soon as this number of rows are waiting
+        flush_interval: float - Max seconds a row waits before it is flushed
+        name: str - Name of the flusher thread, used in logs
+        on_flush - Function(rows) called by the flusher thread with the row dicts of every committed batch
+        coalesce_key - Function(row) returning the primary key of a row. If given, only the last row of every
+                       statement and key in a batch is written. Use it only for statements which overwrite the
+                       whole row, e.g. an upsert of all columns.
+        """
+        self.engine = engine
+        self.statement = statement
+        # Statements are compiled once and reused, statement string -> sqlalchemy TextClause
+        self._compiled = {}
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.name = name
+        self.on_flush = on_flush
+        self.coalesce_key = coalesce_key
+
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._stop = threading.Event()
+        self._stats_lock = threading.Lock()
+
+        # Counters exposed by stats()
+        self._rows_written = 0
+        self._rows_failed = 0
+        self._rows_dropped = 0
+        self._rows_coalesced = 0
+        self._batches = 0
+        self._last_flush_ms = 0.0
+        self._max_flush_ms = 0.0
+        self._total_flush_ms = 0.0
+
+        self.thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self.thread.start()
+
+    def put(self, row: dict, statement: str = None) -> bool:
+        """
+        Queue one row without blocking. Return False if the row is dropped because the queue is full.
+        statement: str - Statement of this row, the default statement of the writer if None
+        Rows are written in the order they are put, whatever their statements are.
+        """
+        try:
+            self._queue.put_nowait((statement or self.statement, row))
+            return True
+        except queue.Full:
+            with self._stats_lock:
+                self._rows_dropped += 1
+                dropped = self._rows_dropped
+            # Only log the first drop of every 1000 to keep the reader thread fast
+            if dropped % 1000 == 1:
+                logger.warning(f"{self.name} queue is full, {dropped} rows dropped so far")
+            return False
+
+    def _collect(self):
+        # Block for the first row, then collect until the batch is full or the batch deadline passed.
+        try:
+            batch = [self._queue.get(timeout=self.flush_interval)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _compile(self, statement):
+        compiled = self._compiled.get(statement)
+        if compiled is None:
+            compiled = self._compiled[statement] = text(statement)
+        return compiled
+
+    def _write(self, batch):
+        start = time.perf_counter()
+        rows = batch
+        if self.coalesce_key is not None:
+            # A later row of the same key replaces the earlier one, at the position of the first
+            latest = {}
+            for statement, row in batch:
+                latest[(statement, self.coalesce_key(row))] = (statement, row)
+            rows = list(latest.values())
+        try:
+            engine = self.engine.engine if isinstance(self.engine, DataBaseConn) else self.engine
+            with engine.begin() as conn:
+                # One executemany for every run of rows sharing a statement, keep the order of the rows
+                run_start = 0
+                for i in range(1, len(rows) + 1):
+                    if i == len(rows) or rows[i][0] != rows[run_start][0]:
+                        conn.execute(self._compile(rows[run_start][0]), [row for _, row in rows[run_start:i]])
+                        run_start = i
+            written = True
+        except Exception as err:
+            written = False
+            logger.warning("Error {} occured when {} flushed {} rows!".format(err, self.name, len(batch)))
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+        with self._stats_lock:
+            self._batches += 1
+            self._last_flush_ms = elapsed_ms
+            self._max_flush_ms = max(self._max_flush_ms, elapsed_ms)
+            self._total_flush_ms += elapsed_ms
+            if written:
+                self._rows_written += len(batch)
+                self._rows_coalesced += len(batch) - len(rows)
+            else:
+                self._rows_failed += len(batch)
+
+        if written and self.on_flush is not None:
+            try:
+                self.on_flush([row for _, row in batch])
+            except Exception as err:
+                logger.warning("Error {} occured in the on_flush hook of {}!".format(err, self.name))
+
+    def _run(self):
+        while not (self._stop.is_set() and self._queue.empty()):
+            batch = self._collect()
+            if not batch:
+                continue
+            self._write(batch)
+            for _ in batch:
+                self._queue.task_done()
+
+    def flush(self):
+        # Block until every row queued so far has been written (or has failed).
+        self._queue.join()
+
+    def stats(self) -> dict:
+        """
+        Return the counters of the writer.
+        queue_depth - rows waiting in memory
+        rows_coalesced - rows written replaced by a later row of the same key, see coalesce_key
+        last/max/avg_flush_ms - latency of one multi-row insert including commit
+        """
+        with self._stats_lock:
+            return {
+                'queue_depth': self._queue.qsize(),
+                'rows_written': self._rows_written,
+                'rows_failed': self._rows_failed,
+                'rows_dropped': self._rows_dropped,
+                'rows_coalesced': self._rows_coalesced,
+                'batches': self._batches,
+                'last_flush_ms': self._last_flush_ms,
+                'max_flush_ms': self._max_flush_ms,
+                'avg_flush_ms': self._total_flush_ms / self._batches if self._batches else 0.0,
+            }
+
+    def close(self, timeout: float = None):
+        # Stop the flusher thread after the remaining rows are written.
+        self._stop.set()
+        self.thread.join(timeout)
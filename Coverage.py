@@ -0,0 +1,236 @@
+"""
+Author: Rosenyoung
+This module keeps an index of the time ranges already ingested into fivesecondbar.
+
+Every contract has a sorted list of disjoint intervals [StartTime, EndTime) in epoch seconds. A bar at DateTime t
+covers [t, t + 5), so consecutive 5 seconds bars merge into one interval and a missing bar leaves a hole.
+The index is updated in memory on every insert (BatchWriter on_flush, historical_to_database, backfill windows)
+and saved to the coverage table, so the missing ranges of a contract are found by a bisect over a few intervals
+instead of a scan of fivesecondbar.
+
+The coverage table only ever under-reports: intervals not saved yet when the process stops are simply requested
+again by the next backfill, and INSERT IGNORE skips the bars already stored.
+
+Version 1.0 2026-10-18
+"""
+
+import threading
+import time
+from bisect import bisect_left, bisect_right
+
+import numpy as np
+from sqlalchemy import text
+
+from DataBaseConn import DataBaseConn
+
+from loguru import logger
+
+LOAD_SQL = "SELECT Contract, StartTime, EndTime FROM coverage ORDER BY Contract, StartTime"
+LOAD_SYMBOLS_SQL = """
+    SELECT Contract, StartTime, EndTime FROM coverage
+    WHERE Contract IN ({})
+    ORDER BY Contract, StartTime
+"""
+# An interval absorbs the saved intervals which start inside it
+DELETE_SQL = "DELETE FROM coverage WHERE Contract = :Contract AND StartTime >= :StartTime AND StartTime <= :EndTime"
+DELETE_SYMBOL_SQL = "DELETE FROM coverage WHERE Contract = :Contract"
+BAR_TIMES_SQL = "SELECT `DateTime` FROM fivesecondbar WHERE Contract = :symbol ORDER BY `DateTime`"
+
+
+def bar_intervals(times, bar_seconds: int = 5) -> list:
+    """
+    Split bar times into contiguous intervals, return a list of (start, end) with end = last bar + bar_seconds
+    """
+    times = np.unique(np.asarray(times, dtype=np.int64))
+    if len(times) == 0:
+        return []
+    breaks = np.flatnonzero(np.diff(times) > bar_seconds) + 1
+    starts = times[np.concatenate([[0], breaks])]
+    ends = times[np.concatenate([breaks - 1, [len(times) - 1]])] + bar_seconds
+    return list(zip(starts.tolist(), ends.tolist()))
+
+
+class CoverageIndex:
+    def __init__(self, database_conn: DataBaseConn = None, bar_seconds: int = 5, save_interval: float = 10.0):
+        """
+        database_conn: DataBaseConn - Used to load and save the coverage table, a new one if None
+        bar_seconds: int - Duration of one bar
+        save_interval: float - on_rows_written saves the changed intervals at most once in this number of seconds
+        """
+        self.database_conn = database_conn if database_conn is not None else DataBaseConn()
+        self.bar_seconds = bar_seconds
+        self.save_interval = save_interval
+
+        # symbol -> ([starts], [ends]), sorted and disjoint
+        self._intervals = {}
+        # symbol -> set of times inside intervals changed since the last save
+        self._dirty = {}
+        self._last_save = time.monotonic()
+        self._lock = threading.Lock()
+        # Saves run one at a time, so an older interval never overwrites a newer one
+        self._save_lock = threading.Lock()
+
+        self.delete_sql = text(DELETE_SQL)
+        self.insert_sql = text(self.database_conn.insert_ignore_sql('coverage', ['Contract', 'StartTime',
+                                                                                  'EndTime']))
+
+    def add(self, symbol: str, start: int, end: int) -> tuple:
+        """
+        Mark [start, end) of symbol as ingested, merge it with the intervals it overlaps or touches.
+        return the merged interval
+        """
+        start, end = int(start), int(end)
+        if end <= start:
+            return start, end
+        with self._lock:
+            start, end = self._merge(symbol, start, end)
+            self._dirty.setdefault(symbol, set()).add(start)
+        return start, end
+
+    def _merge(self, symbol, start, end):
+        # Insert [start, end) into the intervals of symbol. Must hold the lock.
+        starts, ends = self._intervals.setdefault(symbol, ([], []))
+        first = bisect_left(ends, start)
+        last = bisect_right(starts, end)
+        if first < last:
+            start = min(start, starts[first])
+            end = max(end, ends[last - 1])
+        starts[first:last] = [start]
+        ends[first:last] = [end]
+        return start, end
+
+    def add_times(self, symbol: str, times):
+        # Mark the bars at these DateTimes as ingested
+        for start, end in bar_intervals(times, self.bar_seconds):
+            self.add(symbol, start, end)
+
+    def on_rows_written(self, rows: list):
+        """
+        on_flush hook of BatchWriter, rows are dicts with Contract and DateTime.
+        The changed intervals are saved at most once every save_interval seconds.
+        """
+        times = {}
+        for row in rows:
+            times.setdefault(row['Contract'], []).append(row['DateTime'])
+        for symbol, symbol_times in times.items():
+            self.add_times(symbol, symbol_times)
+        if time.monotonic() - self._last_save >= self.save_interval:
+            self.save()
+
+    def intervals(self, symbol: str) -> list:
+        # Ingested intervals of symbol, list of (start, end)
+        with self._lock:
+            starts, ends = self._intervals.get(symbol, ([], []))
+            return list(zip(starts, ends))
+
+    def covered(self, symbol: str, start: int, end: int) -> bool:
+        # True if [start, end) is ingested without a hole
+        return not self.gaps(symbol, start, end)
+
+    def gaps(self, symbol: str, start: int, end: int, min_gap: int = 0) -> list:
+        """
+        Missing ranges of symbol in [start, end), list of (start, end) in time order.
+        min_gap: int - Skip holes shorter than this number of seconds
+        """
+        result = []
+        with self._lock:
+            starts, ends = self._intervals.get(symbol, ([], []))
+            cursor = start
+            i = bisect_right(ends, start)
+            while i < len(starts) and starts[i] < end:
+                if starts[i] > cursor:
+                    result.append((cursor, starts[i]))
+                cursor = max(cursor, ends[i])
+                i += 1
+        if cursor < end:
+            result.append((cursor, end))
+        return [gap for gap in result if gap[1] - gap[0] >= min_gap]
+
+    def _take_dirty(self) -> list:
+        # Current intervals containing the changed times, rows of the coverage table. Must hold the lock.
+        rows = {}
+        for symbol, points in self._dirty.items():
+            starts, ends = self._intervals[symbol]
+            for point in points:
+                i = bisect_right(starts, point) - 1
+                rows[(symbol, starts[i])] = {'Contract': symbol, 'StartTime': starts[i], 'EndTime': ends[i]}
+        self._dirty = {}
+        return list(rows.values())
+
+    def save(self):
+        # Write the intervals changed since the last save, each replaces the saved intervals it absorbed
+        with self._save_lock:
+            with self._lock:
+                rows = self._take_dirty()
+                self._last_save = time.monotonic()
+            if not rows:
+                return
+            try:
+                with self.database_conn.engine.begin() as conn:
+                    conn.execute(self.delete_sql, rows)
+                    conn.execute(self.insert_sql, rows)
+            except Exception as err:
+                logger.warning("Error {} occured when saving {} coverage intervals!".format(err, len(rows)))
+                # Keep them for the next save
+                with self._lock:
+                    for row in rows:
+                        self._dirty.setdefault(row['Contract'], set()).add(row['StartTime'])
+
+    def load(self, symbols: list = None):
+        """
+        Read the coverage table into memory, all contracts if symbols is None
+        """
+        if symbols is None:
+            sql, params = text(LOAD_SQL), {}
+        else:
+            names = [f'symbol{i}' for i in range(len(symbols))]
+            sql = text(LOAD_SYMBOLS_SQL.format(', '.join(f':{name}' for name in names)))
+            params = dict(zip(names, symbols))
+        try:
+            with self.database_conn.engine.connect() as conn:
+                rows = conn.execute(sql, params).fetchall()
+        except Exception as err:
+            logger.warning("Error {} occured when loading the coverage table!".format(err))
+            return
+        # Loaded intervals are already saved, they are not marked as changed
+        with self._lock:
+            for symbol, start, end in rows:
+                self._merge(symbol, int(start), int(end))
+
+    def rebuild(self, symbol: str, chunksize: int = 500000):
+        """
+        Build the intervals of symbol from fivesecondbar and replace the saved ones.
+        This scans all bars of the contract, use it once for data stored before the coverage table existed.
+        """
+        starts, ends = [], []
+        with self.database_conn.engine.connect() as conn:
+            result = conn.execution_options(stream_results=True).execute(text(BAR_TIMES_SQL), {'symbol': symbol})
+            while True:
+                chunk = result.fetchmany(chunksize)
+                if not chunk:
+                    break
+                for start, end in bar_intervals([row[0] for row in chunk], self.bar_seconds):
+                    # Chunks are in time order, only the first interval can touch the previous chunk
+                    if ends and start <= ends[-1]:
+                        ends[-1] = max(ends[-1], end)
+                    else:
+                        starts.append(start)
+                        ends.append(end)
+        with self.database_conn.engine.begin() as conn:
+            conn.execute(text(DELETE_SYMBOL_SQL), {'Contract': symbol})
+            if starts:
+                conn.execute(self.insert_sql, [{'Contract': symbol, 'StartTime': start, 'EndTime': end}
+                                               for start, end in zip(starts, ends)])
+        with self._lock:
+            self._intervals[symbol] = (starts, ends)
+            self._dirty.pop(symbol, None)
+        logger.info(f"Coverage of {symbol} rebuilt, {len(starts)} intervals")
+
+    def stats(self) -> dict:
+        # Number of contracts, intervals and intervals waiting to be saved
+        with self._lock:
+            return {
+                'symbols': len(self._intervals),
+                'intervals': sum(len(starts) for starts, _ in self._intervals.values()),
+                'unsaved': sum(len(points) for points in self._dirty.values()),
+            }
@@ -31,6 +31,17 @@ CREATE TABLE `accountsummary`  (
   PRIMARY KEY (`Account`, `TimeStamp`) USING BTREE
 ) ENGINE = InnoDB CHARACTER SET = utf8 COLLATE = utf8_unicode_ci ROW_FORMAT = Dynamic;
 
+-- ----------------------------
+-- Table structure for coverage
+-- ----------------------------
+DROP TABLE IF EXISTS `coverage`;
+CREATE TABLE `coverage`  (
+  `Contract` varchar(50) CHARACTER SET utf8 COLLATE utf8_unicode_ci NOT NULL,
+  `StartTime` bigint NOT NULL COMMENT 'First second of an ingested interval of fivesecondbar',
+  `EndTime` bigint NOT NULL COMMENT 'First second after the interval, last bar + 5',
+  PRIMARY KEY (`Contract`, `StartTime`) USING BTREE
+) ENGINE = InnoDB CHARACTER SET = utf8 COLLATE = utf8_unicode_ci ROW_FORMAT = Dynamic;
+
 -- ----------------------------
 -- Table structure for fivesecondbar
 -- ----------------------------
@@ -78,4 +89,25 @@ CREATE TABLE `position`  (
   PRIMARY KEY (`Account`, `Timestamp`, `Contract`) USING BTREE
 ) ENGINE = InnoDB CHARACTER SET = utf8 COLLATE = utf8_general_ci ROW_FORMAT = Dynamic;
 
+-- ----------------------------
+-- Table structure for rollupbar
+-- ----------------------------
+DROP TABLE IF EXISTS `rollupbar`;
+CREATE TABLE `rollupbar`  (
+  `Contract` varchar(50) CHARACTER SET utf8 COLLATE utf8_unicode_ci NOT NULL,
+  `Timeframe` varchar(10) CHARACTER SET utf8 COLLATE utf8_unicode_ci NOT NULL COMMENT '1m, 5m, 1h or 1d',
+  `DateTime` bigint NOT NULL COMMENT 'Start of the period',
+  `Open` double(50, 6) NOT NULL,
+  `High` double(50, 6) NOT NULL,
+  `Low` double(50, 6) NOT NULL,
+  `Close` double(50, 6) NOT NULL,
+  `Volume` bigint NULL DEFAULT NULL,
+  `Average` double(50, 6) NULL DEFAULT NULL,
+  `Count` bigint NULL DEFAULT NULL,
+  `Bars` int NOT NULL COMMENT 'Number of 5 seconds bars in the period',
+  `LastTime` bigint NOT NULL COMMENT 'DateTime of the last 5 seconds bar in the period',
+  `Complete` tinyint NOT NULL DEFAULT 0 COMMENT '0 while the period is still open',
+  PRIMARY KEY (`Contract`, `Timeframe`, `DateTime`) USING BTREE
+) ENGINE = InnoDB CHARACTER SET = utf8 COLLATE = utf8_unicode_ci ROW_FORMAT = Dynamic;
+
 SET FOREIGN_KEY_CHECKS = 1;
@@ -8,6 +8,26 @@ Version 1.0 2022-03-17
 This API is designed for 5 seconds bar data only.
 Version 1.1 2022-04-07
 Add a loguru module to create log files
+Version 1.2 2026-10-18
+Real-time bars are written to the database by a write-behind BatchWriter instead of to_sql on the reader thread
+Multi-contract mode: one DataAPI subscribes many symbols over one TWS connection, callbacks are routed by reqId
+Completed real-time bars are published to subscribers (callbacks or queues) as soon as realtimeBar fires
+Database connections are checked out from the shared pool of DataBaseConn
+Bars can also be appended to a local memory-mapped BarStore as they arrive
+backfill() fills arbitrary date ranges of many symbols with a pacing-aware BackfillScheduler
+A CoverageIndex records the ingested intervals of every symbol, backfill() only requests the missing ranges
+Bars are rolled up into 1m/5m/1h/1d bars of the rollupbar table, live and after historical loads
+Real-time bars start a latency trace (Latency.py) keyed by (symbol, bar time)
+host and port of TWS are parameters, e.g. to connect to the local FakeTWS replay server
+Historical requests complete on historicalDataEnd (or error) instead of sleep(1) polling, only complete responses
+are saved, by one bulk INSERT IGNORE which makes reloading the same bars harmless
+historical_to_database removes the saved bars from self.data and returns the number of bars inserted
+request_historical() sends one historical request with an optional completion callback, used by AsyncAPI
+cancel_historical() cancels a pending historical request and drops its bars
+The latest bars of every symbol are kept in a BarRing (preallocated NumPy ring buffer) instead of a new one-row
+DataFrame per real-time bar, strategies read zero-copy windows of it
+Real-time bars are queued for the BarStore (put_bar), its appender thread writes the files in batches
+The open rollup periods are loaded at startup, realtimeBar does not query the database for them
 
 """
 import time
@@ -19,11 +39,19 @@ from ibapi.contract import Contract
 
 import pandas as pd
 import numpy as np
+from sqlalchemy import text
 
+import queue
 import threading
 import time as time_module
 
-from DataBaseConn import DataBaseConn
+from DataBaseConn import DataBaseConn, BAR_COLUMNS
+from BatchWriter import BatchWriter
+from Backfill import BackfillScheduler
+from Coverage import CoverageIndex
+from Rollup import BarRollup
+from BarRing import BarRing
+from Latency import LATENCY
 
 from loguru import logger
 logger.add("..\logs\\DataAPI_{time}.log", rotation="00:00")
@@ -31,58 +59,99 @@ logger.add("..\logs\\DataAPI_{time}.log", rotation="00:00")
 
 
 
-
 # Acquire different types of data and save data to database
 class DataAPI(wrapper.EWrapper, EClient):
 
-    def __init__(self, symbol, contract_type):
+    def __init__(self, symbol, contract_type, client_id=None, bar_store=None, host='127.0.0.1', port=7497,
+                 ring_capacity=17280):
         """
-        symbol: str - The contract symbol, such as 'EUR', 'AAPL'
+        symbol: str or list - The contract symbol, such as 'EUR', 'AAPL', or a list of symbols, e.g. ['EUR', 'GBP']
         contrancttype: str - 'FX' or 'STK'
+        client_id: int - clientId of the TWS connection. A random number is used if None.
+                   Give every process its own client_id to avoid collisions.
+        bar_store: BarStore - If given, historical and real-time bars are also appended to this local store
+        host: str, port: int - Address of TWS or IB Gateway, 7497 is the paper trading port of TWS
+        ring_capacity: int - Number of latest bars of each symbol kept in memory in self.rings, one day by default
         """
         wrapper.EWrapper.__init__(self)
         EClient.__init__(self, wrapper=self)
         self.reqID = None
 
         self.data = []  # store data temporary
-        self.symbol = symbol
+        self.symbols = [symbol] if isinstance(symbol, str) else list(symbol)
+        # The first symbol is kept as self.symbol for single-symbol users
+        self.symbol = self.symbols[0]
         self.contract_type = contract_type
 
         self.max_duration = 86400  # Max time interval of data requested,data before 24 hours is not available
-        self.__duration = 5
-
-        # use latest time of already stored data to avoid data overlapping
-        self.latest_time = int(time_module.time()) - self.max_duration
+        self.__durations = {symbol: 5 for symbol in self.symbols}
 
         # Check contract type
         if self.contract_type == 'STK':
-            self.contract = self.stock_contract(symbol)
+            self.contracts = {symbol: self.stock_contract(symbol) for symbol in self.symbols}
         elif self.contract_type == 'FX':
-            self.contract = self.fx_contract(symbol)
+            self.contracts = {symbol: self.fx_contract(symbol) for symbol in self.symbols}
         else:
             raise Exception(" Not a supported symbol")
+        self.contract = self.contracts[self.symbol]
+
+        # Routing table, reqId -> symbol. Filled by every historical or real-time request.
+        self.req_symbols = {}
+        # reqIds of historical requests which have not received historicalDataEnd
+        self.pending_historical = set()
+        # reqId -> bars of a historical request, moved to self.data by historicalDataEnd
+        self.historical_buffers = {}
+        # reqId -> function(bars, error) called when the request ends, instead of adding the bars to self.data
+        self.historical_callbacks = {}
+        # Notified when a historical request ends
+        self.historical_condition = threading.Condition()
+        # Set when historical_to_database has saved the historical data, request_realtime_bar waits for it
+        self.historical_saved = threading.Event()
+        # Running BackfillScheduler, its reqIds are forwarded to it
+        self.backfill_scheduler = None
+        self.req_id_lock = threading.Lock()
 
         # Create a list to store data temporary
         self.data = []
 
-        # Create a dataframe to append realtime value.
-        self.dataframe = pd.DataFrame(['Contract', 'DateTime', 'Open', 'High', 'Low',
-                                       'Close', 'Volume', 'Average', 'Count'])
+        # symbol -> BarRing of the latest bars, filled by historical_to_database and every real-time bar
+        self.ring_capacity = ring_capacity
+        self.rings = {symbol: BarRing(ring_capacity, symbol) for symbol in self.symbols}
+        self.rings_lock = threading.Lock()
+
+        # Local columnar store, optional
+        self.bar_store = bar_store
+
+        # Subscribers of real-time bars, list of (symbols, callback). See subscribe()
+        self.subscribers = []
+        self.subscribers_lock = threading.Lock()
+
+        # Connections are checked out from the process-wide pool when needed
+        self.database_conn = DataBaseConn()
 
-        database_conn = DataBaseConn()
-        self.engine = database_conn.engine
-        self.data_conn = database_conn.conn
-        self.cur = database_conn.cur
+        # Ingested intervals of every symbol, updated after every successful write
+        self.coverage = CoverageIndex(self.database_conn)
+        self.coverage.load(self.symbols)
 
-        # Check whetehr historical data has been saved
-        self.__historical_flag = False
+        # Real-time bars of all symbols are queued here and flushed by a background thread.
+        # INSERT IGNORE skips bars that overlap the historical data already stored.
+        self.bar_writer = BatchWriter(self.database_conn,
+                                      self.database_conn.insert_ignore_sql('fivesecondbar', BAR_COLUMNS),
+                                      name='DataAPI-BarWriter', on_flush=self.coverage.on_rows_written)
 
-        # Creating  a random number as clientId
-        CId = np.random.randint(100)
+        # Higher timeframe bars, the open period of every timeframe is upserted on every real-time bar
+        self.rollup = BarRollup(self.database_conn)
+        self.rollup.seed(self.symbols)
+        # Only the last version of an open period within a batch is written
+        self.rollup_writer = BatchWriter(self.database_conn, self.rollup.upsert_sql, name='DataAPI-RollupWriter',
+                                         coalesce_key=lambda row: (row['Contract'], row['Timeframe'], row['DateTime']))
+
+        # Creating  a random number as clientId if not given
+        CId = client_id if client_id is not None else np.random.randint(100)
 
         logger.info('DataAPI Connecintg...')
         # connect to the IB TWS
-        self.connect('127.0.0.1', 7497, clientId=CId)
+        self.connect(host, port, clientId=CId)
 
         """
         Request frozen market data in case live is not available.
@@ -97,10 +166,22 @@ class DataAPI(wrapper.EWrapper, EClient):
         self.control = threading.Event()
         self.thread.start()  # start the thread
 
+    @property
+    def engine(self):
+        # The shared engine of DataBaseConn, looked up on every use
+        return self.database_conn.engine
+
     def increment_id(self):
         # Increase self.reqID, should be used after each request.
         self.reqID += 1
 
+    def next_request_id(self):
+        # Return a reqId and increase self.reqID, safe to call from any thread
+        with self.req_id_lock:
+            req_id = self.reqID
+            self.increment_id()
+        return req_id
+
     def nextValidId(self, orderId: int):
         """ Receives next valid order id. Catch valid ID after connection"""
         self.reqID = orderId
@@ -138,8 +219,94 @@ class DataAPI(wrapper.EWrapper, EClient):
 
     # override this function in EWrapper, store historical data to a list
     def historicalData(self, reqId, bar: BarData):
-        self.data.append(
-            [self.symbol, bar.date, bar.open, bar.high, bar.low, bar.close, bar.volume, bar.average, bar.barCount])
+        if self.backfill_scheduler is not None and self.backfill_scheduler.owns(reqId):
+            self.backfill_scheduler.on_bar(reqId, bar)
+            return
+        buffer = self.historical_buffers.get(reqId)
+        if buffer is None:
+            logger.warning(f"Historical bar of unknown reqId {reqId} is ignored")
+            return
+        buffer.append([self.req_symbols[reqId], bar.date, bar.open, bar.high, bar.low, bar.close, bar.volume,
+                       bar.average, bar.barCount])
+
+    def historicalDataEnd(self, reqId: int, start: str, end: str):
+        # Marks the end of one historical request, its bars are complete and can be saved
+        if self.backfill_scheduler is not None and self.backfill_scheduler.owns(reqId):
+            self.backfill_scheduler.on_end(reqId)
+            return
+        with self.historical_condition:
+            bars = self.historical_buffers.pop(reqId, [])
+            callback = self.historical_callbacks.pop(reqId, None)
+            if callback is None:
+                self.data.extend(bars)
+            self.pending_historical.discard(reqId)
+            self.historical_condition.notify_all()
+        logger.info(f"Historical data of {self.req_symbols.get(reqId)} received, reqId : {reqId}")
+        if callback is not None:
+            callback(bars, None)
+
+    def error(self, reqId, errorCode: int, errorString: str, *args):
+        # Forward errors of backfill requests, log the others as EWrapper does
+        if self.backfill_scheduler is not None and self.backfill_scheduler.owns(reqId):
+            self.backfill_scheduler.on_error(reqId, errorCode, errorString)
+        elif reqId in self.pending_historical and not 2100 <= errorCode < 2200:
+            # The request failed, e.g. 162 no data. Its partial bars are dropped and waiters are woken up.
+            with self.historical_condition:
+                self.historical_buffers.pop(reqId, None)
+                callback = self.historical_callbacks.pop(reqId, None)
+                self.pending_historical.discard(reqId)
+                self.historical_condition.notify_all()
+            logger.warning(f"Historical request of {self.req_symbols.get(reqId)} failed, reqId : {reqId}")
+            if callback is not None:
+                callback(None, (errorCode, errorString))
+        super().error(reqId, errorCode, errorString, *args)
+
+    def backfill(self, start: int, end: int = None, symbols=None, min_gap: int = 0, **kwargs):
+        """
+        Backfill the bars of start <= DateTime < end (epoch seconds) into fivesecondbar, block until done.
+        Only the ranges missing in self.coverage are requested. They are split into windows and requested for all
+        symbols concurrently within the IB pacing limits. A completed window is marked as covered even if TWS had
+        no bars for part of it (e.g. the market was closed), so it is not requested again.
+        end: int - Current time if None
+        symbols: list - All symbols of this DataAPI if None
+        min_gap: int - Skip missing ranges shorter than this number of seconds
+        kwargs - Passed to BackfillScheduler, e.g. window_seconds, max_in_flight
+        return the progress counters of the scheduler
+        """
+        self.control.wait(30)
+        end = int(time_module.time()) if end is None else end
+        symbols = self.symbols if symbols is None else symbols
+        on_window_written = kwargs.pop('on_window_written', None)
+
+        def window_written(symbol, window_start, window_end, rows):
+            self.coverage.add(symbol, window_start, window_end)
+            self.coverage.save()
+            if on_window_written is not None:
+                on_window_written(symbol, window_start, window_end, rows)
+
+        self.backfill_scheduler = BackfillScheduler(self, {symbol: self.contracts[symbol] for symbol in symbols},
+                                                    self.next_request_id, self.database_conn,
+                                                    on_window_written=window_written, **kwargs)
+        for symbol in symbols:
+            for gap_start, gap_end in self.coverage.gaps(symbol, start, end, min_gap):
+                self.backfill_scheduler.add_range(symbol, gap_start, gap_end)
+        self.backfill_scheduler.run()
+        for symbol in symbols:
+            self.rollup.build(symbol, start, end)
+        progress = self.backfill_scheduler.progress()
+        logger.info(f"Backfill finished: {progress}")
+        return progress
+
+    def wait_historical(self, timeout=60):
+        """
+        Wait until every historical request has ended. Return False if timeout.
+        Woken up by historicalDataEnd or error, so it returns as soon as the last request ends.
+        """
+        with self.historical_condition:
+            if self.historical_condition.wait_for(lambda: not self.pending_historical, timeout):
+                return True
+            logger.warning(f"Waiting too long for historical data, reqIds : {self.pending_historical}")
+            return False
 
     def historical_to_csv(self):
         """
@@ -148,50 +315,81 @@ class DataAPI(wrapper.EWrapper, EClient):
         when requesting historical data, or the interval of data will be decided automatically.
 
         """
-        while True:
-            time_module.sleep(1)
-            if len(self.data) > 0:
-                break
-        df = pd.DataFrame(self.data,
-                          columns=['Contract', 'DateTime', 'Open', 'High', 'Low', 'Close', 'Volume', 'Average',
-                                   'Count'])
+        self.wait_historical()
+        df = pd.DataFrame(self.data, columns=BAR_COLUMNS)
         df.to_csv('..\data\historicaldata.csv')
         print(df.head(5))
         logger.info("Historical data saved to csv")
 
     def historical_to_database(self):
         """
-        Save historical data into the database
+        Save historical data into the database, after every historical request has ended.
+        The bars of self.data are saved by save_historical_bars and removed from self.data once committed, so
+        calling it again only saves the bars received meanwhile. Bars are kept for a retry if the write fails.
+        return the number of bars inserted, bars already stored are not counted
         """
-        while True:
-            time_module.sleep(1)
-            if len(self.data) > 0:
-                break
+        self.wait_historical()
 
-        df = pd.DataFrame(self.data,
-                          columns=['Contract', 'DateTime', 'Open', 'High', 'Low', 'Close', 'Volume', 'Average',
-                                   'Count'])
-
-        """
-        Use dataframe slice to avoid data overlapping 
-        df['DateTime'].iloc[0:1] - the earlist time of data requested
-        self.latest_time - the time of last data in the database
-        Use slice to ensure that the data to be saved do not overlap the existing data in database
-        """
-        df['DateTime'] = df['DateTime'].astype(int)
-        if (df['DateTime'].iloc[0:1] <= self.latest_time).bool():
-            df = df[(df['DateTime'] > self.latest_time)]
+        with self.historical_condition:
+            bars = list(self.data)
         try:
-            if len(df) > 0 :
-                df.to_sql(name='fivesecondbar', con=self.engine, if_exists='append', index=False, chunksize=2000,
-                          method='multi')
-                logger.info("Historical data saved successfully.")
-            else:
-                logger.info("No data is needed to be saved")
-            self.__historical_flag = True
+            inserted = self.save_historical_bars(bars)
         except Exception as err:
             logger.warning("Error {} occured when storing historical data to database!".format(err))
-            self.__historical_flag = False
+            self.historical_saved.clear()
+            return 0
+        # Bars added by historicalDataEnd meanwhile are after the saved ones
+        with self.historical_condition:
+            del self.data[:len(bars)]
+        return inserted
+
+    def save_historical_bars(self, bars) -> int:
+        """
+        Save historical bars with one INSERT IGNORE executemany in one transaction, then update the coverage,
+        the local store, the rings and the rollup bars. Bars already stored (e.g. the overlap with the last run)
+        are skipped by the primary key.
+        bars - list of rows with the columns of fivesecondbar
+        return the number of bars inserted. Errors of the database write are raised.
+        """
+        df = pd.DataFrame(bars, columns=BAR_COLUMNS)
+        df['DateTime'] = df['DateTime'].astype(int)
+        inserted = 0
+        if len(df) > 0:
+            with self.engine.begin() as conn:
+                result = conn.execute(text(self.database_conn.insert_ignore_sql('fivesecondbar', BAR_COLUMNS)),
+                                      df.to_dict('records'))
+                inserted = max(result.rowcount, 0)
+            logger.info(f"Historical data saved successfully, {inserted} of {len(df)} bars inserted.")
+            for symbol, symbol_df in df.groupby('Contract'):
+                self.coverage.add_times(symbol, symbol_df['DateTime'].to_numpy())
+                if self.bar_store is not None:
+                    self.bar_store.append(symbol, symbol_df)
+                self.fill_ring(symbol, symbol_df)
+            self.coverage.save()
+        else:
+            logger.info("No data is needed to be saved")
+        self.historical_saved.set()
+
+        # Roll up the new bars, a failure here does not stop the real-time data
+        for symbol, first_time in df.groupby('Contract')['DateTime'].min().items():
+            try:
+                self.rollup.build(symbol, int(first_time))
+            except Exception as err:
+                logger.warning("Error {} occured when rolling up the historical data of {}!".format(err, symbol))
+        return inserted
+
+    def fill_ring(self, symbol: str, bars=None):
+        """
+        Add historical bars to the ring of a symbol of this DataAPI. An empty ring is filled with the latest
+        ring_capacity bars of the database instead, so strategies get a full window from the start.
+        """
+        ring = self.rings.get(symbol)
+        if ring is None:
+            return
+        if len(ring) == 0:
+            ring.extend(self.database_conn.read_historical_array(ring.capacity, symbol))
+        elif bars is not None:
+            ring.extend(bars)
 
     # clear the data list
     def clear_data(self):
@@ -201,49 +399,157 @@ class DataAPI(wrapper.EWrapper, EClient):
                     volume, wap, count):
 
         """
-        This function get one row of real-time data every 5 seconds, and store the data to database immediately
-        return a dataframe for further operation
+        This function get one row of real-time data every 5 seconds and queues it for the database.
+        The row is written by self.bar_writer in the background, so the reader thread is not blocked by MySQL.
+        The latest bars are kept in self.rings, see self.dataframe for the latest one as a DataFrame
         """
-        df = pd.DataFrame([[self.symbol, time, open, high, low, close, volume, wap, count]],
-                          columns=['Contract', 'DateTime', 'Open', 'High', 'Low',
-                                   'Close', 'Volume', 'Average', 'Count'])
-        try:
-            # After some time point of the day, realtimeBar will return extra 900 seconds data at first request.
-            # To avoid overlapping data, only leave the last row of data if length > 1.
-            if len(df) > 1:
-                df = df.tail(1)
-            if len(df) > 0:
-                print("Saving real-time bar...")
-                print(df)
-                df.to_sql(name='fivesecondbar', con=self.engine, if_exists='append', index=False, chunksize=100)
-
-
-                # return the real-time data for further use
-                self.dataframe = df
-        except Exception as err:
-            logger.warning("Error {} occured when storing real_time data to database!".format(err))
-            # Normally, the first real-time data is likely to concur an IntegrityError(Overlapping data)
-            # But it does not matter.
-
-
-
+        symbol = self.req_symbols.get(reqId)
+        if symbol is None:
+            logger.warning(f"Real-time bar of unknown reqId {reqId} is ignored")
+            return
+        LATENCY.mark((symbol, time), 'bar_received', start=True)
+        row = {'Contract': symbol, 'DateTime': time, 'Open': open, 'High': high, 'Low': low,
+               'Close': close, 'Volume': volume, 'Average': wap, 'Count': count}
+        # The ring holds the bar before the subscribers are called, so they can read a window ending with it
+        self.ring(symbol).append(row)
+        # Marked before the bar is handed over, a strategy thread may take it before publish_bar returns
+        LATENCY.mark((symbol, time), 'bar_published')
+        # Deliver the bar to the strategies first, the database write is not on their path
+        self.publish_bar(row)
+
+        # Normally, the first real-time data is likely to overlap the historical data, INSERT IGNORE skips it.
+        self.bar_writer.put(row)
+        if self.bar_store is not None:
+            self.bar_store.put_bar(row)
+        for rollup_row in self.rollup.update(row):
+            self.rollup_writer.put(rollup_row)
+
+
+    def ring(self, symbol: str) -> BarRing:
+        # BarRing of a symbol, created if it is not a symbol of this DataAPI, e.g. bars of another request
+        ring = self.rings.get(symbol)
+        if ring is None:
+            with self.rings_lock:
+                ring = self.rings.setdefault(symbol, BarRing(self.ring_capacity, symbol))
+        return ring
+
+    @property
+    def dataframe(self) -> pd.DataFrame:
+        # Latest real-time bar of self.symbol as a one-row DataFrame, built when read
+        return self.rings[self.symbol].to_frame(1)
+
+    @property
+    def dataframes(self) -> dict:
+        # symbol -> latest bar as a one-row DataFrame, built when read
+        return {symbol: ring.to_frame(1) for symbol, ring in list(self.rings.items()) if len(ring) > 0}
+
+    def subscribe(self, callback=None, symbols=None, maxsize=0):
+        """
+        Register a subscriber of real-time bars. Every bar is a dict with the columns of fivesecondbar.
+        callback - function(bar) called on the reader thread, it must return quickly.
+                   If None, a queue.Queue is created and bars are put into it, block on queue.get() to wait for bars.
+        symbols: list - Only deliver bars of these symbols, all symbols if None
+        maxsize: int - maxsize of the created queue, 0 for unbounded. Bars are dropped if the queue is full.
+        return the callback or the queue, pass it to unsubscribe() to stop the delivery
+        """
+        target = callback
+        if target is None:
+            bar_queue = queue.Queue(maxsize=maxsize)
+            target = bar_queue
+            callback = self._queue_putter(bar_queue)
+        with self.subscribers_lock:
+            self.subscribers.append((set(symbols) if symbols is not None else None, callback, target))
+        return target
 
-    def request_historical_bar(self):
+    @staticmethod
+    def _queue_putter(bar_queue):
+        def put(bar):
+            try:
+                bar_queue.put_nowait(bar)
+            except queue.Full:
+                logger.warning(f"Subscriber queue is full, bar {bar['Contract']} {bar['DateTime']} dropped")
+        return put
+
+    def unsubscribe(self, target):
+        # Remove a subscriber registered by subscribe()
+        with self.subscribers_lock:
+            self.subscribers = [sub for sub in self.subscribers if sub[2] is not target]
+
+    def publish_bar(self, bar: dict):
+        # Deliver one completed bar to the subscribers of its symbol
+        with self.subscribers_lock:
+            subscribers = list(self.subscribers)
+        for symbols, callback, _ in subscribers:
+            if symbols is not None and bar['Contract'] not in symbols:
+                continue
+            try:
+                callback(bar)
+            except Exception as err:
+                logger.warning("Error {} occured in a real-time bar subscriber!".format(err))
+
+    def writer_stats(self):
+        # Queue depth, flush latency and dropped-row counters of the real-time bar writer
+        return self.bar_writer.stats()
+
+    def request_historical_bar(self, symbols=None):
         """
         This function will request the historical data whose timestamp locate beteewn
         the latest timestamp in database and current timestamp。
         So duplicated data will not be stored.
         The dataframe.to_sql can only insert data without overlapping.
+        symbols: list - Symbols to request, all symbols of this DataAPI if None
+        """
+        # reqIds are valid after nextValidId
+        if not self.control.wait(30):
+            logger.warning("No nextValidId from TWS, historical data is not requested")
+            return
+        symbols = self.symbols if symbols is None else symbols
+        self.cal_duration(symbols)
+        for symbol in symbols:
+            self.request_historical(symbol, self.__durations[symbol])
+
+    def durations(self) -> dict:
+        # symbol -> seconds of historical data to request, calculated by cal_duration
+        return dict(self.__durations)
+
+    def request_historical(self, symbol: str, duration: int, end_date_time: str = '', callback=None) -> int:
         """
-        time_module.sleep(1)
-        self.cal_duration()
-        self.reqHistoricalData(self.reqID, contract=self.contract, endDateTime='',
-                               durationStr=str(self.__duration) + ' ' + 'S',
+        Send one historical request of 5 seconds bars and return its reqId.
+        duration: int - Seconds of data before end_date_time
+        end_date_time: str - 'yyyymmdd hh:mm:ss', now if ''
+        callback - function(bars, error) called on the reader thread when the request ends, bars is a list of
+                   rows with the columns of fivesecondbar, or None and error is (code, message) if it failed.
+                   If None, the bars are added to self.data for historical_to_database.
+        Raise ValueError if symbol is not a symbol of this DataAPI.
+        """
+        if symbol not in self.contracts:
+            raise ValueError(f"{symbol} is not a symbol of this DataAPI: {self.symbols}")
+        req_id = self.next_request_id()
+        self.req_symbols[req_id] = symbol
+        with self.historical_condition:
+            self.historical_buffers[req_id] = []
+            if callback is not None:
+                self.historical_callbacks[req_id] = callback
+            self.pending_historical.add(req_id)
+        self.reqHistoricalData(req_id, contract=self.contracts[symbol], endDateTime=end_date_time,
+                               durationStr=str(duration) + ' ' + 'S',
                                barSizeSetting='5 secs', whatToShow='midpoint', useRTH=1, formatDate=2,
                                keepUpToDate=False, chartOptions=[])
-        self.increment_id()
-
-    def request_realtime_bar(self):
+        return req_id
+
+    def cancel_historical(self, req_id: int):
+        # Cancel a historical request which is still pending, its bars and callback are dropped
+        with self.historical_condition:
+            if req_id not in self.pending_historical:
+                return
+            self.historical_buffers.pop(req_id, None)
+            self.historical_callbacks.pop(req_id, None)
+            self.pending_historical.discard(req_id)
+            self.historical_condition.notify_all()
+        self.cancelHistoricalData(req_id)
+        logger.info(f"Historical request of {self.req_symbols.get(req_id)} cancelled, reqId : {req_id}")
+
+    def request_realtime_bar(self, symbols=None):
         """
         This function will only works after the historical data been updated.
         The order to use this function is:
@@ -257,56 +563,60 @@ class DataAPI(wrapper.EWrapper, EClient):
         dataapi.request_realtime_bar()
 
         """
-        count = 1
-        while True:
-            logger.info("Start requesting real-time data...")
-            time_module.sleep(1)
-            count += 1
-            if self.__historical_flag:
-                print("Historical data updated!")
-                break
-            if count > 60:
-                logger.warning("Waiting too long...")
-                break
-        if self.__historical_flag:
-            self.reqRealTimeBars(self.reqID, self.contract, 5, 'MIDPOINT', 1, [])
-            self.increment_id()
-
-    def cal_duration(self):
+        logger.info("Start requesting real-time data...")
+        # Set by historical_to_database as soon as the historical data is saved
+        if not self.historical_saved.wait(60):
+            logger.warning("Waiting too long...")
+            return
+        print("Historical data updated!")
+        self.start_realtime_bars(symbols)
+
+    def start_realtime_bars(self, symbols=None) -> list:
+        # Send the real-time bar requests at once, without waiting for the historical data. Return the reqIds.
+        req_ids = []
+        for symbol in (self.symbols if symbols is None else symbols):
+            req_id = self.next_request_id()
+            self.req_symbols[req_id] = symbol
+            self.reqRealTimeBars(req_id, self.contracts[symbol], 5, 'MIDPOINT', 1, [])
+            req_ids.append(req_id)
+        return req_ids
+
+    def cal_duration(self, symbols=None):
         """
         This method calculate the time interval between current time and the lasted time of the data stored in database.
-        Then pass the self。duration to the reqHistoricalBar method to avoid duplicated data.
+        Then pass the self。durations to the reqHistoricalBar method to avoid duplicated data.
+        The latest time of all symbols is read by one query.
         """
-
+        symbols = self.symbols if symbols is None else symbols
         sql = """
                 SELECT
-                    MAX( DateTime ) 
+                    Contract, MAX( DateTime ) 
                 FROM
                     fivesecondbar 
                 WHERE
-                    Contract = '{}'
-               """.format(self.symbol)
-        self.cur.execute(sql)
-        last_time = self.cur.fetchone()[0]
-        self.data_conn.commit()
+                    Contract IN ({})
+                GROUP BY
+                    Contract
+               """.format(', '.join(f':symbol{i}' for i in range(len(symbols))))
+        # Named parameters work with every driver, e.g. pymysql and sqlite3
+        with self.engine.connect() as conn:
+            rows = conn.execute(text(sql), {f'symbol{i}': symbol for i, symbol in enumerate(symbols)})
+            last_times = dict(rows.fetchall())
 
         current_time = int(time_module.time())
 
-        if last_time is None:
-            self.__duration = self.max_duration
-        else:
-            last_time = int(last_time)
-            self.__duration = current_time - last_time - 5
-            self.latest_time = last_time
-            if self.__duration >= self.max_duration:
-                self.__duration = self.max_duration
-        print("duration", self.__duration)
-        self.data_conn.close()
+        for symbol in symbols:
+            last_time = last_times.get(symbol)
+            if last_time is None:
+                self.__durations[symbol] = self.max_duration
+            else:
+                last_time = int(last_time)
+                self.__durations[symbol] = min(current_time - last_time - 5, self.max_duration)
+        print("duration", self.__durations)
 
 
 if __name__ == '__main__':
     dataapi = DataAPI('EUR', 'FX')
-    time.sleep(1)
     dataapi.request_historical_bar()
     dataapi.historical_to_database()
     dataapi.request_realtime_bar()
@@ -5,35 +5,190 @@ This module extract the database connection function
 This module also contains a function to query historical data
 
 Version 1.0 2022-04-07
+Version 1.1 2026-10-18
+All DataBaseConn objects share one process-wide pooled engine. Connections are checked out from the pool
+by connection() and returned after use, so the number of server connections does not grow with components.
+insert_ignore_sql() and upsert_sql() build parameterized statements for the dialect of the engine.
+stream_historical_data() reads bars in fixed-size chunks through a server-side cursor,
+epoch_to_datetime() converts the DateTime column without a Python call per row.
+read_historical_array() reads the last bars into a NumPy structured array, e.g. to fill a BarRing.
+The columns of fivesecondbar and their dtypes are defined here once (BAR_COLUMNS, BAR_DTYPES, BAR_DTYPE).
+DataBaseConn.engine is looked up on every use, so configure() applies to the objects created before it.
 
 """
 
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
 import pandas as pd
 
-from sqlalchemy import create_engine
-import pymysql
+from sqlalchemy import create_engine, text
+
+# Numeric columns of the fivesecondbar table -> dtype, used by BarStore, BarRing and read_historical_array
+BAR_DTYPES = {
+    'DateTime': np.int64,
+    'Open': np.float64,
+    'High': np.float64,
+    'Low': np.float64,
+    'Close': np.float64,
+    'Volume': np.int64,
+    'Average': np.float64,
+    'Count': np.int64,
+}
+BAR_FIELDS = list(BAR_DTYPES)
+# Columns of the fivesecondbar table
+BAR_COLUMNS = ['Contract'] + BAR_FIELDS
+# One bar without Contract as a NumPy structured dtype
+BAR_DTYPE = np.dtype(list(BAR_DTYPES.items()))
+
+
+def epoch_to_datetime(epochs, local=True) -> pd.DatetimeIndex:
+    """
+    Convert epoch seconds (the DateTime column) to naive datetimes, vectorized.
+    local: bool - Convert to local time like time.localtime, otherwise UTC.
+    The UTC offset is looked up once per distinct hour instead of once per row.
+    """
+    epochs = np.asarray(epochs, dtype=np.int64)
+    if local and len(epochs) > 0:
+        hours, inverse = np.unique(epochs // 3600, return_inverse=True)
+        offsets = np.array([time.localtime(int(hour) * 3600).tm_gmtoff for hour in hours], dtype=np.int64)
+        epochs = epochs + offsets[inverse.reshape(-1)]
+    return pd.DatetimeIndex(pd.to_datetime(epochs, unit='s'))
 
 
 class DataBaseConn:
+    __database_username = 'username'
+    __database_password = 'password'
+    __database_ip = 'localhost'
+    __database_port = 3306
+    __database_name = 'databasename'
+
+    # The engine and its pool are shared by the whole process, created on first use
+    _engine = None
+    _engine_lock = threading.Lock()
+    _url = None
+    _pool_options = {
+        'pool_size': 5,  # connections kept open in the pool
+        'max_overflow': 10,  # extra connections allowed when the pool is exhausted
+        'pool_timeout': 30,  # seconds to wait for a free connection
+        'pool_recycle': 3600,  # reconnect connections older than this, MySQL closes idle connections
+        'pool_pre_ping': True,  # test a connection before it is checked out
+    }
+
     def __init__(self):
-        self.__database_username = 'username'
-        self.__database_password = 'password'
-        self.__database_ip = 'localhost'
-        self.__database_port = 3306
-        self.__database_name = 'databasename'
+        self.get_engine()
+
+        # Connection kept by this object for the conn/cur attributes, checked out lazily
+        self.__conn = None
+        self.__cur = None
+
+    @classmethod
+    def configure(cls, url: str = None, **pool_options):
+        """
+        Change the database url or the pool options, e.g. DataBaseConn.configure(pool_size=10, pool_recycle=1800)
+        url: str - sqlalchemy url, the mysql parameters of this class are used if None
+        If the shared engine exists, it is disposed and created again on next use. Objects holding a DataBaseConn
+        (BatchWriter, Coverage, Rollup, ...) use the new engine from then on.
+        """
+        with cls._engine_lock:
+            if url is not None:
+                cls._url = url
+            cls._pool_options = {**cls._pool_options, **pool_options}
+            if cls._engine is not None:
+                cls._engine.dispose()
+                cls._engine = None
+
+    @classmethod
+    def get_engine(cls):
+        # Return the shared engine, create it if it does not exist
+        with cls._engine_lock:
+            if cls._engine is None:
+                url = cls._url or 'mysql+pymysql://{0}:{1}@{2}:{3}/{4}'.format(
+                    cls.__database_username, cls.__database_password,
+                    cls.__database_ip, cls.__database_port, cls.__database_name)
+                options = cls._pool_options
+                if url.startswith('sqlite'):
+                    # SQLite does not use a connection pool with a fixed size
+                    options = {'pool_pre_ping': options['pool_pre_ping']}
+                cls._engine = create_engine(url, **options)
+            return cls._engine
+
+    @property
+    def engine(self):
+        # The shared engine, looked up on every use so that configure() also applies to existing objects
+        return self.get_engine()
+
+    @classmethod
+    def pool_status(cls) -> str:
+        # Return the status of the shared pool, e.g. checked out connections
+        return cls.get_engine().pool.status()
+
+    @contextmanager
+    def connection(self):
+        """
+        Check out a DBAPI connection from the shared pool. Commit on success, rollback on error,
+        and return the connection to the pool at the end. It is safe to use from any thread.
+
+        with database_conn.connection() as conn:
+            cur = conn.cursor()
+            cur.execute(sql)
+        """
+        conn = self.engine.raw_connection()
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    def insert_ignore_sql(self, table: str, columns: list) -> str:
+        """
+        Build a parameterized insert which skips rows whose primary key already exists.
+        The parameters are named after the columns, e.g. :Contract, :DateTime
+        """
+        names = ', '.join(f'`{column}`' for column in columns)
+        values = ', '.join(f':{column}' for column in columns)
+        if self.engine.dialect.name == 'sqlite':
+            return f"INSERT OR IGNORE INTO {table} ({names}) VALUES ({values})"
+        return f"INSERT IGNORE INTO {table} ({names}) VALUES ({values})"
 
-        self.engine = create_engine('mysql+pymysql://{0}:{1}@{2}/{3}'.
-                                    format(self.__database_username, self.__database_password,
-                                           self.__database_ip, self.__database_name))
+    def upsert_sql(self, table: str, columns: list, update_columns: list) -> str:
+        """
+        Build a parameterized insert which updates update_columns if the primary key already exists.
+        """
+        names = ', '.join(f'`{column}`' for column in columns)
+        values = ', '.join(f':{column}' for column in columns)
+        if self.engine.dialect.name == 'sqlite':
+            updates = ', '.join(f'`{column}` = excluded.`{column}`' for column in update_columns)
+            return f"INSERT INTO {table} ({names}) VALUES ({values}) ON CONFLICT DO UPDATE SET {updates}"
+        updates = ', '.join(f'`{column}` = VALUES(`{column}`)' for column in update_columns)
+        return f"INSERT INTO {table} ({names}) VALUES ({values}) ON DUPLICATE KEY UPDATE {updates}"
+
+    @staticmethod
+    def update_sql(table: str, key_columns: list, update_columns: list) -> str:
+        """
+        Build a parameterized update of update_columns in the row of key_columns, no row is inserted if it is missing.
+        """
+        updates = ', '.join(f'`{column}` = :{column}' for column in update_columns)
+        keys = ' AND '.join(f'`{column}` = :{column}' for column in key_columns)
+        return f"UPDATE {table} SET {updates} WHERE {keys}"
 
-        self.conn = pymysql.connect(host=self.__database_ip,
-                                    user=self.__database_username,
-                                    password=self.__database_password,
-                                    database=self.__database_name,
-                                    port=self.__database_port,
-                                    )
+    @property
+    def conn(self):
+        # A pooled connection kept by this object until close_conn(). Do not share it between threads.
+        if self.__conn is None:
+            self.__conn = self.engine.raw_connection()
+        return self.__conn
 
-        self.cur = self.conn.cursor()
+    @property
+    def cur(self):
+        if self.__cur is None:
+            self.__cur = self.conn.cursor()
+        return self.__cur
 
     def read_historical_data(self, length=2880, symbol='EUR'):
         """
@@ -56,11 +211,52 @@ class DataBaseConn:
 
         return historical_df
 
+    def read_historical_array(self, length=2880, symbol='EUR') -> np.ndarray:
+        """
+        Same bars as read_historical_data, as a structured array of BAR_DTYPE without building a DataFrame.
+        """
+        sql = """
+            SELECT {} FROM (
+                SELECT * FROM fivesecondbar WHERE Contract = :symbol ORDER BY `DateTime` DESC LIMIT :length
+            ) AS lastdata ORDER BY `DateTime`
+        """.format(', '.join(f'`{field}`' for field in BAR_FIELDS))
+        with self.engine.connect() as conn:
+            rows = conn.execute(text(sql), {'symbol': symbol, 'length': int(length)}).fetchall()
+        # Volume, Average and Count may be NULL
+        return np.array([tuple(0 if value is None else value for value in row) for row in rows], dtype=BAR_DTYPE)
+
+    def stream_historical_data(self, symbol='EUR', start=None, end=None, chunksize=50000):
+        """
+        Yield the bars of a symbol as DataFrames of at most chunksize rows, in time order.
+        start, end: int - Epoch seconds, both included, None for no limit
+        The rows are read through a server-side cursor, so memory stays bounded by the chunk size
+        no matter how long the history is.
+        """
+        sql = "SELECT * FROM fivesecondbar WHERE Contract = :symbol"
+        params = {'symbol': symbol}
+        if start is not None:
+            sql += " AND `DateTime` >= :start"
+            params['start'] = int(start)
+        if end is not None:
+            sql += " AND `DateTime` <= :end"
+            params['end'] = int(end)
+        sql += " ORDER BY `DateTime`"
+
+        with self.engine.connect() as conn:
+            conn = conn.execution_options(stream_results=True)
+            for chunk in pd.read_sql_query(text(sql), conn, params=params, chunksize=chunksize):
+                yield chunk
+
     def close_conn(self):
-        self.conn.close()
+        # Return the connection of this object to the pool
+        if self.__conn is not None:
+            self.__conn.close()
+            self.__conn = None
+            self.__cur = None
 
 
 if __name__ == "__main__":
     database_conn = DataBaseConn()
     df = database_conn.read_historical_data()
     print(df.head(10))
+    print(DataBaseConn.pool_status())
@@ -0,0 +1,454 @@
+"""
+Author: Rosenyoung
+This module is a local stand-in for TWS / IB Gateway, used to run DataAPI, Orders and the strategies offline.
+
+It speaks the socket protocol of ibapi (server version 157) for the messages this project uses:
+- handshake, startApi -> managedAccounts, nextValidId; reqIds, reqCurrentTime, reqMarketDataType
+- reqHistoricalData -> historicalData / historicalDataEnd (5 secs bars), error 162 if there is no data
+- reqRealTimeBars -> realtimeBar, the stored bars are replayed at a speed multiplier, speed=None is as fast
+  as possible; cancelRealTimeBars
+- placeOrder -> orderStatus Submitted and Filled at the last replayed close, error 103 for a duplicated order id.
+  Market orders fill at once (or after fill_delay). LMT and MIT orders fill when the last close crosses their
+  price (buy: close <= price, sell: close >= price), at once or on a later replayed bar, and stay Submitted
+  until then; cancelOrder before the fill -> orderStatus Cancelled
+- reqPositions -> position / positionEnd, positions are updated by the fills until cancelPositions;
+  reqAccountSummary
+
+The bars come from a dict of DataFrames with the columns of fivesecondbar, or from the fivesecondbar table.
+
+    server = FakeTWS(speed=None).start()
+    dataapi = DataAPI('EUR', 'FX', port=server.port)
+
+Version 1.0 2026-10-18
+Version 1.1 2026-10-18
+LMT and MIT orders rest until the replayed price crosses their price, cancelPositions stops the position updates.
+"""
+
+import calendar
+import socket
+import struct
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from DataBaseConn import DataBaseConn
+
+from loguru import logger
+
+SERVER_VERSION = 157
+
+# Incoming message ids of ibapi.message.OUT
+PLACE_ORDER = 3
+CANCEL_ORDER = 4
+REQ_IDS = 8
+REQ_HISTORICAL_DATA = 20
+CANCEL_HISTORICAL_DATA = 25
+REQ_CURRENT_TIME = 49
+REQ_REAL_TIME_BARS = 50
+CANCEL_REAL_TIME_BARS = 51
+REQ_MARKET_DATA_TYPE = 59
+REQ_POSITIONS = 61
+REQ_ACCOUNT_SUMMARY = 62
+CANCEL_POSITIONS = 64
+START_API = 71
+
+# Outgoing message ids of ibapi.message.IN
+ORDER_STATUS = 3
+ERR_MSG = 4
+NEXT_VALID_ID = 9
+MANAGED_ACCTS = 15
+HISTORICAL_DATA = 17
+CURRENT_TIME = 49
+REAL_TIME_BARS = 50
+POSITION_DATA = 61
+POSITION_END = 62
+ACCOUNT_SUMMARY = 63
+ACCOUNT_SUMMARY_END = 64
+
+DURATION_UNITS = {'S': 1, 'D': 86400, 'W': 7 * 86400}
+
+
+def make_message(*fields) -> bytes:
+    # Length prefix and NULL terminated fields, like ibapi.comm.make_msg
+    text = ''.join(str(int(field) if isinstance(field, bool) else field) + '\0' for field in fields).encode()
+    return struct.pack('!I', len(text)) + text
+
+
+def parse_end_time(end_date_time: str) -> int:
+    """
+    Epoch seconds of an endDateTime of reqHistoricalData: '' is now, 'yyyymmdd-hh:mm:ss' is UTC,
+    'yyyymmdd hh:mm:ss [timezone]' is local time
+    """
+    if not end_date_time:
+        return int(time.time())
+    if '-' in end_date_time:
+        return calendar.timegm(time.strptime(end_date_time, '%Y%m%d-%H:%M:%S'))
+    return int(time.mktime(time.strptime(' '.join(end_date_time.split()[:2]), '%Y%m%d %H:%M:%S')))
+
+
+class ClientSession:
+    # One connected client: socket, send lock and its real-time replays
+    def __init__(self, server, sock, address):
+        self.server = server
+        self.sock = sock
+        self.address = address
+        self.client_id = None
+        self.send_lock = threading.Lock()
+        # reqId -> threading.Event stopping the replay
+        self.replays = {}
+        self.closed = threading.Event()
+        self.messages = 0
+
+    def send(self, *fields):
+        data = make_message(*fields)
+        with self.send_lock:
+            try:
+                self.sock.sendall(data)
+            except OSError:
+                self.closed.set()
+
+    def error(self, req_id, code, text):
+        self.send(ERR_MSG, 2, req_id, code, text)
+
+    def _recv_exact(self, size, buffer):
+        while len(buffer) < size:
+            chunk = self.sock.recv(65536)
+            if not chunk:
+                raise ConnectionError('client closed the connection')
+            buffer += chunk
+        return buffer
+
+    def serve(self):
+        buffer = b''
+        try:
+            # Handshake: "API\0", then the length prefixed version range of the client
+            buffer = self._recv_exact(8, buffer)
+            if buffer[:4] != b'API\0':
+                raise ConnectionError('not an ibapi client')
+            buffer = buffer[4:]
+            size = struct.unpack('!I', buffer[:4])[0]
+            buffer = self._recv_exact(4 + size, buffer)[4 + size:]
+            self.send(SERVER_VERSION, time.strftime('%Y%m%d %H:%M:%S') + ' UTC')
+
+            while not self.closed.is_set():
+                buffer = self._recv_exact(4, buffer)
+                size = struct.unpack('!I', buffer[:4])[0]
+                buffer = self._recv_exact(4 + size, buffer)
+                fields = buffer[4:4 + size].split(b'\0')[:-1]
+                buffer = buffer[4 + size:]
+                self.messages += 1
+                self.server.handle(self, [field.decode() for field in fields])
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            self.closed.set()
+            for stop in self.replays.values():
+                stop.set()
+            self.sock.close()
+            self.server.remove(self)
+
+
+class FakeTWS:
+    def __init__(self, bars: dict = None, database_conn: DataBaseConn = None, host: str = '127.0.0.1',
+                 port: int = 0, speed: float = 1.0, replay_start: int = None, fill_delay: float = 0.0,
+                 account: str = 'DU0000000', next_order_id: int = 1):
+        """
+        bars: dict - symbol -> DataFrame with the columns of fivesecondbar. Symbols not in it are read from the
+              fivesecondbar table by database_conn.
+        port: int - 0 picks a free port, read it from self.port after start()
+        speed: float - Replay speed of real-time bars, 1.0 sends a bar every 5 seconds, None as fast as possible
+        replay_start: int - Real-time replays start at the first bar with DateTime >= replay_start
+        fill_delay: float - Seconds between Submitted and Filled, orders can be cancelled meanwhile
+        next_order_id: int - First nextValidId
+        """
+        self.bars = {} if bars is None else dict(bars)
+        self.database_conn = database_conn
+        self.host = host
+        self.port = port
+        self.speed = speed
+        self.replay_start = replay_start
+        self.fill_delay = fill_delay
+        self.account = account
+
+        self._lock = threading.Lock()
+        # symbol -> dict of NumPy arrays of the bars in time order
+        self._arrays = {}
+        self._next_order_id = next_order_id
+        # orderId -> order dict, every id ever placed
+        self._orders = {}
+        # (account, symbol) -> (position, average cost)
+        self._positions = {}
+        # symbol -> last replayed close, the fill price of market orders
+        self._last_prices = {}
+        # symbol -> set of the IDs of LMT and MIT orders waiting for the price to cross
+        self._resting = {}
+        self._sessions = []
+        self._position_sessions = set()
+        self._socket = None
+        self._stop = threading.Event()
+
+        self.orders_filled = 0
+        self.bars_sent = 0
+
+    def start(self):
+        # Listen in a background thread, return self
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._socket.bind((self.host, self.port))
+        self._socket.listen()
+        self.port = self._socket.getsockname()[1]
+        threading.Thread(target=self._accept, name='FakeTWS', daemon=True).start()
+        logger.info(f"FakeTWS listening on {self.host}:{self.port}")
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._socket.close()
+        with self._lock:
+            sessions = list(self._sessions)
+        for session in sessions:
+            session.closed.set()
+            try:
+                session.sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def _accept(self):
+        while not self._stop.is_set():
+            try:
+                sock, address = self._socket.accept()
+            except OSError:
+                break
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            session = ClientSession(self, sock, address)
+            with self._lock:
+                self._sessions.append(session)
+            threading.Thread(target=session.serve, name=f'FakeTWS-{address[1]}', daemon=True).start()
+
+    def remove(self, session):
+        with self._lock:
+            if session in self._sessions:
+                self._sessions.remove(session)
+            self._position_sessions.discard(session)
+
+    def _bar_arrays(self, symbol):
+        # Bars of a symbol as NumPy arrays in time order, loaded once
+        with self._lock:
+            arrays = self._arrays.get(symbol)
+        if arrays is not None:
+            return arrays
+        df = self.bars.get(symbol)
+        if df is None:
+            database_conn = self.database_conn if self.database_conn is not None else DataBaseConn()
+            chunks = list(database_conn.stream_historical_data(symbol))
+            df = pd.concat(chunks) if chunks else pd.DataFrame(columns=['DateTime'])
+        df = df.sort_values('DateTime')
+        arrays = {column: df[column].to_numpy() for column in
+                  ['DateTime', 'Open', 'High', 'Low', 'Close', 'Volume', 'Average', 'Count'] if column in df}
+        arrays['DateTime'] = arrays['DateTime'].astype(np.int64)
+        with self._lock:
+            self._arrays[symbol] = arrays
+        return arrays
+
+    def handle(self, session, fields):
+        # Dispatch one message of a client
+        message_id = int(fields[0])
+        if message_id == START_API:
+            session.client_id = int(fields[2])
+            session.send(MANAGED_ACCTS, 1, self.account)
+            with self._lock:
+                next_order_id = self._next_order_id
+            session.send(NEXT_VALID_ID, 1, next_order_id)
+        elif message_id == REQ_IDS:
+            with self._lock:
+                next_order_id = self._next_order_id
+            session.send(NEXT_VALID_ID, 1, next_order_id)
+        elif message_id == REQ_CURRENT_TIME:
+            session.send(CURRENT_TIME, 1, int(time.time()))
+        elif message_id == REQ_HISTORICAL_DATA:
+            self._historical_data(session, fields)
+        elif message_id == REQ_REAL_TIME_BARS:
+            self._real_time_bars(session, fields)
+        elif message_id == CANCEL_REAL_TIME_BARS:
+            stop = session.replays.pop(int(fields[2]), None)
+            if stop is not None:
+                stop.set()
+        elif message_id == PLACE_ORDER:
+            self._place_order(session, fields)
+        elif message_id == CANCEL_ORDER:
+            self._cancel_order(session, int(fields[2]))
+        elif message_id == REQ_POSITIONS:
+            with self._lock:
+                self._position_sessions.add(session)
+                positions = list(self._positions.items())
+            for (account, symbol), (position, avg_cost) in positions:
+                self._send_position(session, account, symbol, position, avg_cost)
+            session.send(POSITION_END, 1)
+        elif message_id == CANCEL_POSITIONS:
+            with self._lock:
+                self._position_sessions.discard(session)
+        elif message_id == REQ_ACCOUNT_SUMMARY:
+            req_id = int(fields[2])
+            for tag in fields[4].replace(' ', '').split(','):
+                session.send(ACCOUNT_SUMMARY, 1, req_id, self.account, tag, '1000000.0', 'USD')
+            session.send(ACCOUNT_SUMMARY_END, 1, req_id)
+        elif message_id in (REQ_MARKET_DATA_TYPE, CANCEL_HISTORICAL_DATA):
+            pass
+        else:
+            logger.debug(f"FakeTWS ignored message {message_id}")
+
+    def _historical_data(self, session, fields):
+        # fields: id, reqId, conId, symbol, secType, ..., tradingClass, includeExpired, endDateTime, barSize,
+        # durationStr, useRTH, whatToShow, formatDate, keepUpToDate, chartOptions
+        req_id, symbol = int(fields[1]), fields[3]
+        end_date_time, bar_size, duration, format_date = fields[15], fields[16], fields[17], int(fields[20])
+        if bar_size.strip() != '5 secs':
+            session.error(req_id, 162, "Historical Market Data Service error message:"
+                                       f"FakeTWS has no {bar_size} bars, only 5 secs")
+            return
+        count, unit = duration.split()
+        end = parse_end_time(end_date_time)
+        start = end - int(count) * DURATION_UNITS[unit]
+
+        arrays = self._bar_arrays(symbol)
+        first, last = np.searchsorted(arrays['DateTime'], [start, end])
+        if first == last:
+            session.error(req_id, 162, "Historical Market Data Service error message:HMDS query returned no data")
+            return
+        message = [HISTORICAL_DATA, req_id, time.strftime('%Y%m%d  %H:%M:%S', time.localtime(start)),
+                   time.strftime('%Y%m%d  %H:%M:%S', time.localtime(end)), last - first]
+        for i in range(first, last):
+            date_time = int(arrays['DateTime'][i])
+            date = str(date_time) if format_date == 2 else time.strftime('%Y%m%d  %H:%M:%S',
+                                                                          time.localtime(date_time))
+            message += [date, arrays['Open'][i], arrays['High'][i], arrays['Low'][i], arrays['Close'][i],
+                        int(arrays['Volume'][i]), arrays['Average'][i], int(arrays['Count'][i])]
+        session.send(*message)
+
+    def _real_time_bars(self, session, fields):
+        # fields: id, version, reqId, conId, symbol, ...
+        req_id, symbol = int(fields[2]), fields[4]
+        stop = session.replays[req_id] = threading.Event()
+        threading.Thread(target=self._replay, args=(session, req_id, symbol, stop),
+                         name=f'FakeTWS-Replay-{symbol}', daemon=True).start()
+
+    def _replay(self, session, req_id, symbol, stop):
+        arrays = self._bar_arrays(symbol)
+        first = 0 if self.replay_start is None else int(np.searchsorted(arrays['DateTime'], self.replay_start))
+        interval = None if not self.speed else 5.0 / self.speed
+        next_time = time.monotonic()
+        for i in range(first, len(arrays['DateTime'])):
+            if stop.is_set() or session.closed.is_set():
+                return
+            if interval is not None:
+                next_time += interval
+                delay = next_time - time.monotonic()
+                if delay > 0 and stop.wait(delay):
+                    return
+            close = arrays['Close'][i]
+            self._last_prices[symbol] = float(close)
+            session.send(REAL_TIME_BARS, 3, req_id, int(arrays['DateTime'][i]), arrays['Open'][i],
+                         arrays['High'][i], arrays['Low'][i], close, int(arrays['Volume'][i]),
+                         arrays['Average'][i], int(arrays['Count'][i]))
+            self.bars_sent += 1
+            # Resting orders whose price is crossed by this bar are filled
+            with self._lock:
+                resting = list(self._resting.get(symbol, ()))
+            for order_id in resting:
+                self._fill(order_id)
+
+    def _place_order(self, session, fields):
+        # fields: id, orderId, conId, symbol, secType, ..., secId, action, totalQuantity, orderType, lmtPrice,
+        # auxPrice, ...
+        order_id, symbol = int(fields[1]), fields[3]
+        action, quantity, order_type = fields[16], float(fields[17]), fields[18]
+        # LMT orders fill at or below (buy) / above (sell) lmtPrice, MIT orders once auxPrice is touched
+        price_field = {'LMT': fields[19], 'MIT': fields[20]}.get(order_type)
+        limit = float(price_field) if price_field else None
+        with self._lock:
+            if order_id in self._orders:
+                duplicated = True
+            else:
+                duplicated = False
+                self._orders[order_id] = {'session': session, 'symbol': symbol, 'action': action.upper(),
+                                          'quantity': quantity, 'order_type': order_type, 'limit': limit,
+                                          'status': 'Submitted'}
+                self._next_order_id = max(self._next_order_id, order_id + 1)
+        if duplicated:
+            session.error(order_id, 103, "Duplicate order id")
+            return
+        session.send(ORDER_STATUS, order_id, 'Submitted', 0, quantity, 0, order_id, 0, 0, session.client_id, '', 0)
+        if self.fill_delay > 0:
+            threading.Timer(self.fill_delay, self._fill, args=(order_id,)).start()
+        else:
+            self._fill(order_id)
+
+    def _price(self, symbol):
+        # Last replayed close, before the first replayed bar the close of the last bar before replay_start
+        price = self._last_prices.get(symbol)
+        if price is None:
+            arrays = self._bar_arrays(symbol)
+            last = len(arrays['DateTime']) if self.replay_start is None else \
+                int(np.searchsorted(arrays['DateTime'], self.replay_start))
+            price = float(arrays['Close'][last - 1]) if last > 0 else 1.0
+        return price
+
+    def _fill(self, order_id):
+        with self._lock:
+            symbol = self._orders[order_id]['symbol']
+        price = self._price(symbol)
+        with self._lock:
+            order = self._orders[order_id]
+            if order['status'] != 'Submitted':
+                return
+            limit = order['limit']
+            if limit is not None and (price > limit if order['action'] == 'BUY' else price < limit):
+                # Not crossed, the order waits for a replayed bar which crosses it
+                self._resting.setdefault(symbol, set()).add(order_id)
+                return
+            self._resting.get(symbol, set()).discard(order_id)
+            order['status'] = 'Filled'
+            signed = order['quantity'] if order['action'] == 'BUY' else -order['quantity']
+            key = (self.account, order['symbol'])
+            position = self._positions.get(key, (0.0, 0.0))[0] + signed
+            self._positions[key] = (position, price)
+            position_sessions = list(self._position_sessions)
+            self.orders_filled += 1
+        session = order['session']
+        session.send(ORDER_STATUS, order_id, 'Filled', order['quantity'], 0, price, order_id, 0, price,
+                     session.client_id, '', 0)
+        for position_session in position_sessions:
+            self._send_position(position_session, self.account, order['symbol'], position, price)
+
+    def _cancel_order(self, session, order_id):
+        with self._lock:
+            order = self._orders.get(order_id)
+            cancellable = order is not None and order['status'] == 'Submitted'
+            if cancellable:
+                order['status'] = 'Cancelled'
+                self._resting.get(order['symbol'], set()).discard(order_id)
+        if cancellable:
+            session.send(ORDER_STATUS, order_id, 'Cancelled', 0, order['quantity'], 0, order_id, 0, 0,
+                         session.client_id, '', 0)
+        else:
+            session.error(order_id, 161, "Cancel attempted when order is not in a cancellable state")
+
+    def _send_position(self, session, account, symbol, position, avg_cost=0.0):
+        # version 3: account, contract fields, position, avgCost
+        session.send(POSITION_DATA, 3, account, 0, symbol, 'CASH', '', 0.0, '', '', 'IDEALPRO', 'USD',
+                     symbol + '.USD', symbol + '.USD', position, avg_cost)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'clients': len(self._sessions), 'bars_sent': self.bars_sent,
+                    'orders_filled': self.orders_filled, 'orders': len(self._orders)}
+
+
+if __name__ == '__main__':
+    # Serve the stored bars on the paper trading port, 10 times faster than real time
+    server = FakeTWS(port=7497, speed=10.0).start()
+    while True:
+        time.sleep(10)
+        print(server.stats())
@@ -0,0 +1,132 @@
+"""
+Author: Rosenyoung
+This module is a read-through cache in front of DataBaseConn.read_historical_data, used by strategies to warm up
+when the BarRing of DataAPI has no bars. Later reads only fetch the rows newer than the cached ones.
+Call invalidate() after a backfill of older bars.
+
+Version 1.0 2026-10-18
+Version 1.1 2026-10-18
+The database is read outside the lock, the rows are merged into the cache under it.
+"""
+
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+from sqlalchemy import text
+
+from DataBaseConn import DataBaseConn
+
+NEW_ROWS_SQL = """
+    SELECT * FROM fivesecondbar
+    WHERE Contract = :symbol AND `DateTime` > :last_time
+    ORDER BY `DateTime`
+"""
+
+
+class HistoricalDataCache:
+    def __init__(self, database_conn: DataBaseConn = None, max_symbols: int = 50,
+                 max_bytes: int = 256 * 1024 * 1024):
+        """
+        database_conn: DataBaseConn - Used to query the database, a new one if None
+        max_symbols: int - Max number of symbols kept in the cache
+        max_bytes: int - Max memory of the cached DataFrames
+        """
+        self.database_conn = database_conn if database_conn is not None else DataBaseConn()
+        self.max_symbols = max_symbols
+        self.max_bytes = max_bytes
+
+        # symbol -> [DataFrame, capacity, bytes], in least recently used order.
+        # capacity is the largest length requested, the cached DataFrame keeps at most this many rows.
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        self._hits = 0
+        self._misses = 0
+        self._rows_fetched = 0
+        self._evictions = 0
+
+    def read_historical_data(self, length=2880, symbol='EUR') -> pd.DataFrame:
+        """
+        Same result as DataBaseConn.read_historical_data(length, symbol), the last length rows in time order.
+        """
+        with self._lock:
+            entry = self._entries.get(symbol)
+            hit = entry is not None and length <= entry[1]
+            cached, capacity = (entry[0], entry[1]) if hit else (None, length)
+
+        # The database is read outside the lock, other symbols and threads are not blocked by the query
+        if hit and len(cached) > 0:
+            # Hit: only read the rows newer than the cache
+            new_df = pd.read_sql_query(text(NEW_ROWS_SQL), self.database_conn.engine,
+                                       params={'symbol': symbol, 'last_time': int(cached['DateTime'].iloc[-1])})
+            fetched = len(new_df)
+            df = pd.concat([cached, new_df], ignore_index=True).tail(capacity) if fetched > 0 else cached
+        else:
+            # Miss: read the whole window
+            df = self.database_conn.read_historical_data(capacity, symbol)
+            fetched = len(df)
+
+        with self._lock:
+            df, capacity = self._merge(symbol, df, capacity)
+            self._rows_fetched += fetched
+            if hit:
+                self._hits += 1
+            else:
+                self._misses += 1
+            self._store(symbol, df, capacity)
+            return df.tail(length).reset_index(drop=True).copy()
+
+    def _merge(self, symbol, df, capacity):
+        # Another thread may have cached the symbol while df was read, keep the longer window and add the newer rows
+        entry = self._entries.get(symbol)
+        if entry is None:
+            return df.reset_index(drop=True), capacity
+        other = entry[0]
+        if entry[1] > capacity:
+            df, other, capacity = entry[0], df, entry[1]
+        if len(other) > 0:
+            last_time = df['DateTime'].iloc[-1] if len(df) > 0 else -1
+            newer = other[other['DateTime'] > last_time]
+            if len(newer) > 0:
+                df = pd.concat([df, newer], ignore_index=True).tail(capacity)
+        return df.reset_index(drop=True), capacity
+
+    def _store(self, symbol, df, capacity):
+        # Put a DataFrame into the cache, then evict least recently used symbols above the limits
+        entry = self._entries.pop(symbol, None)
+        if entry is not None:
+            self._bytes -= entry[2]
+        size = int(df.memory_usage(index=True, deep=True).sum())
+        self._entries[symbol] = [df, capacity, size]
+        self._bytes += size
+        while len(self._entries) > 1 and (len(self._entries) > self.max_symbols or self._bytes > self.max_bytes):
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= evicted[2]
+            self._evictions += 1
+
+    def invalidate(self, symbol: str = None):
+        # Drop the cache of a symbol, or of all symbols if None
+        with self._lock:
+            if symbol is None:
+                self._entries.clear()
+                self._bytes = 0
+            else:
+                entry = self._entries.pop(symbol, None)
+                if entry is not None:
+                    self._bytes -= entry[2]
+
+    def stats(self) -> dict:
+        # Hit/miss counters and memory usage of the cache
+        with self._lock:
+            calls = self._hits + self._misses
+            return {
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_rate': self._hits / calls if calls else 0.0,
+                'rows_fetched': self._rows_fetched,
+                'evictions': self._evictions,
+                'symbols': len(self._entries),
+                'bytes': self._bytes,
+            }
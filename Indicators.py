@@ -0,0 +1,85 @@
+"""
+Author: Rosenyoung
+This module contains incremental indicators for live strategies.
+Each indicator keeps its own state and is updated once per new bar in constant time, no DataFrame is created.
+
+Version 1.0 2026-10-18
+Rolling mean over a ring buffer and a moving average crossover state
+"""
+
+
+class RollingMean:
+    def __init__(self, period: int):
+        """
+        period: int - Number of values in the window
+        The mean is maintained by a running sum over a fixed-size ring buffer.
+        """
+        if period < 1:
+            raise ValueError("period must be a positive integer")
+        self.period = period
+        self._buffer = [0.0] * period
+        self._index = 0
+        self._count = 0
+        self._sum = 0.0
+
+    def update(self, value: float):
+        """
+        Add a new value, drop the oldest one and return the current mean (None until the window is full).
+        """
+        value = float(value)
+        self._sum += value - self._buffer[self._index]
+        self._buffer[self._index] = value
+        self._index += 1
+        if self._index == self.period:
+            self._index = 0
+            # Recompute the sum once per cycle so floating point error does not accumulate
+            self._sum = sum(self._buffer)
+        if self._count < self.period:
+            self._count += 1
+        return self.value
+
+    @property
+    def ready(self) -> bool:
+        return self._count == self.period
+
+    @property
+    def value(self):
+        if not self.ready:
+            return None
+        return self._sum / self.period
+
+
+class MovingAverageCross:
+    def __init__(self, short_period: int, long_period: int):
+        """
+        short_period - The shorter period for calculating moving average
+        long_period - The longer period for calculating moving average
+        Keep the short and long moving average of current bar and previous bar.
+        """
+        self.short_ma = RollingMean(short_period)
+        self.long_ma = RollingMean(long_period)
+
+        self.ma_s = None
+        self.ma_l = None
+        self.ma_s_previous = None
+        self.ma_l_previous = None
+
+    def update(self, close: float):
+        # Feed the close price of one new bar
+        self.ma_s_previous = self.ma_s
+        self.ma_l_previous = self.ma_l
+        self.ma_s = self.short_ma.update(close)
+        self.ma_l = self.long_ma.update(close)
+
+    @property
+    def ready(self) -> bool:
+        # True if the moving averages of both current and previous bar are available
+        return self.ma_l_previous is not None and self.ma_s_previous is not None
+
+    def crossed_up(self) -> bool:
+        # Short moving average crosses above the long one at current bar
+        return self.ready and self.ma_s > self.ma_l and self.ma_s_previous < self.ma_l_previous
+
+    def crossed_down(self) -> bool:
+        # Short moving average crosses below the long one at current bar
+        return self.ready and self.ma_s < self.ma_l and self.ma_s_previous > self.ma_l_previous
@@ -0,0 +1,184 @@
+"""
+Author: Rosenyoung
+This module measures the tick-to-trade latency of the live path.
+
+Every real-time bar starts a trace keyed by (symbol, bar time). Each hop marks a stage with perf_counter_ns:
+
+    bar_received (DataAPI.realtimeBar) -> bar_published -> bar_dequeued (strategy) -> decision
+    -> order_sent (Orders.placeOrder) -> first_status (first Orders.orderStatus)
+
+An order ID is linked to the trace of the bar which triggered it, so the order stages continue that trace.
+The time between two consecutive stages, and from the first stage to every later one, is recorded in a
+histogram with about 6% resolution. A record is a few dict operations, cheap enough for every bar.
+snapshot() returns count/p50/p99/max per histogram, export() appends it to a JSON lines file.
+
+Version 1.0 2026-10-18
+"""
+
+import json
+import threading
+import time
+from collections import OrderedDict
+
+# Values below 2 ** (SUB_BITS + 1) ns have their own bucket, above that every power of two has 2 ** SUB_BITS buckets
+SUB_BITS = 4
+
+
+class LatencyHistogram:
+    def __init__(self):
+        # bucket -> number of values
+        self.counts = {}
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    @staticmethod
+    def bucket(value: int) -> int:
+        if value < 2 << SUB_BITS:
+            return value
+        shift = value.bit_length() - SUB_BITS - 1
+        return ((shift + 1) << SUB_BITS) | ((value >> shift) & ((1 << SUB_BITS) - 1))
+
+    @staticmethod
+    def bucket_value(bucket: int) -> int:
+        # Middle of the range of a bucket
+        if bucket < 2 << SUB_BITS:
+            return bucket
+        shift = (bucket >> SUB_BITS) - 1
+        low = ((1 << SUB_BITS) | (bucket & ((1 << SUB_BITS) - 1))) << shift
+        return low + (1 << shift) // 2
+
+    def record(self, value: int):
+        value = max(int(value), 0)
+        bucket = self.bucket(value)
+        self.counts[bucket] = self.counts.get(bucket, 0) + 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, percent: float) -> int:
+        if self.count == 0:
+            return 0
+        rank = max(int(self.count * percent / 100.0 + 0.5), 1)
+        seen = 0
+        for bucket in sorted(self.counts):
+            seen += self.counts[bucket]
+            if seen >= rank:
+                return min(self.bucket_value(bucket), self.max)
+        return self.max
+
+    def summary(self) -> dict:
+        # Count and latency in microseconds
+        return {
+            'count': self.count,
+            'p50_us': self.percentile(50) / 1000.0,
+            'p99_us': self.percentile(99) / 1000.0,
+            'max_us': self.max / 1000.0,
+            'mean_us': self.total / self.count / 1000.0 if self.count else 0.0,
+        }
+
+
+class LatencyTracker:
+    def __init__(self, max_traces: int = 10000, enabled: bool = True):
+        """
+        max_traces: int - Max number of open traces, the oldest is dropped above it
+        enabled: bool - mark() does nothing if False
+        """
+        self.max_traces = max_traces
+        self.enabled = enabled
+
+        # trace key -> [(stage, perf_counter_ns)], in the order the traces started
+        self._traces = OrderedDict()
+        # order ID -> trace key
+        self._links = {}
+        # 'stage_a->stage_b' -> LatencyHistogram
+        self._histograms = {}
+        self._lock = threading.Lock()
+        self._exporter = None
+        self._stop = threading.Event()
+
+    def mark(self, key, stage: str, start: bool = False, final: bool = False):
+        """
+        Mark a stage of a trace now.
+        key - (symbol, bar time) of a bar or an order ID linked by link()
+        start: bool - Start a new trace, other stages of unknown keys are ignored
+        final: bool - Close the trace after this stage
+        """
+        if not self.enabled:
+            return
+        now = time.perf_counter_ns()
+        with self._lock:
+            key = self._links.get(key, key)
+            if start:
+                trace = self._traces[key] = [(stage, now)]
+                if len(self._traces) > self.max_traces:
+                    self._drop(next(iter(self._traces)))
+            else:
+                trace = self._traces.get(key)
+                if trace is None:
+                    return
+                first_stage, first_time = trace[0]
+                last_stage, last_time = trace[-1]
+                self._record(f'{last_stage}->{stage}', now - last_time)
+                if len(trace) > 1:
+                    self._record(f'{first_stage}->{stage}', now - first_time)
+                trace.append((stage, now))
+            if final:
+                self._drop(key)
+
+    def _record(self, name, value):
+        histogram = self._histograms.get(name)
+        if histogram is None:
+            histogram = self._histograms[name] = LatencyHistogram()
+        histogram.record(value)
+
+    def _drop(self, key):
+        # Close a trace and the links to it. Must hold the lock.
+        self._traces.pop(key, None)
+        for order_id in [order_id for order_id, linked in self._links.items() if linked == key]:
+            del self._links[order_id]
+
+    def link(self, order_id: int, key):
+        # Continue the trace of key with the stages marked by order_id
+        if not self.enabled:
+            return
+        with self._lock:
+            if key in self._traces:
+                self._links[order_id] = key
+
+    def snapshot(self) -> dict:
+        # 'stage_a->stage_b' -> count, p50_us, p99_us, max_us, mean_us
+        with self._lock:
+            return {name: histogram.summary() for name, histogram in sorted(self._histograms.items())}
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+
+    def export(self, path: str):
+        # Append the current snapshot to a JSON lines file
+        record = {'time': time.strftime('%Y-%m-%d %H:%M:%S'), 'open_traces': len(self._traces),
+                  'stages': self.snapshot()}
+        with open(path, 'a') as file:
+            file.write(json.dumps(record) + '\n')
+
+    def start_exporter(self, path: str, interval: float = 60.0):
+        # Export a snapshot every interval seconds from a background thread
+        def run():
+            while not self._stop.wait(interval):
+                self.export(path)
+
+        self._stop.clear()
+        self._exporter = threading.Thread(target=run, name='LatencyExporter', daemon=True)
+        self._exporter.start()
+
+    def stop_exporter(self):
+        self._stop.set()
+        if self._exporter is not None:
+            self._exporter.join()
+            self._exporter = None
+
+
+# Tracker shared by DataAPI, Orders and the strategies of one process
+LATENCY = LatencyTracker()
@@ -6,16 +6,29 @@ Version 1.0 2022-04-07
 This is a sample strategy
 Version 1.1 2022-04-09
 Add a loguru module to create log files
+Version 1.2 2026-10-18
+Moving averages are updated incrementally by Indicators.MovingAverageCross, constant cost per bar
+The strategy blocks on a queue of bars published by DataAPI instead of polling every 5 seconds
+Current position is read from Orders.position_book instead of the position table
+Historical data is read through HistoricalDataCache, later reads only fetch the new bars
+Every bar and the order it triggers are marked in the latency tracker, exported to ../logs/latency.jsonl
+Order IDs are allocated by Orders from nextValidId instead of the current time
+Fills are reported by the OrderHandle of the order
+Startup waits for the TWS connections and the historical data instead of fixed sleeps
+MovingAverageCrossStrategy runs the same rule inside StrategyHost, many variants share one feed and gateway
+The moving averages are warmed up from the BarRing of DataAPI instead of a DataFrame read from the database
 """
 
+import queue
 import time
 
 from DataAPI import DataAPI
 from Orders import Orders
 
-import pandas as pd
-
 from DataBaseConn import DataBaseConn
+from HistoricalCache import HistoricalDataCache
+from Indicators import MovingAverageCross
+from Latency import LATENCY
 
 from loguru import logger
 logger.add("..\logs\\MASampleStrategy_{time}.log", rotation="00:00")
@@ -38,102 +51,151 @@ class MovingAverageStrategy:
         self.data_api = DataAPI(self.symbol, self.contract_type)
         self.order_api = Orders(self.contract_type)
         self.database_conn = DataBaseConn()
+        # Read-through cache of historical data, only new bars are fetched after the first read
+        self.historical_cache = HistoricalDataCache(self.database_conn)
 
-        time.sleep(5)
+        # Wait for both connections instead of a fixed sleep
+        self.data_api.control.wait(30)
+        self.order_api.control.wait(30)
         # Update historical data
         self.data_api.request_historical_bar()
         self.data_api.historical_to_database()
+        # Real-time bars are put into this queue by DataAPI as soon as they arrive
+        self.bar_queue = self.data_api.subscribe(symbols=[self.symbol])
         # Update real-time data
         self.data_api.request_realtime_bar()
 
     def run(self):
-        time.sleep(5)
-        # Read historical data from database
-        historical_df = self.database_conn.read_historical_data(symbol=self.symbol)
-        # updating_df is a dataframe refreshing every 5 seconds
-        updating_df = historical_df.tail(100)
+        # Latest bars from the ring of DataAPI (a zero-copy view), enough to fill the long moving average window.
+        # The database is read only if the ring is empty.
+        length = max(2880, self.long_period + 1)
+        history = self.data_api.rings[self.symbol].window(length)
+        if len(history) == 0:
+            history = self.historical_cache.read_historical_data(length=length, symbol=self.symbol).to_records()
+        # The moving averages are updated once per new bar in constant time
+        ma_cross = MovingAverageCross(self.short_period, self.long_period)
+        for close in history['Close']:
+            ma_cross.update(close)
+        # Time of the last bar fed to ma_cross, used to skip bars which have been processed
+        last_bar_time = int(history['DateTime'][-1]) if len(history) > 0 else 0
 
         # Check contract type
         contract = self.order_api.fx_contract(self.symbol)
         if self.contract_type == 'STK':
             contract = self.order_api.stock_contract(self.symbol)
 
-        # Define position status, 1 for long, -1 for short and 0 for empty
-        position_status = 0
-
-        # Define the timecount, stop the process and clear position after 4 hours
-        timecount = 0
+        # Stop the process and clear position after 4 hours
+        stop_time = time.time() + 14400
+        # Latency percentiles of every stage, once a minute
+        LATENCY.start_exporter('..\\logs\\latency.jsonl', interval=60)
 
         while True:
-            # Get real-time bar data
-            realtime_df = self.data_api.dataframe
-            # concat the real-time data to updating_df
-            updating_df = pd.concat([updating_df, realtime_df]).tail(100)
-            print(updating_df.tail(5))
-
-            # Create order ID
-            orderId = int(time.time())
-
-            # Calculate the current moving average
-            ma_s = updating_df['Close'][-self.short_period:].mean()
-            ma_l = updating_df['Close'][-self.long_period:].mean()
-
-            # Calculate the moving average of previous tick
-            s_previous = self.short_period + 1
-            l_previous = self.long_period + 1
-            ma_s_previous = updating_df['Close'][-s_previous:-1].mean()
-            ma_l_previous = updating_df['Close'][-l_previous:-1].mean()
-
-            # Get current position status
-            current_postion_sql = f""" SELECT
-                                                            position 
-                                                        FROM
-                                                            position 
-                                                        WHERE
-                                                            contract = '{self.symbol}' 
-                                                            AND `timestamp` = (
-                                                                SELECT
-                                                                    MAX( `timestamp` ) 
-                                                                FROM
-                                                                    position 
-                                                                WHERE
-                                                                contract = '{self.symbol}')
-                                """
-            self.database_conn.cur.execute(current_postion_sql)
-            self.database_conn.conn.commit()
-            current_position = self.database_conn.cur.fetchone()[0]
-            print("Current position: " + str(current_position))
-            if current_position > 0:
-                position_status = 1
-            elif current_position < 0:
-                position_status = -1
-            else:
-                position_status = 0
-            print("position status:" + str(position_status))
-
-            # The main strategy
-            if (ma_s > ma_l) & (ma_s_previous < ma_l_previous):
-                 if position_status != 1:
-                    order = self.order_api.MarketOrder('buy', 100000+abs(current_position))
-                    self.order_api.placeOrder(orderId, contract, order)
-                    logger.info(f"Create a long order: OrderID : {orderId}")
-
-            elif (ma_s < ma_l) & (ma_s_previous > ma_l_previous):
-                 if position_status != -1:
-                    order = self.order_api.MarketOrder('sell', 100000+abs(current_position))
-                    self.order_api.placeOrder(orderId, contract, order)
-                    logger.info(f"Create a short order: OrderID : {orderId}")
-
-            time.sleep(5)
-            timecount +=5
+            # Block until the next real-time bar arrives or the strategy should stop
+            try:
+                bar = self.bar_queue.get(timeout=max(stop_time - time.time(), 0))
+            except queue.Empty:
+                bar = None
+
+            # Skip bars which are already in the moving averages
+            if bar is not None and bar['DateTime'] > last_bar_time:
+                bar_key = (bar['Contract'], bar['DateTime'])
+                LATENCY.mark(bar_key, 'bar_dequeued')
+                last_bar_time = bar['DateTime']
+                ma_cross.update(bar['Close'])
+                print(bar)
+                if ma_cross.ready:
+                    self.on_bar(ma_cross, contract, bar_key)
+                else:
+                    LATENCY.mark(bar_key, 'decision', final=True)
 
             # Stop after 4 hours and clear the position
-            if timecount > 14400:
+            if time.time() >= stop_time:
+                self.data_api.unsubscribe(self.bar_queue)
                 self.order_api.clear_position(self.symbol)
+                LATENCY.stop_exporter()
+                LATENCY.export('..\\logs\\latency.jsonl')
                 logger.info("Stop the strategy")
                 time.sleep(5)
                 break
 
+    def on_bar(self, ma_cross, contract, bar_key=None):
+        """
+        Check the moving average crossover of the new bar and place orders.
+        ma_cross - MovingAverageCross updated with the new bar
+        bar_key - (symbol, bar time) of the latency trace of the bar
+        """
+        # Get current position status from the in-memory position book of Orders
+        current_position = self.order_api.position_book.get(self.symbol)
+        print("Current position: " + str(current_position))
+        if current_position > 0:
+            position_status = 1
+        elif current_position < 0:
+            position_status = -1
+        else:
+            position_status = 0
+        print("position status:" + str(position_status))
+
+        # The main strategy
+        if ma_cross.crossed_up() and position_status != 1:
+            order = self.order_api.MarketOrder('buy', 100000+abs(current_position))
+            handle = self.send_order(contract, order, bar_key)
+            logger.info(f"Create a long order: OrderID : {handle.order_id}")
+
+        elif ma_cross.crossed_down() and position_status != -1:
+            order = self.order_api.MarketOrder('sell', 100000+abs(current_position))
+            handle = self.send_order(contract, order, bar_key)
+            logger.info(f"Create a short order: OrderID : {handle.order_id}")
+
+        else:
+            LATENCY.mark(bar_key, 'decision', final=True)
+
+    def send_order(self, contract, order, bar_key):
+        # Place an order with a new ID from Orders and return its OrderHandle.
+        # Link the order to the trace of its bar, Orders marks order_sent and first_status
+        LATENCY.mark(bar_key, 'decision')
+        orderId = self.order_api.next_order_id()
+        LATENCY.link(orderId, bar_key)
+        handle = self.order_api.submit_order(orderId, self.symbol, contract, order)
+        handle.add_done_callback(self.on_order_done)
+        return handle
+
+    def on_order_done(self, handle):
+        # Called by Orders as soon as an order is filled, cancelled or rejected
+        logger.info(f"Order {handle.order_id} {handle.status}: Filled : {handle.filled}, "
+                    f"AvgPrice : {handle.avg_fill_price}")
+
+
+class MovingAverageCrossStrategy:
+    def __init__(self, symbol: str, short_period: int, long_period: int, amount: float = 100000):
+        """
+        The moving average crossover of MovingAverageStrategy as a strategy of StrategyHost, which provides the
+        bars and the orders. The position is the position of this strategy only (context.position).
+        amount: float - Size of a new position
+        """
+        self.symbol = symbol
+        self.short_period = short_period
+        self.long_period = long_period
+        self.amount = amount
+        self.history_length = max(2880, long_period + 1)
+        self.ma_cross = MovingAverageCross(short_period, long_period)
+
+    def warm_up(self, history):
+        # history - latest bars, a BarRing window or a DataFrame
+        for close in history['Close']:
+            self.ma_cross.update(close)
+
+    def on_bar(self, bar, context):
+        self.ma_cross.update(bar['Close'])
+        if not self.ma_cross.ready:
+            return
+        position = context.position
+        if self.ma_cross.crossed_up() and position <= 0:
+            context.place_order('MKT', 'buy', self.amount + abs(position))
+        elif self.ma_cross.crossed_down() and position >= 0:
+            context.place_order('MKT', 'sell', self.amount + abs(position))
+
+    def on_order_done(self, handle, context):
+        logger.info(f"{context.name}: Order {handle.order_id} {handle.status}, Position : {context.position}")
 
 
 if __name__ == "__main__":
@@ -4,22 +4,28 @@ Author: Rosenyoung
 This is a backtesting sample of moving average strategy
 
 Version 1.0 2022-05-02
+Version 1.1 2026-10-18
+Data preparation and cerebro setup are functions, so other modules can run the same backtest
+Version 1.2 2026-10-18
+The DateTime column is converted by the vectorized epoch_to_datetime instead of per row, stamp2time is removed.
+StreamingBarFeed reads the bars chunk by chunk from the database for histories larger than memory.
 
 """
 
 import pandas as pd
 import backtrader as bt
-import time
 
-from DataBaseConn import DataBaseConn
+from DataBaseConn import DataBaseConn, epoch_to_datetime
 
 
 class SmaStrategy(bt.Strategy):
     # params = (('short_window',10),('long_window',60))
-    params = {"short_window": 10, "long_window": 60}
+    params = {"short_window": 10, "long_window": 60, "printlog": True}
 
     def log(self, txt, dt=None):
-        # Log the backtesting information
+        # Log the backtesting information, printlog=False keeps optimization runs quiet
+        if not self.p.printlog:
+            return
         dt = dt or self.datas[0].datetime.date(0)
         print('%s, %s' % (dt.isoformat(), txt))
 
@@ -89,56 +95,119 @@ class SmaStrategy(bt.Strategy):
 
 
 
-if __name__ == '__main__':
+# Params for data feeding
+FEED_PARAMS = dict(
+    # fromdate=datetime.datetime(2006, 10, 27),
+    # todate=datetime.datetime(2020, 8, 14),
+    timeframe=bt.TimeFrame.Seconds,
+    compression=1,
+    dtformat=('%Y-%m-%d'),
+    tmformat=('%H:%M:%S'),
+    datetime=0,
+    open=1,
+    high=2,
+    low=3,
+    close=4,
+    volume=-1,
+    openinterest=-1)
+
+
+def prepare_feed_data(df):
+    """
+    Transform the rows of fivesecondbar into the DataFrame fed to backtrader
+    """
+    df = df.sort_values('DateTime')
+    # Transform the timestamp into local datetime, vectorized
+    feed_df = pd.DataFrame({'open': df['Open'].to_numpy(), 'high': df['High'].to_numpy(),
+                            'low': df['Low'].to_numpy(), 'close': df['Close'].to_numpy(),
+                            'volume': df['Volume'].to_numpy(), 'openinterest': df['Average'].to_numpy()},
+                           index=epoch_to_datetime(df['DateTime']))
+    feed_df.index.name = 'datetime'
+    return feed_df
+
+
+def load_feed_data(symbol='EUR', start=None, end=None, chunksize=50000):
+    """
+    Read the bars of a symbol chunk by chunk and build the DataFrame fed to backtrader.
+    Only one chunk of raw rows is in memory at a time, the result holds numbers only.
+    """
+    chunks = [prepare_feed_data(chunk) for chunk in
+              DataBaseConn().stream_historical_data(symbol, start, end, chunksize)]
+    if not chunks:
+        return prepare_feed_data(pd.DataFrame(columns=['DateTime', 'Open', 'High', 'Low', 'Close', 'Volume',
+                                                       'Average']))
+    return pd.concat(chunks)
+
+
+class StreamingBarFeed(bt.feed.DataBase):
+    """
+    Data feed which pulls the bars from the database chunk by chunk while backtrader runs.
+    Run cerebro with cerebro.run(preload=False, runonce=False), then at most one chunk is in memory.
+    """
+    params = (('symbol', 'EUR'), ('start', None), ('end', None), ('chunksize', 50000),
+              ('timeframe', bt.TimeFrame.Seconds), ('compression', 1))
+
+    def start(self):
+        super().start()
+        self._chunks = DataBaseConn().stream_historical_data(self.p.symbol, self.p.start, self.p.end,
+                                                             self.p.chunksize)
+        self._rows = iter(())
+
+    def _next_chunk(self):
+        chunk = next(self._chunks, None)
+        if chunk is None:
+            return False
+        # Convert the whole chunk at once. backtrader dates are days since 0001-01-01, 719163 is 1970-01-01
+        local_seconds = epoch_to_datetime(chunk['DateTime']).values.astype('datetime64[s]').astype('int64')
+        dates = local_seconds / 86400.0 + 719163.0
+        self._rows = zip(dates.tolist(), chunk['Open'].tolist(), chunk['High'].tolist(),
+                         chunk['Low'].tolist(), chunk['Close'].tolist())
+        return True
+
+    def _load(self):
+        row = next(self._rows, None)
+        while row is None:
+            if not self._next_chunk():
+                return False
+            row = next(self._rows, None)
+        self.lines.datetime[0], self.lines.open[0], self.lines.high[0], self.lines.low[0], self.lines.close[0] = row
+        return True
+
+
+def create_cerebro(feed_df, short_window=10, long_window=60, name="EUR", printlog=True):
+    """
+    Create a cerebro object with the SmaStrategy, the data feed and the broker settings of this sample
+    feed_df - DataFrame from prepare_feed_data, or a backtrader feed such as StreamingBarFeed
+    """
     # Create a cerebro object, which is the core of backtrader
     cerebro = bt.Cerebro()
     # Add the strategy
-    cerebro.addstrategy(SmaStrategy)
-    # Params for data feeding
-    params = dict(
-        # fromdate=datetime.datetime(2006, 10, 27),
-        # todate=datetime.datetime(2020, 8, 14),
-        timeframe=bt.TimeFrame.Seconds,
-        compression=1,
-        dtformat=('%Y-%m-%d'),
-        tmformat=('%H:%M:%S'),
-        datetime=0,
-        open=1,
-        high=2,
-        low=3,
-        close=4,
-        volume=-1,
-        openinterest=-1)
-
-    # Transform the timestamp into datetime
-    def stamp2time(timestamp):
-
-        time_local = time.localtime(timestamp)
-
-        dt = time.strftime("%Y-%m-%d %H:%M:%S", time_local)
-
-        return dt
-    # Acquire data from database
-    data_conn = DataBaseConn()
-    df = data_conn.read_historical_data(86400, 'EUR')
-    data_conn.close_conn()
-    # Transform the timestamp into datetime
-    df['DateTime'] = df['DateTime'].apply(stamp2time)
-    # Data processing
-    df = df[['DateTime', 'Open', 'High', 'Low', 'Close', 'Volume', 'Average']]
-    df.columns = ['datetime', 'open', 'high', 'low', 'close', 'volume', 'openinterest']
-    df = df.sort_values("datetime")
-    df.index = pd.to_datetime(df['datetime'])
-    df = df[['open', 'high', 'low', 'close', 'volume', 'openinterest']]
+    cerebro.addstrategy(SmaStrategy, short_window=short_window, long_window=long_window, printlog=printlog)
     # Feed the data
-    feed = bt.feeds.PandasDirectData(dataname=df, **params)
-    cerebro.adddata(feed, name="EUR")
+    if isinstance(feed_df, bt.feed.DataBase):
+        feed = feed_df
+    else:
+        feed = bt.feeds.PandasDirectData(dataname=feed_df, **FEED_PARAMS)
+    cerebro.adddata(feed, name=name)
     # Set commission.
     cerebro.broker.setcommission(commission=0.00002)
     # Set the fund size
     cerebro.broker.setcash(100000.0)
+    return cerebro
+
+
+if __name__ == '__main__':
+    # Acquire data from database
+    data_conn = DataBaseConn()
+    df = data_conn.read_historical_data(86400, 'EUR')
+    data_conn.close_conn()
+
+    cerebro = create_cerebro(prepare_feed_data(df))
+    # For a history larger than memory, stream it instead:
+    # cerebro = create_cerebro(StreamingBarFeed(symbol='EUR'))
+    # cerebro.run(preload=False, runonce=False)
 
     cerebro.run()
 
     # Plot the results
-    cerebro.plot(volume = False)
\ No newline at end of file
+    cerebro.plot(volume = False)
@@ -0,0 +1,167 @@
+"""
+Author: Rosenyoung
+This module follows the life of one order in memory.
+
+Orders.place_orders returns an OrderHandle which is updated by the orderStatus and error callbacks of that order.
+A strategy can wait for the fill with a timeout, be called back on every fill or status change, or cancel the
+order, without polling the orderstatus table.
+
+Callbacks run on the ibapi message thread of Orders, they must be short and must not wait for other orders.
+
+Version 1.0 2026-10-18
+"""
+
+import threading
+
+from loguru import logger
+
+# An order with one of these statuses will not change any more
+TERMINAL_STATUSES = {'Filled', 'Cancelled', 'ApiCancelled', 'Inactive'}
+# Error codes with which TWS refuses an order, the order is done with status 'Rejected'
+REJECT_ERROR_CODES = {103, 104, 105, 106, 107, 109, 110, 111, 116, 117, 118, 135, 200, 201, 203}
+
+
+class OrderHandle:
+    def __init__(self, order_id: int, symbol: str, action: str, quantity, canceller=None):
+        """
+        order_id: int - ID of the order
+        symbol: str, action: str, quantity - The order, for logging and for strategies
+        canceller - Function(order_id) sending the cancel request, e.g. Orders.cancelOrder
+        """
+        self.order_id = order_id
+        self.symbol = symbol
+        self.action = action
+        self.quantity = float(quantity)
+
+        # Status of TWS, 'PendingSubmit' until the first orderStatus
+        self.status = 'PendingSubmit'
+        self.filled = 0.0
+        self.remaining = float(quantity)
+        self.avg_fill_price = 0.0
+        self.last_fill_price = 0.0
+        # (error code, error string) if TWS rejected the order
+        self.error = None
+
+        self._canceller = canceller
+        self._callbacks = []
+        self._done_callbacks = []
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+
+    def __repr__(self):
+        return (f"OrderHandle(order_id={self.order_id}, symbol={self.symbol}, action={self.action}, "
+                f"status={self.status}, filled={self.filled}, remaining={self.remaining})")
+
+    @property
+    def done(self) -> bool:
+        # True after the order is filled, cancelled, inactive or rejected
+        return self._done.is_set()
+
+    @property
+    def is_filled(self) -> bool:
+        return self.status == 'Filled'
+
+    def wait(self, timeout: float = None) -> bool:
+        # Wait until the order is done, return False on timeout
+        return self._done.wait(timeout)
+
+    def result(self, timeout: float = None) -> str:
+        # Wait until the order is done and return its final status, raise TimeoutError on timeout
+        if not self._done.wait(timeout):
+            raise TimeoutError(f"Order {self.order_id} is still {self.status} after {timeout} seconds")
+        return self.status
+
+    def wait_filled(self, quantity: float = None, timeout: float = None) -> bool:
+        """
+        Wait until at least quantity (the whole order if None) is filled.
+        return False on timeout or if the order is done before that
+        """
+        target = self.quantity if quantity is None else float(quantity)
+        event = threading.Event()
+
+        def check(handle):
+            if handle.filled >= target or handle.status in TERMINAL_STATUSES or handle.error is not None:
+                event.set()
+
+        self.add_callback(check)
+        try:
+            event.wait(timeout)
+        finally:
+            self.remove_callback(check)
+        return self.filled >= target
+
+    def add_callback(self, callback):
+        # Call callback(handle) on every status or fill change, and once now
+        with self._lock:
+            self._callbacks.append(callback)
+        self._run(callback)
+
+    def remove_callback(self, callback):
+        with self._lock:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
+
+    def add_done_callback(self, callback):
+        # Call callback(handle) once when the order is done, at once if it is done already
+        with self._lock:
+            if not self._done.is_set():
+                self._done_callbacks.append(callback)
+                return
+        self._run(callback)
+
+    def cancel(self) -> bool:
+        # Request the cancel of the order, return False if it is done already
+        if self._done.is_set() or self._canceller is None:
+            return False
+        self._canceller(self.order_id)
+        return True
+
+    def on_status(self, status: str, filled, remaining, avg_fill_price: float, last_fill_price: float):
+        # Called by Orders.orderStatus. TWS repeats statuses, callbacks only run when something changed.
+        with self._lock:
+            if self._done.is_set():
+                return
+            filled = float(filled)
+            changed = status != self.status or filled != self.filled
+            self.status = status
+            self.filled = filled
+            self.remaining = float(remaining)
+            self.avg_fill_price = avg_fill_price
+            self.last_fill_price = last_fill_price
+            callbacks = list(self._callbacks) if changed else []
+        for callback in callbacks:
+            self._run(callback)
+        if status in TERMINAL_STATUSES:
+            self._finish()
+
+    def on_error(self, error_code: int, error_string: str):
+        # Called by Orders.error for errors of this order
+        if error_code not in REJECT_ERROR_CODES:
+            return
+        with self._lock:
+            if self._done.is_set():
+                return
+            self.status = 'Rejected'
+            self.error = (error_code, error_string)
+            callbacks = list(self._callbacks)
+        for callback in callbacks:
+            self._run(callback)
+        self._finish()
+
+    def _finish(self):
+        with self._lock:
+            if self._done.is_set():
+                return
+            self._done.set()
+            callbacks = self._done_callbacks
+            self._done_callbacks = []
+            self._callbacks = []
+        for callback in callbacks:
+            self._run(callback)
+
+    def _run(self, callback):
+        # A failing callback must not break the message thread
+        try:
+            callback(self)
+        except Exception as err:
+            logger.exception(f"Error {err} occured in a callback of order {self.order_id}")
@@ -0,0 +1,57 @@
+"""
+Author: Rosenyoung
+This module allocates order IDs for one TWS connection.
+
+TWS sends the next valid order ID in nextValidId after the connection (and after every reqIds).
+The allocator is seeded from it and then hands out increasing IDs without asking TWS again, so any number of
+threads can place orders at the same time without sleeping between them and without duplicated IDs.
+A later nextValidId never moves the counter backwards.
+
+Version 1.0 2026-10-18
+"""
+
+import threading
+
+
+class OrderIdAllocator:
+    def __init__(self):
+        self._next_id = None
+        self._lock = threading.Lock()
+        # Set after the first nextValidId
+        self._ready = threading.Event()
+
+    def seed(self, next_valid_id: int):
+        # Called by Orders.nextValidId
+        with self._lock:
+            if self._next_id is None or next_valid_id > self._next_id:
+                self._next_id = int(next_valid_id)
+        self._ready.set()
+
+    def wait_ready(self, timeout: float = None) -> bool:
+        # Wait until the allocator has been seeded by TWS
+        return self._ready.wait(timeout)
+
+    @property
+    def ready(self) -> bool:
+        return self._ready.is_set()
+
+    def next_id(self, timeout: float = 10) -> int:
+        # Return a new order ID, wait up to timeout seconds for nextValidId
+        return self.reserve(1, timeout)[0]
+
+    def reserve(self, count: int, timeout: float = 10) -> range:
+        """
+        Return count consecutive new order IDs as a range, e.g. for a basket of orders.
+        Raise TimeoutError if TWS has not sent nextValidId within timeout seconds.
+        """
+        if not self._ready.wait(timeout):
+            raise TimeoutError("No nextValidId received from TWS, order IDs are not available")
+        with self._lock:
+            first = self._next_id
+            self._next_id += count
+        return range(first, first + count)
+
+    def peek(self) -> int:
+        # The next ID which will be returned, None before nextValidId
+        with self._lock:
+            return self._next_id
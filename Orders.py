@@ -9,6 +9,23 @@ Version 1.0 2022-04-03
 Support 3 kinds of order: Market, Limit, Market if touched
 Version 1.1 2022-04-07
 Add a loguru module to create log files
+Version 1.2 2026-10-18
+Positions are kept in an in-memory PositionBook fed by the position callbacks,
+the position table is written in the background by a BatchWriter
+Database connections are checked out from the shared pool of DataBaseConn
+Order status, position and account summary callbacks are saved by parameterized statements through one
+micro-batching writer, callbacks arriving within a short window share one executemany and one commit
+placeOrder and the first orderStatus of every order are marked in the latency tracker (Latency.py)
+host, port and client_id of the TWS connection are parameters
+Order IDs come from an OrderIdAllocator seeded by nextValidId instead of the current time,
+place_orders no longer sleeps 1 second and place_basket submits many orders at once
+The connection asks TWS to pace the messages above its rate limit (+PACEAPI) instead of rejecting them
+place_orders and place_basket return OrderHandles resolved in memory by orderStatus and error, callers can wait
+for fills with a timeout, get fill callbacks or cancel without polling the orderstatus table
+Positions are refreshed by a PositionRefresher: only fills trigger a refresh, triggers within a debounce window
+share one reqPositions and at most one position request is outstanding
+Order status callbacks are upserted, so a status saved before the initial row of its order is not lost
+Statuses of orders without a handle only update existing rows, no row without contract and action is written
 """
 
 from ibapi import wrapper
@@ -24,17 +41,29 @@ import threading
 import time
 
 from DataBaseConn import DataBaseConn
+from BatchWriter import BatchWriter
+from PositionBook import PositionBook
+from OrderIds import OrderIdAllocator
+from OrderHandle import OrderHandle
+from PositionRefresh import PositionRefresher
+from Latency import LATENCY
 
 from loguru import logger
 logger.add("..\logs\\Orders_{time}.log", rotation="00:00")
 
+# Columns of the accountsummary table which can be saved by accountSummary
+ACCOUNT_SUMMARY_TAGS = ['NetLiquidation', 'TotalCashValue', 'AvailableFunds', 'GrossPositionValue']
+
 
 class Orders(wrapper.EWrapper, EClient):
 
-    def __init__(self, contract_type):
+    def __init__(self, contract_type, client_id=None, host='127.0.0.1', port=7497, position_debounce=0.25):
         """
         contract_type:str - 'FX' or 'STK'
         You must create different order object for different contract type
+        client_id: int - clientId of the TWS connection, a random number between 100-149 if None
+        host: str, port: int - Address of TWS or IB Gateway
+        position_debounce: float - Seconds during which fills share one position refresh
         """
         wrapper.EWrapper.__init__(self)
         EClient.__init__(self, wrapper=self)
@@ -49,22 +78,60 @@ class Orders(wrapper.EWrapper, EClient):
         # Define the tags of account_summary
         self.account_summary_tag = 'NetLiquidation, TotalCashValue, AvailableFunds, GrossPositionValue'
 
-        database_conn = DataBaseConn()
-        self.data_conn = database_conn.conn
-        self.cur = database_conn.cur
+        # Connections are checked out from the process-wide pool when needed
+        self.database_conn = DataBaseConn()
+
+        # Current positions in memory, updated by position callbacks. Read it by self.position_book.get(symbol)
+        self.position_book = PositionBook()
+        # Order IDs, seeded by nextValidId. Get one by self.next_order_id()
+        self.order_ids = OrderIdAllocator()
+        # order ID -> OrderHandle of the orders placed by this object which are not done
+        self.handles = {}
+        self._handles_lock = threading.Lock()
+        # Position requests triggered by fills, coalesced. See self.position_refresher.stats()
+        self.position_refresher = PositionRefresher(self.reqPositions, debounce=position_debounce)
+        # Parameterized statements, built once for the dialect of the database
+        self.initial_order_sql = self.database_conn.insert_ignore_sql(
+            'orderstatus', ['OrderID', 'Contract', 'Action', 'Status', 'AmountFilled', 'Remaining', 'AvgFillPrice',
+                            'ClientID'])
+        # Status callbacks are upserted, a status saved before the initial row still leaves the latest status
+        self.order_status_sql = self.database_conn.upsert_sql(
+            'orderstatus', ['OrderID', 'Contract', 'Action', 'Status', 'AmountFilled', 'Remaining', 'AvgFillPrice',
+                            'ClientID', 'LastUpdTime'],
+            ['Status', 'AmountFilled', 'Remaining', 'AvgFillPrice', 'ClientID', 'LastUpdTime'])
+        # Statuses of orders without a handle only update an existing row, they never insert a row without contract
+        self.order_status_update_sql = self.database_conn.update_sql(
+            'orderstatus', ['OrderID'], ['Status', 'AmountFilled', 'Remaining', 'AvgFillPrice', 'ClientID',
+                                         'LastUpdTime'])
+        self.position_sql = self.database_conn.upsert_sql(
+            'position', ['Account', 'TimeStamp', 'Contract', 'Position', 'AvgCost'], ['Position', 'AvgCost'])
+        self.account_summary_sqls = {tag: self.database_conn.upsert_sql('accountsummary',
+                                                                        ['Account', 'TimeStamp', tag], [tag])
+                                     for tag in ACCOUNT_SUMMARY_TAGS}
+
+        # Order status, position and account summary rows are saved in the background.
+        # Rows arriving within flush_interval are written by one executemany per statement and one commit.
+        self.db_writer = BatchWriter(self.database_conn, batch_size=500, flush_interval=0.05, name='Orders-DBWriter')
 
         # Creating  a random number between 100-149 as clientId
-        CId = np.random.randint(100, 150)
+        CId = client_id if client_id is not None else np.random.randint(100, 150)
 
         logger.info('Orders API Connecintg...')
+        # TWS delays messages above 50 per second instead of rejecting them, so a basket can be sent at once
+        self.setConnectionOptions('+PACEAPI')
         # connect to the IB TWS
-        self.connect('127.0.0.1', 7497, clientId=CId)
+        self.connect(host, port, clientId=CId)
 
         # Threading control
         self.thread = threading.Thread(target=self.run)
         self.control = threading.Event()
         self.thread.start()  # start the thread
 
+    @property
+    def engine(self):
+        # The shared engine of DataBaseConn, looked up on every use
+        return self.database_conn.engine
+
     def increment_id(self):
         # Increase self.reqID, should be used after each request.
         self.reqID += 1
@@ -72,9 +139,17 @@ class Orders(wrapper.EWrapper, EClient):
     def nextValidId(self, orderId: int):
         """ Receives next valid order id. Catch valid ID after connection"""
         self.reqID = orderId
+        self.order_ids.seed(orderId)
 
         self.control.set()
 
+        # Load current positions into the position book
+        self.position_refresher.refresh_now()
+
+    def next_order_id(self, timeout: float = 10) -> int:
+        # Return a new order ID, thread-safe. Wait up to timeout seconds for the connection to TWS.
+        return self.order_ids.next_id(timeout)
+
     def connectAck(self):
         """ callback signifying completion of successful connection """
         logger.info('Orders API Connected.')
@@ -144,7 +219,60 @@ class Orders(wrapper.EWrapper, EClient):
 
     # Close the database connection
     def close_conn(self):
-        self.data_conn.close()
+        self.database_conn.close_conn()
+
+    def placeOrder(self, orderId, contract, order):
+        # Send the order, then mark it in the latency trace of the bar it is linked to
+        super().placeOrder(orderId, contract, order)
+        LATENCY.mark(orderId, 'order_sent')
+
+    def make_contract(self, symbol: str):
+        # Contract of symbol for the contract type of this object
+        if self.contract_type == 'STK':
+            return self.stock_contract(symbol)
+        return self.fx_contract(symbol)
+
+    def make_order(self, order_type: str, action: str, amount, price: float = 1.10000):
+        # Create an order of order_type, see place_orders
+        if order_type == 'MKT':
+            return self.MarketOrder(action, amount)
+        elif order_type == 'LMT':
+            return self.LimitOrder(action, amount, price)
+        elif order_type == 'MKTIFTCH':
+            return self.MarketIfTouched(action, amount, price)
+        raise Exception("Unsupported order type!")
+
+    def submit_order(self, order_id: int, symbol: str, contract, order) -> OrderHandle:
+        """
+        Place an order with an allocated ID and save it as submitted, the status will be updated by orderStatus.
+        return the OrderHandle of the order
+        """
+        # Registered before sending, the first orderStatus can arrive before placeOrder returns
+        handle = OrderHandle(order_id, symbol, order.action, order.totalQuantity, canceller=self.cancelOrder)
+        with self._handles_lock:
+            self.handles[order_id] = handle
+        # Queued before sending, so the initial row is written before any status row of the order
+        self.db_writer.put({'OrderID': order_id, 'Contract': symbol, 'Action': order.action, 'Status': 'Submitted',
+                            'AmountFilled': 0.0, 'Remaining': 0.0, 'AvgFillPrice': 0.0,
+                            'ClientID': str(self.clientId)}, self.initial_order_sql)
+        self.placeOrder(order_id, contract, order)
+        logger.info(f"Placed an order: OrderId : {order_id}, Contract : {symbol}, Type : {order.orderType}, "
+                    f"Action: {order.action}, Amount: {order.totalQuantity} ")
+        return handle
+
+    def get_handle(self, order_id: int) -> OrderHandle:
+        # OrderHandle of an order which is not done, None if it is done or unknown
+        with self._handles_lock:
+            return self.handles.get(order_id)
+
+    def open_handles(self) -> list:
+        # OrderHandles of the orders placed by this object which are not done
+        with self._handles_lock:
+            return list(self.handles.values())
+
+    def _release_handle(self, order_id: int):
+        with self._handles_lock:
+            self.handles.pop(order_id, None)
 
     def place_orders(self, symbol, order_type, action, amount, price=1.10000):
         """
@@ -153,46 +281,37 @@ class Orders(wrapper.EWrapper, EClient):
         action:str - 'buy' or 'sell'
         amount: Decimal
         price: float
+        return the OrderHandle of the order, e.g. handle.wait_filled(timeout=10), handle.cancel()
 
         """
-        if self.contract_type == 'STK':
-            self.contract = self.stock_contract(symbol)
-        elif self.contract_type == 'FX':
-            self.contract = self.fx_contract(symbol)
+        self.contract = self.make_contract(symbol)
+        order = self.make_order(order_type, action, amount, price)
 
-        order = Order()
-        timestamp = int(time.time())
-        if order_type == 'MKT':
-            order = self.MarketOrder(action, amount)
-        elif order_type == 'LMT':
-            order = self.LimitOrder(action, amount, price)
-        elif order_type == 'MKTIFTCH':
-            order = self.MarketIfTouched(action, amount, price)
-        else:
-            raise Exception("Unsupported order type!")
-
-        # Place the order
-        self.placeOrder(timestamp, self.contract, order)
-        logger.info(f"Placed an order: OrderId : {timestamp}, Contract : {symbol}, Type : {order_type}, "
-                    f"Action: {action}, Amount: {amount} ")
-
-        # Save the order submitted immediately, waiting for
-        initial_order_sql = f"""
-                INSERT INTO orderstatus ( OrderID, Contract, Action, `Status`, AmountFilled, Remaining, AvgFillPrice, ClientID )
-                VALUES
-        	    ('{timestamp}', '{symbol}', '{action}', 'Submitted', 0.0, 0.0, 0.0, '{self.clientId}')
-                """
-        print("Saving the order: " + initial_order_sql)
-
-        try:
-            self.cur.execute(initial_order_sql)
-            self.data_conn.commit()
-        except Exception as err:
-            self.data_conn.rollback()
-            logger.warning("Error {} happened when initially saving order status!".format(err))
-
-        # Sleep 1 second to avoid duplicated orderID
-        time.sleep(1)
+        order_id = self.next_order_id()
+        return self.submit_order(order_id, symbol, self.contract, order)
+
+    def place_basket(self, orders: list) -> list:
+        """
+        Place many orders at once, e.g. to rebalance many FX pairs.
+        orders: list - (symbol, order_type, action, amount) or (symbol, order_type, action, amount, price) tuples,
+                the arguments of place_orders
+        return the OrderHandles in the order of orders
+
+        All orders are checked before the first one is sent, so an invalid order type sends nothing.
+        The IDs are reserved in one step and the orders are sent without waiting for each other.
+        """
+        basket = []
+        for item in orders:
+            symbol, order_type, action, amount = item[:4]
+            price = item[4] if len(item) > 4 else 1.10000
+            basket.append((symbol, self.make_contract(symbol), self.make_order(order_type, action, amount, price)))
+
+        order_ids = list(self.order_ids.reserve(len(basket)))
+        handles = [self.submit_order(order_id, symbol, contract, order)
+                   for order_id, (symbol, contract, order) in zip(order_ids, basket)]
+        logger.info(f"Placed a basket of {len(basket)} orders: OrderIds : {order_ids[0] if order_ids else None}"
+                    f" - {order_ids[-1] if order_ids else None}")
+        return handles
 
     def orderStatus(self, orderId, status, filled,
                     remaining, avgFillPrice, permId,
@@ -200,53 +319,50 @@ class Orders(wrapper.EWrapper, EClient):
                     whyHeld, mktCapPrice):
         """
         Save order status into database.
-        Once order status is updated, call the reqPositions function and update position information.
+        Once an order is filled further, refresh the position information.
         """
+        LATENCY.mark(orderId, 'first_status', final=True)
         current_time = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(time.time()))
-        order_status_sql = f"""
-        UPDATE orderstatus
-        SET
-	    `Status` = '{status}', 
-	    AmountFilled = {filled}, 
-	    Remaining = {remaining}, 
-	    AvgFillPrice = {avgFillPrice}, 
-	    ClientID = '{clientId}', 
-	    LastUpdTime = '{current_time}'
-	    WHERE
-	    OrderID = {orderId}
-        """
-        print("Updating order status: " + order_status_sql)
         logger.info(f"Order status: Orderid : {orderId}, Status : {status}, AvgPrice : {avgFillPrice}")
 
-        try:
-            self.cur.execute(order_status_sql)
-            self.data_conn.commit()
-        except Exception as err:
-            self.data_conn.rollback()
-            logger.warning("Error {} happened when updating order status!".format(err))
-
-        # Update position data after an order is placed
-        self.reqPositions()
+        row = {'OrderID': orderId, 'Status': status, 'AmountFilled': float(filled), 'Remaining': float(remaining),
+               'AvgFillPrice': avgFillPrice, 'ClientID': str(clientId), 'LastUpdTime': current_time}
+        handle = self.get_handle(orderId)
+        if handle is not None:
+            # Contract and Action are only used if the order has no row yet
+            self.db_writer.put({**row, 'Contract': handle.symbol, 'Action': handle.action}, self.order_status_sql)
+        else:
+            # A done order of this object or an order placed elsewhere, unknown orders get no row
+            logger.debug(f"Order {orderId} has no open handle, only its existing orderstatus row is updated")
+            self.db_writer.put(row, self.order_status_update_sql)
+
+        # Resolve the handle in memory, waiting callers are woken up at once
+        if handle is not None:
+            handle.on_status(status, filled, remaining, avgFillPrice, lastFillPrice)
+            if handle.done:
+                self._release_handle(orderId)
+
+        # Update position data after a fill, statuses without a new fill do not request positions
+        self.position_refresher.on_order_status(orderId, status, filled)
+
+    def error(self, reqId, errorCode: int, errorString: str, *args):
+        # Errors of an order placed by this object reject its handle, e.g. a duplicated order ID
+        handle = self.get_handle(reqId)
+        if handle is not None:
+            handle.on_error(errorCode, errorString)
+            if handle.done:
+                self._release_handle(reqId)
+        super().error(reqId, errorCode, errorString, *args)
 
     def accountSummary(self, reqId: int, account: str, tag: str, value: str,
                        currency: str):
         # Saving account summary to database
-        current_timestamp = int(time.time())
-        upd_account_summary_sql = f"""
-        INSERT INTO accountsummary (Account, `TimeStamp`,  {tag})
-        VALUES
-	    ('{account}', '{current_timestamp}', '{value}')
-	    ON DUPLICATE KEY UPDATE
-		{tag} = '{value}'
-        """
         logger.info(f"Account summary: {tag} : {value}")
-        print('Account summary sql: ' + upd_account_summary_sql)
-        try:
-            self.cur.execute(upd_account_summary_sql)
-            self.data_conn.commit()
-        except Exception as err:
-            self.data_conn.rollback()
-            logger.warning("Error {} happened when updating order status!".format(err))
+        if tag not in self.account_summary_sqls:
+            logger.warning(f"Account summary tag {tag} is not a column of accountsummary, ignored")
+            return
+        self.db_writer.put({'Account': account, 'TimeStamp': int(time.time()), tag: value},
+                           self.account_summary_sqls[tag])
 
     def accountSummaryEnd(self, reqId: int):
         # Notify an account summary request has ended.
@@ -256,78 +372,60 @@ class Orders(wrapper.EWrapper, EClient):
     def position(self, account, contract, position,
                  avgCost):
 
-        # Saving current positions to database
-        current_timestamp = int(time.time())
-        upd_position_sql = f"""
-                INSERT INTO position (Account, `TimeStamp`,  Contract, Position, AvgCost)
-                VALUES
-        	    ('{account}', '{current_timestamp}', '{contract.symbol}', '{position}', '{avgCost}')
-        	    ON DUPLICATE KEY UPDATE
-        		Position = '{position}',
-        		AvgCost = '{avgCost}'
-                """
-        print('Position sql: ' + upd_position_sql)
+        # Update the position book first, the database write is done in the background
+        self.position_book.update(account, contract.symbol, position, avgCost)
         logger.info(f"Current Position: Contract : {contract.symbol}, Position ; {position}, AvgCost : {avgCost}")
 
-        try:
-            self.cur.execute(upd_position_sql)
-            self.data_conn.commit()
-        except Exception as err:
-            self.data_conn.rollback()
-            logger.warning("Error {} happened when updating position information!".format(err))
+        self.db_writer.put({'Account': account, 'TimeStamp': int(time.time()), 'Contract': contract.symbol,
+                            'Position': float(position), 'AvgCost': float(avgCost)}, self.position_sql)
 
     def clear_position(self, symbol):
-        # Clear current position of an asset
-        current_postion_sql = f""" SELECT
-                                        position 
-                                    FROM
-                                        position 
-                                    WHERE
-                                        contract = '{symbol}' 
-                                        AND `timestamp` = (
-                                            SELECT
-                                                MAX( `timestamp` ) 
-                                            FROM
-                                                position 
-                                            WHERE
-                                            contract = '{symbol}')
-        """
-        self.cur.execute(current_postion_sql)
-        current_position = self.cur.fetchone()[0]
+        # Clear current position of an asset, return the OrderHandle of the closing order or None if flat
+        if not self.position_book.wait_ready(timeout=10):
+            logger.warning("Position book is not complete, clearing position with the positions received so far")
+        current_position = self.position_book.get(symbol)
         print("Current position: " + str(current_position))
         logger.info(f"Start to clear {symbol} current position")
 
-        if current_position is not None:
-            if current_position > 0:
-                self.place_orders(symbol, 'MKT', 'sell', current_position)
-            elif current_position < 0:
-                self.place_orders(symbol, 'MKT', 'buy', abs(current_position))
+        handle = None
+        if current_position > 0:
+            handle = self.place_orders(symbol, 'MKT', 'sell', current_position)
+        elif current_position < 0:
+            handle = self.place_orders(symbol, 'MKT', 'buy', abs(current_position))
 
         logger.info("Position Cleared")
+        return handle
 
     def positionEnd(self):
         # Notify an position information request has ended.
+        self.position_book.mark_ready()
         self.cancelPositions()
+        self.position_refresher.on_position_end()
         logger.info("Request position end!")
 
 
 if __name__ == '__main__':
     orders_api = Orders('FX')
-    time.sleep(5)
-    orders_api.place_orders('EUR', 'MKT', 'buy', 110000)
-    orders_api.place_orders('GBP', 'MKT', 'buy', 100000)
-    orders_api.place_orders('EUR', 'LMT', 'sell', 100000, 1.30)
-    time.sleep(5)
-    orders_api.place_orders('EUR', 'MKT', 'sell', 100000)
-    orders_api.place_orders('GBP', 'MKT', 'sell', 100000)
-    get_orderid_sql = "Select orderid FROM orderstatus WHERE status != 'filled' order by orderid desc"
-    orders_api.cur.execute(get_orderid_sql)
-    orderid = orders_api.cur.fetchone()[0]
-    print("OrderID:" + str(orderid))
-    orders_api.cancelOrder(orderid)
-    time.sleep(5)
-    orders_api.clear_position('EUR')
-    time.sleep(5)
+    orders_api.control.wait(10)
+    handles = orders_api.place_basket([('EUR', 'MKT', 'buy', 110000),
+                                       ('GBP', 'MKT', 'buy', 100000),
+                                       ('EUR', 'LMT', 'sell', 100000, 1.30)])
+    for handle in handles[:2]:
+        handle.add_done_callback(lambda h: print(f"Order {h.order_id} {h.status} at {h.avg_fill_price}"))
+        handle.wait(timeout=5)
+    handles.append(orders_api.place_orders('EUR', 'MKT', 'sell', 100000))
+    handles.append(orders_api.place_orders('GBP', 'MKT', 'sell', 100000))
+    # The limit order is far from the market, cancel it if it is still open
+    limit_order = handles[2]
+    if not limit_order.wait(timeout=1):
+        print("OrderID:" + str(limit_order.order_id))
+        limit_order.cancel()
+    for handle in handles:
+        if not handle.wait(timeout=5):
+            logger.warning(f"Order {handle.order_id} is still {handle.status}")
+    clear_handle = orders_api.clear_position('EUR')
+    if clear_handle is not None:
+        clear_handle.wait(timeout=5)
 
     orders_api.reqAccountSummary(orders_api.reqID, 'All', orders_api.account_summary_tag)
     orders_api.increment_id()
@@ -0,0 +1,123 @@
+"""
+Author: Rosenyoung
+This module runs a parameter grid search of SmaStrategy (MA_Backtesting_Sample) on a process pool.
+
+The bar data is read from the database and converted only once, in the main process, and put into shared memory.
+The worker processes attach to the shared memory instead of querying mysql again, and every worker runs
+cerebro for one short_window/long_window pair at a time. Sharpe ratio, drawdown and PnL of all pairs are
+collected into one results table.
+
+Version 1.0 2026-10-18
+"""
+
+import itertools
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import backtrader as bt
+import numpy as np
+import pandas as pd
+
+from DataBaseConn import DataBaseConn
+from MA_Backtesting_Sample import create_cerebro, prepare_feed_data
+
+# Columns of the feed DataFrame stored in shared memory, after the datetime index
+FEED_COLUMNS = ['open', 'high', 'low', 'close', 'volume', 'openinterest']
+
+# DataFrame rebuilt from the shared memory, one per worker process
+_worker_feed_df = None
+_worker_shm = None
+
+
+def feed_to_shared_memory(feed_df):
+    """
+    Copy a feed DataFrame (from prepare_feed_data) into a new shared memory block.
+    Layout: n int64 datetimes (ns) followed by len(FEED_COLUMNS) rows of n float64 values.
+    return the SharedMemory, the caller must close and unlink it
+    """
+    n = len(feed_df)
+    shm = shared_memory.SharedMemory(create=True, size=max(n * 8 * (1 + len(FEED_COLUMNS)), 1))
+    index, values = _shared_arrays(shm, n)
+    index[:] = feed_df.index.values.astype('datetime64[ns]').view(np.int64)
+    values[:] = feed_df[FEED_COLUMNS].to_numpy(dtype=np.float64).T
+    return shm
+
+
+def _shared_arrays(shm, n):
+    # Views of the datetime and value arrays in a shared memory block
+    index = np.ndarray((n,), dtype=np.int64, buffer=shm.buf)
+    values = np.ndarray((len(FEED_COLUMNS), n), dtype=np.float64, buffer=shm.buf, offset=n * 8)
+    return index, values
+
+
+def _init_worker(shm_name, n):
+    # Attach to the shared memory once per worker and rebuild the feed DataFrame
+    global _worker_feed_df, _worker_shm
+    _worker_shm = shared_memory.SharedMemory(name=shm_name)
+    index, values = _shared_arrays(_worker_shm, n)
+    _worker_feed_df = pd.DataFrame(values.T, columns=FEED_COLUMNS,
+                                   index=pd.DatetimeIndex(index.view('datetime64[ns]'), name='datetime'))
+
+
+def run_pair(pair):
+    """
+    Backtest one (short_window, long_window) pair on the feed of this worker, return a dict of results
+    """
+    short_window, long_window = pair
+    cerebro = create_cerebro(_worker_feed_df, short_window, long_window, printlog=False)
+    # Sharpe ratio of hourly returns, the data is 5 seconds bars of a few days
+    cerebro.addanalyzer(bt.analyzers.SharpeRatio, _name='sharpe', timeframe=bt.TimeFrame.Minutes, compression=60)
+    cerebro.addanalyzer(bt.analyzers.DrawDown, _name='drawdown')
+    cerebro.addanalyzer(bt.analyzers.TradeAnalyzer, _name='trades')
+
+    start_value = cerebro.broker.getvalue()
+    strategy = cerebro.run()[0]
+    final_value = cerebro.broker.getvalue()
+
+    drawdown = strategy.analyzers.drawdown.get_analysis()
+    trades = strategy.analyzers.trades.get_analysis()
+    total = trades.get('total', {})
+    return {
+        'short_window': short_window,
+        'long_window': long_window,
+        'pnl': final_value - start_value,
+        'sharpe': strategy.analyzers.sharpe.get_analysis().get('sharperatio'),
+        'max_drawdown': drawdown['max']['drawdown'],
+        'max_moneydown': drawdown['max']['moneydown'],
+        'trades': total.get('total', 0),
+        'closed_trades': total.get('closed', 0),
+        'final_value': final_value,
+    }
+
+
+def optimize(feed_df, short_windows, long_windows, processes=None) -> pd.DataFrame:
+    """
+    Run every (short_window, long_window) pair with short_window < long_window on a process pool.
+    feed_df - DataFrame from MA_Backtesting_Sample.prepare_feed_data
+    processes: int - Number of worker processes, the number of cores if None
+    return a DataFrame with one row per pair, sorted by pnl
+    """
+    pairs = [(s, l) for s, l in itertools.product(short_windows, long_windows) if s < l]
+    shm = feed_to_shared_memory(feed_df)
+    try:
+        with ProcessPoolExecutor(max_workers=processes, initializer=_init_worker,
+                                 initargs=(shm.name, len(feed_df))) as executor:
+            results = list(executor.map(run_pair, pairs))
+    finally:
+        shm.close()
+        shm.unlink()
+    return pd.DataFrame(results).sort_values('pnl', ascending=False).reset_index(drop=True)
+
+
+if __name__ == '__main__':
+    # Acquire and convert the data once
+    data_conn = DataBaseConn()
+    df = data_conn.read_historical_data(86400, 'EUR')
+    feed_df = prepare_feed_data(df)
+
+    start = time.perf_counter()
+    results = optimize(feed_df, range(5, 35, 5), range(60, 660, 60))
+    print(f"{len(results)} combinations in {time.perf_counter() - start:.1f} s")
+    print(results.head(10))
+    results.to_csv('..\\data\\optimization_results.csv', index=False)
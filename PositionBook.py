@@ -0,0 +1,60 @@
+"""
+Author: Rosenyoung
+This module keeps the current positions in memory.
+Orders updates the book from the position callbacks of TWS, strategies read it without querying the database.
+
+Version 1.0 2026-10-18
+"""
+
+import threading
+
+
+class PositionBook:
+    def __init__(self):
+        # (account, symbol) -> (position, avg_cost)
+        self._positions = {}
+        # symbol -> total position over all accounts
+        self._totals = {}
+        self._lock = threading.Lock()
+        # Set after the first positionEnd, the book is complete from then on
+        self._ready = threading.Event()
+
+    def update(self, account: str, symbol: str, position: float, avg_cost: float):
+        # Set the position of one contract in one account, called by Orders.position
+        position = float(position)
+        with self._lock:
+            previous = self._positions.get((account, symbol), (0.0, 0.0))[0]
+            self._positions[(account, symbol)] = (position, float(avg_cost))
+            self._totals[symbol] = self._totals.get(symbol, 0.0) - previous + position
+
+    def mark_ready(self):
+        # Called by Orders.positionEnd
+        self._ready.set()
+
+    def wait_ready(self, timeout: float = None) -> bool:
+        # Wait until the first full position snapshot has been received
+        return self._ready.wait(timeout)
+
+    @property
+    def ready(self) -> bool:
+        return self._ready.is_set()
+
+    def get(self, symbol: str, account: str = None) -> float:
+        """
+        Return the position of a contract, 0.0 if there is no position.
+        account: str - If None, return the total position over all accounts
+        """
+        with self._lock:
+            if account is None:
+                return self._totals.get(symbol, 0.0)
+            return self._positions.get((account, symbol), (0.0, 0.0))[0]
+
+    def avg_cost(self, symbol: str, account: str) -> float:
+        # Return the average cost of a contract in one account
+        with self._lock:
+            return self._positions.get((account, symbol), (0.0, 0.0))[1]
+
+    def snapshot(self) -> dict:
+        # Return a copy of the book, {(account, symbol): (position, avg_cost)}
+        with self._lock:
+            return dict(self._positions)
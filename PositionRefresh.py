@@ -0,0 +1,168 @@
+"""
+Author: Rosenyoung
+This module schedules the position requests of Orders.
+
+TWS sends several orderStatus callbacks per order (PreSubmitted, Submitted, partial fills, Filled), and only fills
+change a position. PositionRefresher turns these callbacks into as few reqPositions as possible:
+- a status without a new fill does not trigger a refresh
+- triggers within the debounce window share one request
+- at most one position subscription is outstanding, triggers arriving meanwhile cause one more request after
+  positionEnd (or after request_timeout if positionEnd never comes)
+stats() counts the triggers, the requests sent and the requests avoided.
+
+Version 1.0 2026-10-18
+Version 1.1 2026-10-18
+The filled amount of finished orders is kept, so a repeated final status (e.g. a second Filled) does not trigger.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+from loguru import logger
+
+# Statuses after which an order will not be filled any more
+FINAL_STATUSES = {'Filled', 'Cancelled', 'ApiCancelled', 'Inactive'}
+
+
+class PositionRefresher:
+    def __init__(self, request, debounce: float = 0.25, request_timeout: float = 10.0, clock=time.monotonic,
+                 max_finished: int = 10000):
+        """
+        request - Function sending the position request, e.g. Orders.reqPositions
+        debounce: float - Seconds to wait after a trigger for more triggers to share the request
+        request_timeout: float - Seconds after which an outstanding request without positionEnd is given up
+        clock - Function returning seconds, time.monotonic by default
+        max_finished: int - Number of finished orders whose filled amount is kept, the oldest are dropped above it
+        """
+        self.request = request
+        self.debounce = debounce
+        self.request_timeout = request_timeout
+        self.clock = clock
+        self.max_finished = max_finished
+
+        # order ID -> filled amount seen in the last orderStatus
+        self._filled = {}
+        # order ID -> final filled amount of the orders with a final status, in the order they finished
+        self._finished = OrderedDict()
+        # Time the next request is due, None if no request is scheduled
+        self._due = None
+        # Time the outstanding request was sent, None if there is none
+        self._sent_at = None
+        # A trigger arrived while a request was outstanding
+        self._pending = False
+        self._closed = False
+        self._counters = {'triggers': 0, 'requests': 0, 'coalesced': 0, 'skipped': 0, 'timeouts': 0}
+        self._condition = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name='PositionRefresher', daemon=True)
+        self._thread.start()
+
+    def on_order_status(self, order_id: int, status: str, filled) -> bool:
+        """
+        Called by Orders.orderStatus. Trigger a refresh if the order has been filled further.
+        return True if a refresh was triggered
+        """
+        filled = float(filled)
+        with self._condition:
+            previous = self._filled.get(order_id, self._finished.get(order_id, 0.0))
+            if order_id in self._finished:
+                # Statuses repeated after the final one
+                self._finished[order_id] = max(previous, filled)
+            elif status in FINAL_STATUSES:
+                self._filled.pop(order_id, None)
+                self._finished[order_id] = max(previous, filled)
+                if len(self._finished) > self.max_finished:
+                    self._finished.popitem(last=False)
+            else:
+                self._filled[order_id] = filled
+            if filled <= previous:
+                self._counters['skipped'] += 1
+                return False
+        self.trigger()
+        return True
+
+    def trigger(self):
+        # Ask for a position refresh within the debounce window
+        with self._condition:
+            self._counters['triggers'] += 1
+            if self._sent_at is not None:
+                if self._pending:
+                    self._counters['coalesced'] += 1
+                self._pending = True
+            elif self._due is not None:
+                self._counters['coalesced'] += 1
+            else:
+                self._due = self.clock() + self.debounce
+                self._condition.notify()
+
+    def refresh_now(self):
+        # Request positions without debounce, e.g. after the connection. Coalesced with an outstanding request.
+        with self._condition:
+            self._counters['triggers'] += 1
+            if self._sent_at is not None:
+                self._pending = True
+            else:
+                self._due = self.clock()
+                self._condition.notify()
+
+    def on_position_end(self):
+        # Called by Orders.positionEnd, the outstanding request is complete
+        with self._condition:
+            self._sent_at = None
+            if self._pending:
+                self._pending = False
+                self._due = self.clock() + self.debounce
+            self._condition.notify()
+
+    @property
+    def outstanding(self) -> bool:
+        # True while a position request waits for positionEnd
+        with self._condition:
+            return self._sent_at is not None
+
+    def stats(self) -> dict:
+        # triggers, requests sent, coalesced triggers, skipped statuses without fill, timed out requests
+        with self._condition:
+            return dict(self._counters)
+
+    def close(self):
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while True:
+                    if self._closed:
+                        return
+                    now = self.clock()
+                    if self._sent_at is not None:
+                        # Wait for positionEnd, give the request up after request_timeout
+                        wait = self._sent_at + self.request_timeout - now
+                        if wait <= 0:
+                            logger.warning("No positionEnd within {} seconds, the position request is given up"
+                                           .format(self.request_timeout))
+                            self._counters['timeouts'] += 1
+                            self._sent_at = None
+                            if self._pending:
+                                self._pending = False
+                                self._due = now
+                            continue
+                    elif self._due is not None:
+                        wait = self._due - now
+                        if wait <= 0:
+                            break
+                    else:
+                        wait = None
+                    self._condition.wait(wait)
+                self._due = None
+                self._sent_at = self.clock()
+                self._counters['requests'] += 1
+            try:
+                self.request()
+            except Exception as err:
+                logger.warning("Error {} occured when requesting positions!".format(err))
+                with self._condition:
+                    self._sent_at = None
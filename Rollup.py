@@ -0,0 +1,199 @@
+"""
+Author: Rosenyoung
+This module rolls 5 seconds bars up into 1 minute, 5 minutes, 1 hour and 1 day bars stored in the rollupbar table.
+
+Live: BarRollup.update(bar) is called by DataAPI for every real-time bar. It keeps the open bar of every
+timeframe in memory and returns the rows to upsert, so the table always holds the current partial bar
+(Complete = 0) which is marked Complete = 1 as soon as a bar of the next period arrives.
+The open bars saved by an earlier run are loaded by seed(symbols) at startup, update() never reads the database.
+History: BarRollup.build(symbol, start, end) reads fivesecondbar one day at a time and upserts all periods of
+the range, e.g. after historical_to_database or a backfill. The built periods which are not over yet become the
+open bars of update().
+
+A period starts at a multiple of its length in UTC epoch seconds, so 1 day bars run from 00:00 to 24:00 UTC.
+Volume is the sum of the positive volumes (MIDPOINT bars have Volume -1), Average is the mean of the 5 seconds
+averages, Bars is the number of 5 seconds bars and LastTime the DateTime of the last one.
+
+Version 1.0 2026-10-18
+Version 1.1 2026-10-18
+The open periods are seeded by seed() and build() instead of a query in update() on the reader thread.
+"""
+
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+from DataBaseConn import DataBaseConn
+
+from loguru import logger
+
+# Timeframe name -> seconds, every one divides 86400
+TIMEFRAMES = {'1m': 60, '5m': 300, '1h': 3600, '1d': 86400}
+ROLLUP_COLUMNS = ['Contract', 'Timeframe', 'DateTime', 'Open', 'High', 'Low', 'Close', 'Volume', 'Average',
+                  'Count', 'Bars', 'LastTime', 'Complete']
+DAY_SQL = """
+    SELECT `DateTime`, Open, High, Low, Close, Volume, Average, Count FROM fivesecondbar
+    WHERE Contract = :symbol AND `DateTime` >= :start AND `DateTime` < :end
+    ORDER BY `DateTime`
+"""
+OPEN_BARS_SQL = """
+    SELECT Timeframe, `DateTime`, Open, High, Low, Close, Volume, Average, Count, Bars, LastTime
+    FROM rollupbar WHERE Contract = :symbol AND Complete = 0
+    ORDER BY `DateTime`
+"""
+READ_SQL = """
+    SELECT * FROM rollupbar
+    WHERE Contract = :symbol AND Timeframe = :timeframe AND `DateTime` >= :start AND `DateTime` <= :end
+    ORDER BY `DateTime`
+"""
+
+
+def rollup_frame(df, seconds: int) -> pd.DataFrame:
+    """
+    Aggregate 5 seconds bars (columns of fivesecondbar, in time order) into periods of seconds.
+    return a DataFrame with DateTime (period start), OHLC, Volume, Average, Count, Bars and LastTime
+    """
+    date_time = df['DateTime'].to_numpy(dtype=np.int64)
+    grouped = pd.DataFrame({
+        'DateTime': date_time - date_time % seconds, 'Open': df['Open'].to_numpy(), 'High': df['High'].to_numpy(),
+        'Low': df['Low'].to_numpy(), 'Close': df['Close'].to_numpy(),
+        'Volume': np.maximum(df['Volume'].fillna(0).to_numpy(dtype=np.int64), 0),
+        'Average': df['Average'].to_numpy(dtype=np.float64), 'Count': df['Count'].fillna(0).to_numpy(dtype=np.int64),
+        'LastTime': date_time}).groupby('DateTime', sort=True)
+    result = grouped.agg(Open=('Open', 'first'), High=('High', 'max'), Low=('Low', 'min'), Close=('Close', 'last'),
+                         Volume=('Volume', 'sum'), Average=('Average', 'mean'), Count=('Count', 'sum'),
+                         Bars=('Open', 'size'), LastTime=('LastTime', 'max'))
+    return result.reset_index()
+
+
+class BarRollup:
+    def __init__(self, database_conn: DataBaseConn = None, timeframes: dict = None):
+        """
+        database_conn: DataBaseConn - Used to read fivesecondbar and write rollupbar, a new one if None
+        timeframes: dict - Timeframe name -> seconds, TIMEFRAMES if None
+        """
+        self.database_conn = database_conn if database_conn is not None else DataBaseConn()
+        self.timeframes = dict(TIMEFRAMES if timeframes is None else timeframes)
+        # Statement of the rows returned by update(), e.g. for BatchWriter.put(row, statement)
+        self.upsert_sql = self.database_conn.upsert_sql('rollupbar', ROLLUP_COLUMNS, ROLLUP_COLUMNS[3:])
+
+        # symbol -> {timeframe: row dict of the open period}
+        self._open = {}
+        self._lock = threading.Lock()
+
+    def seed(self, symbols: list):
+        """
+        Load the open periods saved by an earlier run, one query per symbol. Call it before the first update(),
+        symbols which are not seeded start without open periods.
+        The latest open period of every timeframe is continued, or marked complete by the next bar.
+        """
+        for symbol in symbols:
+            try:
+                with self.database_conn.engine.connect() as conn:
+                    rows = conn.execute(text(OPEN_BARS_SQL), {'symbol': symbol}).mappings().all()
+            except Exception as err:
+                logger.warning("Error {} occured when reading the open rollup bars of {}!".format(err, symbol))
+                continue
+            # Rows are in time order, the latest of every timeframe is kept
+            open_bars = {row['Timeframe']: dict(row, Contract=symbol, Complete=0) for row in rows
+                         if row['Timeframe'] in self.timeframes}
+            with self._lock:
+                self._continue(symbol, open_bars)
+
+    def _continue(self, symbol, open_bars):
+        # Use the given open periods where they are later than the ones in memory. Must hold the lock.
+        current = self._open.setdefault(symbol, {})
+        for timeframe, row in open_bars.items():
+            if timeframe not in current or row['LastTime'] > current[timeframe]['LastTime']:
+                current[timeframe] = row
+
+    def update(self, bar: dict) -> list:
+        """
+        Add one 5 seconds bar (a row of fivesecondbar as a dict), called for every real-time bar in time order.
+        return the rollupbar rows to upsert: the updated open period of every timeframe, preceded by the
+        completed period if the bar starts a new one
+        """
+        symbol = bar['Contract']
+        date_time = int(bar['DateTime'])
+        volume = max(int(bar['Volume']), 0)
+        changed = []
+        with self._lock:
+            open_bars = self._open.setdefault(symbol, {})
+            for timeframe, seconds in self.timeframes.items():
+                start = date_time - date_time % seconds
+                row = open_bars.get(timeframe)
+                if row is not None and date_time <= row['LastTime']:
+                    # Already rolled up, e.g. the first real-time bar overlaps the historical data
+                    continue
+                if row is not None and row['DateTime'] == start:
+                    row['High'] = max(row['High'], bar['High'])
+                    row['Low'] = min(row['Low'], bar['Low'])
+                    row['Close'] = bar['Close']
+                    row['Volume'] += volume
+                    row['Bars'] += 1
+                    row['Average'] += (bar['Average'] - row['Average']) / row['Bars']
+                    row['Count'] += bar['Count']
+                    row['LastTime'] = date_time
+                else:
+                    if row is not None:
+                        changed.append(dict(row, Complete=1))
+                    row = open_bars[timeframe] = {
+                        'Contract': symbol, 'Timeframe': timeframe, 'DateTime': start, 'Open': bar['Open'],
+                        'High': bar['High'], 'Low': bar['Low'], 'Close': bar['Close'], 'Volume': volume,
+                        'Average': bar['Average'], 'Count': bar['Count'], 'Bars': 1, 'LastTime': date_time,
+                        'Complete': 0}
+                changed.append(dict(row))
+        return changed
+
+    def build(self, symbol: str, start: int, end: int = None) -> int:
+        """
+        Roll up the stored 5 seconds bars of symbol between start and end (epoch seconds) and upsert them.
+        The range is widened to whole UTC days, so every period is built from all of its bars.
+        Periods ending before the current time are marked complete.
+        return the number of rollupbar rows written
+        """
+        now = int(time.time())
+        end = now if end is None else int(end)
+        day = int(start) - int(start) % 86400
+        statement = text(self.upsert_sql)
+        written = 0
+        # timeframe -> last period built which is not over, continued by update()
+        open_bars = {}
+        while day < end:
+            df = pd.read_sql_query(text(DAY_SQL), self.database_conn.engine,
+                                   params={'symbol': symbol, 'start': day, 'end': day + 86400})
+            if len(df) > 0:
+                rows = []
+                for timeframe, seconds in self.timeframes.items():
+                    frame = rollup_frame(df, seconds)
+                    frame.insert(0, 'Contract', symbol)
+                    frame.insert(1, 'Timeframe', timeframe)
+                    frame['Complete'] = (frame['DateTime'] + seconds <= now).astype(int)
+                    rows.extend(frame[ROLLUP_COLUMNS].to_dict('records'))
+                    if frame['Complete'].iloc[-1] == 0:
+                        open_bars[timeframe] = rows[-1]
+                with self.database_conn.engine.begin() as conn:
+                    conn.execute(statement, rows)
+                written += len(rows)
+            day += 86400
+        # The open periods now include the stored bars, no query is needed on the next update
+        with self._lock:
+            self._continue(symbol, open_bars)
+        logger.info(f"Rollup of {symbol} built, {written} rows")
+        return written
+
+    def read(self, symbol: str, timeframe: str = '1m', start: int = 0, end: int = None,
+             complete_only: bool = False) -> pd.DataFrame:
+        """
+        Read the rollup bars of symbol with start <= DateTime <= end in time order
+        complete_only: bool - Drop the open period
+        """
+        df = pd.read_sql_query(text(READ_SQL), self.database_conn.engine,
+                               params={'symbol': symbol, 'timeframe': timeframe, 'start': int(start),
+                                       'end': int(time.time()) if end is None else int(end)})
+        if complete_only:
+            df = df[df['Complete'] == 1].reset_index(drop=True)
+        return df
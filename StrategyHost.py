@@ -0,0 +1,263 @@
+"""
+Author: Rosenyoung
+This module runs many strategies in one process over one data feed and one order gateway.
+
+StrategyHost owns a single DataAPI (one TWS connection for the bars of all symbols), a single Orders (one TWS
+connection for all orders) and a single HistoricalDataCache. Historical data is requested once for all symbols,
+every real-time bar is dequeued once and handed to each strategy registered for its symbol. Strategies are warmed
+up from the BarRing of DataAPI, all of them share the same bars without a copy.
+
+A strategy is any object with:
+    symbol: str                  - contract it trades
+    history_length: int          - optional, bars passed to warm_up
+    warm_up(history)             - optional, called once with the latest bars when the strategy is added, a
+                                   read-only BarRing window (structured array, e.g. history['Close'])
+    on_bar(bar, context)         - called for every new real-time bar of symbol on the dispatcher thread
+    on_order_done(handle, context) - optional, called when one of its orders is filled, cancelled or rejected
+See MASampleStrategy.MovingAverageCrossStrategy.
+
+Every strategy gets a StrategyContext to place orders. The orders carry the strategy name in orderRef, and the
+context keeps the position, orders and fills of that strategy only, so variants trading the same contract do
+not see each other's positions. Adding a strategy costs one warm-up from the shared cache and a list entry.
+
+Version 1.0 2026-10-18
+"""
+
+import queue
+import threading
+
+from DataAPI import DataAPI
+from Orders import Orders
+from HistoricalCache import HistoricalDataCache
+from Latency import LATENCY
+
+from loguru import logger
+
+
+class StrategyContext:
+    def __init__(self, host, name: str, strategy):
+        """
+        host: StrategyHost - Host of the strategy
+        name: str - Unique name, sent as orderRef with every order
+        strategy - The strategy object
+        """
+        self.host = host
+        self.name = name
+        self.strategy = strategy
+        self.symbol = strategy.symbol
+        # Time of the last bar given to the strategy
+        self.last_bar_time = 0
+
+        # Attribution of the orders of this strategy, updated by the order handles
+        self.position = 0.0
+        self.orders = 0
+        self.filled = 0.0
+        self.errors = 0
+        self.handles = []
+        self._filled_by_order = {}
+        self._lock = threading.Lock()
+
+    def place_order(self, order_type: str, action: str, amount, price: float = 1.10000):
+        """
+        Place an order of the contract of the strategy, see Orders.place_orders.
+        return the OrderHandle
+        """
+        return self.host.place_order(self, order_type, action, amount, price)
+
+    def _on_progress(self, handle):
+        # Called by the handle on every status or fill change
+        with self._lock:
+            delta = handle.filled - self._filled_by_order.get(handle.order_id, 0.0)
+            if delta <= 0:
+                return
+            self._filled_by_order[handle.order_id] = handle.filled
+            self.filled += delta
+            self.position += delta if handle.action.lower() == 'buy' else -delta
+
+    def _on_done(self, handle):
+        with self._lock:
+            self._filled_by_order.pop(handle.order_id, None)
+            if handle in self.handles:
+                self.handles.remove(handle)
+        on_order_done = getattr(self.strategy, 'on_order_done', None)
+        if on_order_done is not None:
+            on_order_done(handle, self)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'symbol': self.symbol, 'position': self.position, 'orders': self.orders,
+                    'filled': self.filled, 'open_orders': len(self.handles), 'errors': self.errors}
+
+
+class StrategyHost:
+    def __init__(self, symbols, contract_type: str, data_api: DataAPI = None, order_api: Orders = None,
+                 host: str = '127.0.0.1', port: int = 7497, data_client_id: int = None,
+                 order_client_id: int = None):
+        """
+        symbols: list - Contracts of all strategies, e.g. ['EUR', 'GBP']
+        contract_type: str - 'FX' or 'STK'
+        data_api: DataAPI, order_api: Orders - Shared clients, new ones connected to host:port if None
+        """
+        self.symbols = [symbols] if isinstance(symbols, str) else list(symbols)
+        self.contract_type = contract_type
+        self.data_api = data_api if data_api is not None else DataAPI(
+            self.symbols, contract_type, client_id=data_client_id, host=host, port=port)
+        self.order_api = order_api if order_api is not None else Orders(
+            contract_type, client_id=order_client_id, host=host, port=port)
+        self.historical_cache = HistoricalDataCache(self.data_api.database_conn)
+
+        # symbol -> list of StrategyContext, replaced (not changed) when a strategy is added or removed
+        self._contexts = {symbol: [] for symbol in self.symbols}
+        self._names = {}
+        self._lock = threading.Lock()
+
+        self.bar_queue = None
+        self._thread = None
+        self._stop = threading.Event()
+        self.bars = 0
+        self.dispatches = 0
+        # Latency key of the bar being dispatched and whether an order was linked to it
+        self._bar_key = None
+        self._bar_linked = False
+
+    def add_strategy(self, strategy, name: str = None) -> StrategyContext:
+        """
+        Register a strategy, it may be added while the host is running.
+        name: str - Unique name of the strategy, sent as orderRef. '<class>-<n>' if None
+        return the StrategyContext of the strategy
+        """
+        if strategy.symbol not in self._contexts:
+            raise ValueError(f"{strategy.symbol} is not a symbol of this host: {self.symbols}")
+        with self._lock:
+            if name is None:
+                name = f"{type(strategy).__name__}-{len(self._names) + 1}"
+            if name in self._names:
+                raise ValueError(f"A strategy named {name} is already registered")
+            context = StrategyContext(self, name, strategy)
+            self._names[name] = context
+
+        warm_up = getattr(strategy, 'warm_up', None)
+        if warm_up is not None:
+            length = getattr(strategy, 'history_length', 2880)
+            history = self.data_api.rings[strategy.symbol].window(length)
+            if len(history) == 0:
+                # load_history was not called, read the bars stored by earlier runs
+                history = self.historical_cache.read_historical_data(length=length,
+                                                                     symbol=strategy.symbol).to_records()
+            warm_up(history)
+            if len(history) > 0:
+                context.last_bar_time = int(history['DateTime'][-1])
+
+        with self._lock:
+            self._contexts[strategy.symbol] = self._contexts[strategy.symbol] + [context]
+        logger.info(f"Strategy {name} of {strategy.symbol} added")
+        return context
+
+    def remove_strategy(self, name: str):
+        # Stop giving bars to a strategy, its open orders are not cancelled
+        with self._lock:
+            context = self._names.pop(name)
+            self._contexts[context.symbol] = [c for c in self._contexts[context.symbol] if c is not context]
+
+    def contexts(self) -> list:
+        with self._lock:
+            return list(self._names.values())
+
+    def load_history(self):
+        # Request the missing historical bars of all symbols once and save them, before adding strategies
+        if not self.data_api.control.wait(30):
+            raise TimeoutError("No nextValidId from TWS")
+        self.data_api.request_historical_bar()
+        self.data_api.historical_to_database()
+
+    def start(self):
+        # Subscribe to the real-time bars of all symbols and dispatch them on a background thread
+        self.bar_queue = self.data_api.subscribe(symbols=self.symbols)
+        self.data_api.start_realtime_bars()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._dispatch, name='StrategyHost', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self.bar_queue is not None:
+            self.data_api.unsubscribe(self.bar_queue)
+            self.bar_queue = None
+
+    def run(self, duration: float = None):
+        # start(), block for duration seconds (forever if None), then stop()
+        self.start()
+        try:
+            self._stop.wait(duration)
+        finally:
+            self.stop()
+
+    def _dispatch(self):
+        while not self._stop.is_set():
+            try:
+                bar = self.bar_queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            self.bars += 1
+            self._bar_key = (bar['Contract'], bar['DateTime'])
+            self._bar_linked = False
+            LATENCY.mark(self._bar_key, 'bar_dequeued')
+            for context in self._contexts.get(bar['Contract'], ()):
+                # Skip bars the strategy has seen, e.g. the overlap with the warm-up history
+                if bar['DateTime'] <= context.last_bar_time:
+                    continue
+                context.last_bar_time = bar['DateTime']
+                self.dispatches += 1
+                try:
+                    context.strategy.on_bar(bar, context)
+                except Exception as err:
+                    context.errors += 1
+                    logger.exception(f"Error {err} occured in strategy {context.name}")
+            if not self._bar_linked:
+                LATENCY.mark(self._bar_key, 'decision', final=True)
+
+    def place_order(self, context: StrategyContext, order_type: str, action: str, amount, price: float = 1.10000):
+        # Place an order for a strategy through the shared Orders, see StrategyContext.place_order
+        contract = self.order_api.make_contract(context.symbol)
+        order = self.order_api.make_order(order_type, action, amount, price)
+        order.orderRef = context.name
+        order_id = self.order_api.next_order_id()
+        if self._bar_key is not None and threading.current_thread() is self._thread:
+            # The first order of a bar closes its decision stage, every order continues its latency trace
+            if not self._bar_linked:
+                LATENCY.mark(self._bar_key, 'decision')
+                self._bar_linked = True
+            LATENCY.link(order_id, self._bar_key)
+        handle = self.order_api.submit_order(order_id, context.symbol, contract, order)
+        with context._lock:
+            context.orders += 1
+            context.handles.append(handle)
+        handle.add_callback(context._on_progress)
+        handle.add_done_callback(context._on_done)
+        logger.info(f"Strategy {context.name} placed order {order_id}: {action} {amount} {context.symbol}")
+        return handle
+
+    def stats(self) -> dict:
+        # Bars dequeued, strategy calls and the attribution of every strategy
+        return {'bars': self.bars, 'dispatches': self.dispatches,
+                'strategies': {context.name: context.stats() for context in self.contexts()}}
+
+
+if __name__ == '__main__':
+    from MASampleStrategy import MovingAverageCrossStrategy
+
+    strategy_host = StrategyHost(['EUR'], 'FX')
+    strategy_host.load_history()
+    # 20 parameter variants share one feed, one order connection and one historical read
+    for short_period in (3, 5, 8, 13):
+        for long_period in (20, 50, 100, 200, 400):
+            strategy_host.add_strategy(MovingAverageCrossStrategy('EUR', short_period, long_period),
+                                       name=f"MA-EUR-{short_period}-{long_period}")
+    LATENCY.start_exporter('..\\logs\\latency.jsonl', interval=60)
+    strategy_host.run(duration=14400)
+    LATENCY.stop_exporter()
+    for name, stats in strategy_host.stats()['strategies'].items():
+        logger.info(f"{name}: {stats}")
@@ -0,0 +1,155 @@
+"""
+Author: Rosenyoung
+This module is a vectorized backtest engine for moving average crossover strategies.
+All short_window/long_window combinations of a parameter grid are computed with batched NumPy array operations
+instead of the per-bar event loop of backtrader.
+
+The rules are the same as SmaStrategy in MA_Backtesting_Sample:
+- A crossover at bar t creates a market order which is filled at the open price of bar t + 1
+- Cross up: go long `size`, cross down: go short `size`. A flip closes the position and opens the opposite one.
+- Commission is a fraction of the traded value, like cerebro.broker.setcommission(commission=0.00002)
+- The value of the account is marked to the close price of every bar
+
+Version 1.0 2026-10-18
+"""
+
+import contextlib
+import io
+import itertools
+
+import numpy as np
+import pandas as pd
+
+
+def sma_matrix(close, windows) -> np.ndarray:
+    """
+    Return simple moving averages of close for every window, shape (len(windows), len(close)).
+    Values before a window is full are NaN.
+    """
+    close = np.asarray(close, dtype=np.float64)
+    # Subtract the first price to keep the cumulative sum small and precise
+    cumsum = np.concatenate([[0.0], np.cumsum(close - close[0])])
+    result = np.full((len(windows), len(close)), np.nan)
+    for i, window in enumerate(windows):
+        result[i, window - 1:] = (cumsum[window:] - cumsum[:-window]) / window + close[0]
+    return result
+
+
+def crossover_targets(short_ma, long_ma) -> np.ndarray:
+    """
+    Return the target position direction after every bar, 1 long, -1 short, 0 before the first crossover.
+    short_ma, long_ma - arrays of shape (combinations, bars)
+    """
+    up = np.zeros(short_ma.shape, dtype=bool)
+    down = np.zeros(short_ma.shape, dtype=bool)
+    with np.errstate(invalid='ignore'):
+        up[:, 1:] = (short_ma[:, :-1] < long_ma[:, :-1]) & (short_ma[:, 1:] > long_ma[:, 1:])
+        down[:, 1:] = (short_ma[:, :-1] > long_ma[:, :-1]) & (short_ma[:, 1:] < long_ma[:, 1:])
+    signal = up.astype(np.int8) - down.astype(np.int8)
+
+    # Carry the last signal forward
+    index = np.where(signal != 0, np.arange(signal.shape[1]), 0)
+    np.maximum.accumulate(index, axis=1, out=index)
+    return np.take_along_axis(signal, index, axis=1)
+
+
+def evaluate_targets(open_, close, targets, size=50000, commission=0.00002, cash=100000.0) -> dict:
+    """
+    Fill the target positions at the next open and return the result of every combination.
+    targets - array of shape (combinations, bars) from crossover_targets
+    return dict of arrays: pnl, trades (number of fills), round_trips (closed trades),
+    max_drawdown (percent of the peak value), max_moneydown and final_value
+    """
+    open_ = np.asarray(open_, dtype=np.float64)
+    close = np.asarray(close, dtype=np.float64)
+
+    # Position held during bar t is the target decided at bar t - 1, filled at open[t]
+    held = np.zeros(targets.shape, dtype=np.float64)
+    held[:, 1:] = targets[:, :-1].astype(np.float64) * size
+    traded = np.diff(held, axis=1, prepend=0.0)
+
+    cash_flow = traded * open_ + np.abs(traded) * open_ * commission
+    value = cash - np.cumsum(cash_flow, axis=1) + held * close
+
+    peak = np.maximum.accumulate(value, axis=1)
+    moneydown = peak - value
+    fills = traded != 0
+    return {
+        'pnl': value[:, -1] - cash,
+        'trades': fills.sum(axis=1),
+        # Every fill after the first one is a flip which closes a trade
+        'round_trips': np.maximum(fills.sum(axis=1) - 1, 0),
+        'max_drawdown': (moneydown / peak).max(axis=1) * 100,
+        'max_moneydown': moneydown.max(axis=1),
+        'final_value': value[:, -1],
+    }
+
+
+def sweep(df, short_windows, long_windows, size=50000, commission=0.00002, cash=100000.0,
+          chunk_size=32) -> pd.DataFrame:
+    """
+    Backtest every (short_window, long_window) pair with short_window < long_window.
+    df - DataFrame with the columns of fivesecondbar (Open, Close) in time order,
+         e.g. DataBaseConn().read_historical_data(86400, 'EUR')
+    chunk_size: int - Number of pairs computed together, bounds the memory to about 8 * chunk_size * len(df) * 6 bytes
+    return a DataFrame with one row per pair
+    """
+    open_ = df['Open'].to_numpy(dtype=np.float64)
+    close = df['Close'].to_numpy(dtype=np.float64)
+
+    pairs = [(s, l) for s, l in itertools.product(short_windows, long_windows) if s < l]
+    windows = sorted({w for pair in pairs for w in pair})
+    row_of = {w: i for i, w in enumerate(windows)}
+    # Every moving average is computed once and shared by the pairs
+    mas = sma_matrix(close, windows)
+
+    results = []
+    for first in range(0, len(pairs), chunk_size):
+        chunk = pairs[first:first + chunk_size]
+        short_ma = mas[[row_of[s] for s, _ in chunk]]
+        long_ma = mas[[row_of[l] for _, l in chunk]]
+        targets = crossover_targets(short_ma, long_ma)
+        result = evaluate_targets(open_, close, targets, size, commission, cash)
+        result['short_window'] = [s for s, _ in chunk]
+        result['long_window'] = [l for _, l in chunk]
+        results.append(pd.DataFrame(result))
+
+    columns = ['short_window', 'long_window', 'pnl', 'trades', 'round_trips', 'max_drawdown', 'max_moneydown',
+               'final_value']
+    if not results:
+        return pd.DataFrame(columns=columns)
+    return pd.concat(results, ignore_index=True)[columns]
+
+
+def compare_with_backtrader(df, short_window=10, long_window=60) -> dict:
+    """
+    Run SmaStrategy of MA_Backtesting_Sample with backtrader and the vectorized engine for one pair,
+    return both final values. They should be equal up to floating point error.
+    """
+    from MA_Backtesting_Sample import create_cerebro, prepare_feed_data
+
+    cerebro = create_cerebro(prepare_feed_data(df), short_window, long_window)
+    # SmaStrategy prints every order and trade
+    with contextlib.redirect_stdout(io.StringIO()):
+        cerebro.run()
+
+    vectorized = sweep(df, [short_window], [long_window])
+    return {'backtrader_value': cerebro.broker.getvalue(),
+            'vectorized_value': float(vectorized['final_value'].iloc[0]),
+            'vectorized_trades': int(vectorized['trades'].iloc[0])}
+
+
+if __name__ == '__main__':
+    import time
+
+    from DataBaseConn import DataBaseConn
+
+    data_conn = DataBaseConn()
+    df = data_conn.read_historical_data(86400, 'EUR')
+
+    start = time.perf_counter()
+    results = sweep(df, range(5, 65, 5), range(20, 620, 20))
+    print(f"{len(results)} combinations in {time.perf_counter() - start:.2f} s")
+    print(results.sort_values('pnl', ascending=False).head(10))
+
+    print(compare_with_backtrader(df, 10, 60))
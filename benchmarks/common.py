@@ -0,0 +1,84 @@
+"""
+Author: Rosenyoung
+Helpers shared by the benchmarks.
+The benchmarks run against a throwaway SQLite database by default, or against MySQL if --url is given.
+The MySQL database must have been created by DDL.sql.
+
+Version 1.0 2026-10-18
+"""
+
+import os
+import sys
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+# The modules of this project live in the parent directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from DataBaseConn import DataBaseConn
+
+# SQLite version of DDL.sql, same columns and primary keys
+SQLITE_DDL = [
+    """
+    CREATE TABLE IF NOT EXISTS accountsummary (
+        Account TEXT NOT NULL, `TimeStamp` INTEGER NOT NULL, NetLiquidation REAL, TotalCashValue REAL,
+        AvailableFunds REAL, GrossPositionValue REAL,
+        PRIMARY KEY (Account, `TimeStamp`))
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS coverage (
+        Contract TEXT NOT NULL, StartTime INTEGER NOT NULL, EndTime INTEGER NOT NULL,
+        PRIMARY KEY (Contract, StartTime))
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS fivesecondbar (
+        Contract TEXT NOT NULL, `DateTime` INTEGER NOT NULL, Open REAL NOT NULL, High REAL NOT NULL,
+        Low REAL NOT NULL, Close REAL NOT NULL, Volume INTEGER, Average REAL, Count INTEGER,
+        PRIMARY KEY (Contract, `DateTime`))
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS orderstatus (
+        OrderID INTEGER NOT NULL, Contract TEXT NOT NULL, Action TEXT NOT NULL, `Status` TEXT NOT NULL,
+        AmountFilled REAL NOT NULL, Remaining REAL NOT NULL, AvgFillPrice REAL NOT NULL, ClientID TEXT,
+        LastUpdTime TEXT,
+        PRIMARY KEY (OrderID))
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS position (
+        Account TEXT NOT NULL, `Timestamp` INTEGER NOT NULL, Contract TEXT NOT NULL, Position REAL, AvgCost REAL,
+        PRIMARY KEY (Account, `Timestamp`, Contract))
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS rollupbar (
+        Contract TEXT NOT NULL, Timeframe TEXT NOT NULL, `DateTime` INTEGER NOT NULL, Open REAL NOT NULL,
+        High REAL NOT NULL, Low REAL NOT NULL, Close REAL NOT NULL, Volume INTEGER, Average REAL, Count INTEGER,
+        Bars INTEGER NOT NULL, LastTime INTEGER NOT NULL, Complete INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (Contract, Timeframe, `DateTime`))
+    """,
+]
+
+
+def make_bars(symbol: str, n: int, end: int, seed: int = 0) -> pd.DataFrame:
+    # n random walk 5 seconds bars of symbol ending before end, with the columns of fivesecondbar
+    close = 1.1 + np.cumsum(np.random.default_rng(seed).normal(0, 1e-4, n))
+    date_time = end - end % 5 - 5 * np.arange(n, 0, -1)
+    return pd.DataFrame({'Contract': symbol, 'DateTime': date_time, 'Open': close, 'High': close + 1e-4,
+                         'Low': close - 1e-4, 'Close': close, 'Volume': -1, 'Average': close, 'Count': 0})
+
+
+def setup_database(url: str = None) -> str:
+    """
+    Point DataBaseConn to the benchmark database and return its url.
+    url: str - sqlalchemy url, a new SQLite file in the temp directory if None
+    """
+    if url is None:
+        url = 'sqlite:///' + os.path.join(tempfile.mkdtemp(prefix='ibapi_bench_'), 'bench.db')
+    DataBaseConn.configure(url=url)
+    if url.startswith('sqlite'):
+        with DataBaseConn().connection() as conn:
+            cur = conn.cursor()
+            for ddl in SQLITE_DDL:
+                cur.execute(ddl)
+    return url
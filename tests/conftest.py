@@ -0,0 +1,72 @@
+"""
+Author: Rosenyoung
+Fixtures shared by the tests. The tests run offline, against a throwaway SQLite database and FakeTWS:
+server is a FakeTWS with the bars of the bars fixture, dataapi and orders are clients connected to it.
+
+Run from the root of the repository:
+python -m pytest -q tests
+
+Version 1.0 2026-10-18
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+import pandas as pd
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# The modules of this project live in the root, the SQLite schema in benchmarks/common.py
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+# DataAPI, Orders and MASampleStrategy add log files under ..\logs of the working directory
+os.chdir(tempfile.mkdtemp(prefix='ibapi_test_'))
+
+from common import make_bars, setup_database
+
+
+@pytest.fixture
+def database():
+    # A new SQLite database with the tables of DDL.sql, DataBaseConn points to it
+    return setup_database()
+
+
+@pytest.fixture
+def bars():
+    # 720 EUR bars ending before now for historical requests, 10 later bars for the real-time replay
+    now = int(time.time())
+    return {'EUR': pd.concat([make_bars('EUR', 720, now - 60), make_bars('EUR', 10, now + 3600, seed=1)],
+                             ignore_index=True)}
+
+
+@pytest.fixture
+def server(database, bars):
+    # FakeTWS serving bars, real-time replays start after the historical part
+    from FakeTWS import FakeTWS
+
+    server = FakeTWS(bars=bars, speed=None, replay_start=int(bars['EUR']['DateTime'].iloc[720])).start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def dataapi(server):
+    from DataAPI import DataAPI
+
+    dataapi = DataAPI('EUR', 'FX', client_id=1, port=server.port)
+    assert dataapi.control.wait(10)
+    yield dataapi
+    dataapi.disconnect()
+
+
+@pytest.fixture
+def orders(server):
+    from Orders import Orders
+
+    orders = Orders('FX', client_id=2, port=server.port)
+    assert orders.control.wait(10)
+    yield orders
+    orders.disconnect()
@@ -0,0 +1,88 @@
+"""
+Author: Rosenyoung
+AsyncDataAPI and AsyncOrders against FakeTWS: historical futures, the timeout of request_historical_bar,
+real-time bars and orders.
+
+Version 1.0 2026-10-18
+"""
+
+import asyncio
+
+import pandas as pd
+import pytest
+
+from AsyncAPI import AsyncDataAPI, AsyncOrders
+
+
+def run(server, coroutine_function):
+    # Run coroutine_function(data_api, order_api) with clients connected to server, disconnect them after
+    async def main():
+        data_api = await AsyncDataAPI.create('EUR', 'FX', timeout=10, client_id=3, port=server.port)
+        order_api = await AsyncOrders.create('FX', timeout=10, client_id=4, port=server.port)
+        try:
+            return await coroutine_function(data_api, order_api)
+        finally:
+            data_api.api.disconnect()
+            order_api.api.disconnect()
+    return asyncio.run(main())
+
+
+def test_historical_bars_are_a_future(server, bars):
+    async def body(data_api, order_api):
+        return await asyncio.wait_for(data_api.historical_bars('EUR', 600), 10)
+
+    df = run(server, body)
+    # The bars of the last 600 seconds, the historical bars end about 60 seconds ago
+    assert 0 < len(df) < 120
+    assert df['DateTime'].tolist() == bars['EUR']['DateTime'].iloc[720 - len(df):720].tolist()
+
+
+def test_request_historical_bar_saves_the_bars(server):
+    async def body(data_api, order_api):
+        inserted = await data_api.request_historical_bar(timeout=10)
+        count = pd.read_sql("SELECT COUNT(*) AS n FROM fivesecondbar", data_api.api.engine)['n'].iloc[0]
+        return inserted, count
+
+    inserted, count = run(server, body)
+    assert inserted == count == 720
+
+
+def test_timeout_cancels_the_pending_requests(server):
+    cancelled = []
+
+    async def body(data_api, order_api):
+        api = data_api.api
+        # TWS never answers
+        api.reqHistoricalData = lambda *args, **kwargs: None
+        api.cancelHistoricalData = cancelled.append
+        with pytest.raises(asyncio.TimeoutError):
+            await data_api.request_historical_bar(timeout=0.2)
+        return set(api.pending_historical), dict(api.historical_callbacks), dict(api.historical_buffers)
+
+    assert run(server, body) == (set(), {}, {})
+    assert len(cancelled) == 1
+
+
+def test_bars_iterates_the_real_time_bars(server, bars):
+    async def body(data_api, order_api):
+        iterator = data_api.bars(['EUR'])
+        data_api.start_realtime_bars()
+        bar = await asyncio.wait_for(iterator.__anext__(), 10)
+        await iterator.aclose()
+        return bar
+
+    assert run(server, body)['DateTime'] == bars['EUR']['DateTime'].iloc[720]
+
+
+def test_orders_are_awaited(server):
+    async def body(data_api, order_api):
+        filled = await order_api.place_orders('EUR', 'MKT', 'buy', 1000, timeout=10)
+        resting = await order_api.place_orders('EUR', 'LMT', 'buy', 1000, 0.5, wait=False)
+        updates = order_api.updates(resting)
+        assert (await updates.__anext__()).status in ('PendingSubmit', 'Submitted')
+        cancelled = await order_api.cancel(resting, timeout=10)
+        async for handle in updates:
+            pass
+        return filled.status, cancelled.status, handle.status
+
+    assert run(server, body) == ('Filled', 'Cancelled', 'Cancelled')
@@ -0,0 +1,134 @@
+"""
+Author: Rosenyoung
+Backfill: pacing limits, window splitting, BackfillScheduler with a fake client and DataAPI.backfill on FakeTWS.
+
+Version 1.0 2026-10-18
+"""
+
+import calendar
+import threading
+import time
+from types import SimpleNamespace
+
+import pandas as pd
+
+from Backfill import BackfillScheduler, PacingLimiter
+from DataBaseConn import DataBaseConn
+
+END = 1_700_000_000 - 1_700_000_000 % 3600
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeHistoricalClient:
+    # Answers every request from another thread with one bar per 5 seconds, or with the errors given per symbol
+    def __init__(self, errors=None):
+        self.scheduler = None
+        self.errors = errors or {}
+        self.requests = []
+
+    def reqHistoricalData(self, reqId, contract, endDateTime, durationStr, barSizeSetting, whatToShow,
+                          useRTH, formatDate, keepUpToDate, chartOptions):
+        end = calendar.timegm(time.strptime(endDateTime, '%Y%m%d-%H:%M:%S'))
+        start = end - int(durationStr.split()[0])
+        self.requests.append((contract, start, end))
+        error = self.errors.get(contract)
+
+        def answer():
+            if error is not None:
+                self.scheduler.on_error(reqId, *error)
+                return
+            for t in range(start, end, 5):
+                self.scheduler.on_bar(reqId, SimpleNamespace(date=str(t), open=1.1, high=1.1, low=1.1, close=1.1,
+                                                             volume=-1, average=1.1, barCount=0))
+            self.scheduler.on_end(reqId)
+        threading.Thread(target=answer).start()
+
+    def cancelHistoricalData(self, reqId):
+        pass
+
+
+def make_scheduler(client, **kwargs):
+    req_ids = iter(range(1, 1000000))
+    # contract is the symbol, so the fake client knows the symbol of a request
+    client.scheduler = BackfillScheduler(client, {'EUR': 'EUR', 'GBP': 'GBP'}, lambda: next(req_ids),
+                                         limiter=PacingLimiter(contract_period=0.01), **kwargs)
+    return client.scheduler
+
+
+def count_bars():
+    return pd.read_sql("SELECT Contract, COUNT(*) AS n FROM fivesecondbar GROUP BY Contract",
+                       DataBaseConn().engine).set_index('Contract')['n'].to_dict()
+
+
+def test_limiter_keeps_the_global_limit():
+    clock = FakeClock()
+    limiter = PacingLimiter(max_requests=3, period=10, contract_requests=10, clock=clock)
+    for symbol in ['EUR', 'GBP', 'AUD']:
+        assert limiter.delay(symbol) == 0
+        limiter.record(symbol)
+        clock.now += 1
+    assert limiter.delay('CAD') == 7
+    clock.now = 10
+    assert limiter.delay('CAD') == 0
+
+
+def test_limiter_keeps_the_contract_limit():
+    clock = FakeClock()
+    limiter = PacingLimiter(contract_requests=2, contract_period=2, clock=clock)
+    limiter.record('EUR')
+    clock.now = 0.5
+    limiter.record('EUR')
+    assert limiter.delay('EUR') == 1.5
+    assert limiter.delay('GBP') == 0
+    clock.now = 2
+    assert limiter.delay('EUR') == 0
+
+
+def test_range_is_split_into_aligned_windows(database):
+    scheduler = make_scheduler(FakeHistoricalClient(), window_seconds=3600)
+    scheduler.add_range('EUR', END - 7202, END)
+    windows = [(window.start, window.end) for window in scheduler._pending['EUR']]
+    assert windows == [(END - 7205, END - 3605), (END - 3605, END - 5), (END - 5, END)]
+    assert scheduler.progress()['pending'] == 3
+
+
+def test_scheduler_writes_every_window_once(database):
+    client = FakeHistoricalClient()
+    scheduler = make_scheduler(client, window_seconds=1800)
+    for symbol in ['EUR', 'GBP']:
+        scheduler.add_range(symbol, END - 7200, END)
+    assert scheduler.run(timeout=10)
+    assert count_bars() == {'EUR': 1440, 'GBP': 1440}
+    assert len(client.requests) == 8
+
+    # Running the same range again adds nothing
+    scheduler.add_range('EUR', END - 3600, END)
+    assert scheduler.run(timeout=10)
+    assert count_bars() == {'EUR': 1440, 'GBP': 1440}
+
+
+def test_no_data_completes_and_errors_are_given_up(database):
+    client = FakeHistoricalClient(errors={'EUR': (162, 'HMDS query returned no data'),
+                                          'GBP': (321, 'Error validating request')})
+    scheduler = make_scheduler(client, retry_delay=0, max_attempts=2)
+    for symbol in ['EUR', 'GBP']:
+        scheduler.add_range(symbol, END - 3600, END)
+    assert not scheduler.run(timeout=10)
+    progress = scheduler.progress()
+    assert (progress['windows_written'], progress['windows_failed'], progress['bars_written']) == (1, 1, 0)
+    assert [contract for contract, _, _ in client.requests].count('GBP') == 2
+
+
+def test_dataapi_backfill_writes_missing_range(dataapi, bars):
+    start, end = int(bars['EUR']['DateTime'].iloc[0]), int(bars['EUR']['DateTime'].iloc[719]) + 5
+    dataapi.backfill(start, end, window_seconds=1200)
+    count = pd.read_sql("SELECT COUNT(*) AS n FROM fivesecondbar", dataapi.engine)['n'].iloc[0]
+    assert count == 720
+    assert dataapi.coverage.gaps('EUR', start, end) == []
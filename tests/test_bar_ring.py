@@ -0,0 +1,85 @@
+"""
+Author: Rosenyoung
+BarRing: appends across the wrap, zero-copy read-only windows, extend without duplicates and frames.
+
+Version 1.0 2026-10-18
+"""
+
+import numpy as np
+import pytest
+
+from common import make_bars
+from BarRing import BarRing, to_bar_array
+from DataBaseConn import BAR_COLUMNS
+
+START = 1_700_000_000
+
+
+def bars(n, first=START):
+    # n bars from first on
+    return make_bars('EUR', n, first + 5 * n)
+
+
+def test_window_keeps_the_latest_bars_across_the_wrap():
+    ring = BarRing(capacity=8, symbol='EUR')
+    for bar in bars(20).to_dict('records'):
+        assert ring.append(bar)
+    assert len(ring) == 8 and ring.appended == 20
+    assert ring.window()['DateTime'].tolist() == list(range(START + 60, START + 100, 5))
+    assert ring.window(3)['DateTime'].tolist() == [START + 85, START + 90, START + 95]
+    assert ring.window(100).shape == (8,)
+    assert ring.last_time == START + 95
+
+
+def test_windows_are_read_only_views():
+    ring = BarRing(capacity=8)
+    ring.extend(bars(5))
+    window = ring.window(5)
+    assert np.shares_memory(window, ring._buffer)
+    with pytest.raises(ValueError):
+        window['Close'][0] = 0.0
+    # Appending does not change the window until it is overwritten
+    closes = ring.column('Close', 5).copy()
+    ring.append(bars(1, START + 25).to_dict('records')[0])
+    assert np.array_equal(window['Close'], closes)
+
+
+def test_old_and_duplicated_bars_are_skipped():
+    ring = BarRing(capacity=8)
+    df = bars(5)
+    assert ring.extend(df) == 5
+    assert ring.extend(df) == 0
+    assert not ring.append(df.to_dict('records')[-1])
+    # Unsorted, duplicated and partly old bars
+    more = bars(6, START + 15).iloc[::-1]
+    assert ring.extend(more.loc[more.index.repeat(2)]) == 4
+    assert ring.window()['DateTime'].tolist() == list(range(START + 5, START + 45, 5))
+
+
+def test_extend_keeps_the_last_capacity_bars():
+    ring = BarRing(capacity=8)
+    ring.extend(bars(3))
+    assert ring.extend(bars(20, START + 15)) == 20
+    assert ring.appended == 23
+    assert ring.window()['DateTime'].tolist() == list(range(START + 75, START + 115, 5))
+    ring.append(bars(1, START + 115).to_dict('records')[0])
+    assert ring.window(2)['DateTime'].tolist() == [START + 110, START + 115]
+
+
+def test_latest_and_to_frame_have_the_columns_of_fivesecondbar():
+    ring = BarRing(capacity=8, symbol='EUR')
+    assert ring.latest() is None
+    df = bars(4)
+    ring.extend(df)
+    frame = ring.to_frame()
+    assert list(frame.columns) == BAR_COLUMNS
+    assert np.allclose(frame['Close'], df['Close'])
+    assert ring.latest()['DateTime'] == START + 15 and ring.latest()['Contract'] == 'EUR'
+    assert to_bar_array(df).dtype == ring._buffer.dtype
+    ring.clear()
+    assert len(ring) == 0 and ring.last_time is None
+
+
+def test_capacity_must_be_positive():
+    with pytest.raises(ValueError):
+        BarRing(capacity=0)
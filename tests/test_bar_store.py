@@ -0,0 +1,68 @@
+"""
+Author: Rosenyoung
+BarStore: appends, time-range reads, the put_bar appender thread and reopening the files.
+
+Version 1.0 2026-10-18
+"""
+
+import numpy as np
+
+from common import make_bars
+from BarStore import BarStore
+
+START = 1_700_000_000
+
+
+def bars(symbol, n, seed=0):
+    # n bars from START on
+    return make_bars(symbol, n, START + 5 * n, seed=seed)
+
+
+def test_append_skips_old_and_duplicated_bars(tmp_path):
+    store = BarStore(str(tmp_path), flush_interval=0.05)
+    df = bars('EUR', 10)
+    assert store.append('EUR', df) == 10
+    assert store.append('EUR', df) == 0
+    assert store.append('EUR', bars('EUR', 15)) == 5
+    assert store.length('EUR') == 15
+    assert np.all(np.diff(store.read('EUR')['DateTime']) == 5)
+    store.close()
+
+
+def test_read_returns_the_time_range(tmp_path):
+    store = BarStore(str(tmp_path), flush_interval=0.05)
+    df = bars('EUR', 100)
+    store.append('EUR', df)
+    columns = store.read('EUR', START + 50, START + 100)
+    assert list(columns['DateTime']) == list(range(START + 50, START + 105, 5))
+    assert np.allclose(columns['Close'], df['Close'].to_numpy()[10:21])
+    assert len(store.read_last('EUR', 30)['DateTime']) == 30
+    frame = store.read_frame('EUR')
+    assert list(frame.columns) == list(df.columns)
+    assert np.allclose(frame['Close'], df['Close'])
+    store.close()
+
+
+def test_put_bar_appends_in_the_background(tmp_path):
+    store = BarStore(str(tmp_path), flush_interval=0.05)
+    for bar in bars('EUR', 20).to_dict('records') + bars('GBP', 5).to_dict('records'):
+        assert store.put_bar(bar)
+    # A bar not later than the last one is skipped
+    store.put_bar(bars('EUR', 1).to_dict('records')[0])
+    store.flush()
+    assert (store.length('EUR'), store.length('GBP')) == (20, 5)
+    assert store.stats() == {'queue_depth': 0, 'bars_dropped': 0}
+    store.close()
+
+
+def test_close_appends_the_queued_bars_and_the_store_reopens(tmp_path):
+    store = BarStore(str(tmp_path), flush_interval=0.05)
+    for bar in bars('EUR', 10).to_dict('records'):
+        store.put_bar(bar)
+    store.close(timeout=5)
+    assert not store.thread.is_alive()
+
+    store = BarStore(str(tmp_path), flush_interval=0.05)
+    assert store.length('EUR') == 10
+    assert store.last_time('EUR') == START + 45
+    store.close()
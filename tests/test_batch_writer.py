@@ -0,0 +1,135 @@
+"""
+Author: Rosenyoung
+BatchWriter: batches by size and time, runs of statements, dropped rows, coalesced keys and the on_flush hook.
+
+Version 1.0 2026-10-18
+"""
+
+import threading
+import time
+
+from sqlalchemy import create_engine, text
+
+from BatchWriter import BatchWriter
+
+INSERT_SQL = "INSERT INTO t (K, V) VALUES (:K, :V)"
+UPSERT_SQL = "INSERT INTO t (K, V) VALUES (:K, :V) ON CONFLICT DO UPDATE SET V = excluded.V"
+LOG_SQL = "INSERT INTO log (K) VALUES (:K)"
+
+
+def make_engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'writer.db'}")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE t (K INTEGER PRIMARY KEY, V INTEGER)"))
+        conn.execute(text("CREATE TABLE log (N INTEGER PRIMARY KEY AUTOINCREMENT, K INTEGER)"))
+    return engine
+
+
+def rows(engine, sql):
+    with engine.connect() as conn:
+        return conn.execute(text(sql)).fetchall()
+
+
+def test_full_batches_are_written_at_once(tmp_path):
+    engine = make_engine(tmp_path)
+    writer = BatchWriter(engine, INSERT_SQL, batch_size=10, flush_interval=2)
+    for i in range(20):
+        writer.put({'K': i, 'V': i})
+    # Two full batches do not wait for flush_interval
+    deadline = time.monotonic() + 1
+    while writer.stats()['rows_written'] < 20 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert writer.stats()['rows_written'] == 20
+    assert writer.stats()['batches'] == 2
+    writer.close()
+
+
+def test_partial_batch_is_written_after_flush_interval(tmp_path):
+    engine = make_engine(tmp_path)
+    writer = BatchWriter(engine, INSERT_SQL, batch_size=500, flush_interval=0.1)
+    start = time.monotonic()
+    writer.put({'K': 1, 'V': 1})
+    writer.flush()
+    assert 0.05 < time.monotonic() - start < 2
+    assert rows(engine, "SELECT K, V FROM t") == [(1, 1)]
+    writer.close()
+
+
+def test_runs_of_statements_keep_the_order(tmp_path):
+    engine = make_engine(tmp_path)
+    writer = BatchWriter(engine, INSERT_SQL, flush_interval=0.05)
+    for i in range(6):
+        if i % 3 == 0:
+            writer.put({'K': i}, LOG_SQL)
+        else:
+            writer.put({'K': i, 'V': i})
+    writer.flush()
+    assert rows(engine, "SELECT K FROM log ORDER BY N") == [(0,), (3,)]
+    assert [k for k, in rows(engine, "SELECT K FROM t ORDER BY K")] == [1, 2, 4, 5]
+    assert writer.stats()['batches'] == 1
+    writer.close()
+
+
+def test_rows_are_dropped_when_the_queue_is_full(tmp_path):
+    engine = make_engine(tmp_path)
+    release = threading.Event()
+    # The hook blocks the flusher, so the queue fills up
+    writer = BatchWriter(engine, INSERT_SQL, max_queue=5, batch_size=1, flush_interval=0.01,
+                         on_flush=lambda batch: release.wait(5))
+    writer.put({'K': 0, 'V': 0})
+    deadline = time.monotonic() + 5
+    while writer.stats()['rows_written'] < 1 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    accepted = [writer.put({'K': i, 'V': i}) for i in range(1, 11)]
+    assert accepted == [True] * 5 + [False] * 5
+    assert writer.stats()['rows_dropped'] == 5
+    release.set()
+    writer.flush()
+    assert len(rows(engine, "SELECT K FROM t")) == 6
+    writer.close()
+
+
+def test_failed_batch_is_counted(tmp_path):
+    engine = make_engine(tmp_path)
+    writer = BatchWriter(engine, INSERT_SQL, flush_interval=0.05)
+    # Duplicated primary key, the whole batch is rolled back
+    writer.put({'K': 1, 'V': 1})
+    writer.put({'K': 1, 'V': 2})
+    writer.flush()
+    assert writer.stats()['rows_failed'] == 2
+    assert rows(engine, "SELECT K FROM t") == []
+    writer.close()
+
+
+def test_coalesce_key_writes_the_last_row_of_a_key(tmp_path):
+    engine = make_engine(tmp_path)
+    writer = BatchWriter(engine, UPSERT_SQL, flush_interval=0.05, coalesce_key=lambda row: row['K'])
+    for v in range(5):
+        writer.put({'K': 1, 'V': v})
+    writer.put({'K': 2, 'V': 9})
+    writer.flush()
+    assert rows(engine, "SELECT K, V FROM t ORDER BY K") == [(1, 4), (2, 9)]
+    stats = writer.stats()
+    assert (stats['rows_written'], stats['rows_coalesced']) == (6, 4)
+    writer.close()
+
+
+def test_on_flush_gets_the_committed_rows(tmp_path):
+    engine = make_engine(tmp_path)
+    flushed = []
+    writer = BatchWriter(engine, INSERT_SQL, flush_interval=0.05, on_flush=flushed.extend)
+    writer.put({'K': 1, 'V': 1})
+    writer.put({'K': 2, 'V': 2})
+    writer.flush()
+    assert flushed == [{'K': 1, 'V': 1}, {'K': 2, 'V': 2}]
+    writer.close()
+
+
+def test_close_writes_the_remaining_rows(tmp_path):
+    engine = make_engine(tmp_path)
+    writer = BatchWriter(engine, INSERT_SQL, flush_interval=0.05)
+    for i in range(3):
+        writer.put({'K': i, 'V': i})
+    writer.close(timeout=5)
+    assert not writer.thread.is_alive()
+    assert len(rows(engine, "SELECT K FROM t")) == 3
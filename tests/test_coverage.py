@@ -0,0 +1,82 @@
+"""
+Author: Rosenyoung
+CoverageIndex: bar intervals, merging, gaps, the coverage table and rebuild from fivesecondbar.
+
+Version 1.0 2026-10-18
+"""
+
+import pandas as pd
+from sqlalchemy import text
+
+from common import make_bars
+from Coverage import CoverageIndex, bar_intervals
+from DataBaseConn import BAR_COLUMNS, DataBaseConn
+
+T = 1_700_000_000
+
+
+def saved_intervals():
+    return pd.read_sql("SELECT Contract, StartTime, EndTime FROM coverage ORDER BY Contract, StartTime",
+                       DataBaseConn().engine).values.tolist()
+
+
+def test_bar_intervals_split_at_missing_bars():
+    assert bar_intervals([]) == []
+    assert bar_intervals([T + 10, T, T + 5, T + 5, T + 30]) == [(T, T + 15), (T + 30, T + 35)]
+
+
+def test_add_merges_overlapping_and_touching_intervals(database):
+    coverage = CoverageIndex()
+    coverage.add('EUR', T, T + 10)
+    coverage.add('EUR', T + 20, T + 30)
+    coverage.add('EUR', T + 50, T + 60)
+    assert coverage.add('EUR', T + 10, T + 25) == (T, T + 30)
+    assert coverage.intervals('EUR') == [(T, T + 30), (T + 50, T + 60)]
+    # An empty interval changes nothing
+    coverage.add('EUR', T + 40, T + 40)
+    assert coverage.stats()['intervals'] == 2
+
+
+def test_gaps_are_the_missing_ranges(database):
+    coverage = CoverageIndex()
+    coverage.add_times('EUR', [T, T + 5, T + 20, T + 25, T + 60])
+    assert coverage.gaps('EUR', T - 10, T + 100) == [(T - 10, T), (T + 10, T + 20), (T + 30, T + 60),
+                                                      (T + 65, T + 100)]
+    assert coverage.gaps('EUR', T, T + 100, min_gap=30) == [(T + 30, T + 60), (T + 65, T + 100)]
+    assert coverage.covered('EUR', T + 20, T + 30)
+    assert coverage.gaps('GBP', T, T + 10) == [(T, T + 10)]
+
+
+def test_save_replaces_the_absorbed_intervals_and_load_reads_them(database):
+    coverage = CoverageIndex()
+    coverage.add('EUR', T, T + 10)
+    coverage.add('EUR', T + 20, T + 30)
+    coverage.save()
+    assert saved_intervals() == [['EUR', T, T + 10], ['EUR', T + 20, T + 30]]
+    coverage.add('EUR', T + 10, T + 20)
+    coverage.save()
+    assert saved_intervals() == [['EUR', T, T + 30]]
+    assert coverage.stats()['unsaved'] == 0
+
+    loaded = CoverageIndex()
+    loaded.load(['EUR'])
+    assert loaded.intervals('EUR') == [(T, T + 30)]
+
+
+def test_on_rows_written_saves_after_save_interval(database):
+    coverage = CoverageIndex(save_interval=0)
+    coverage.on_rows_written([{'Contract': 'EUR', 'DateTime': T}, {'Contract': 'GBP', 'DateTime': T + 5}])
+    assert saved_intervals() == [['EUR', T, T + 5], ['GBP', T + 5, T + 10]]
+
+
+def test_rebuild_reads_fivesecondbar(database):
+    database_conn = DataBaseConn()
+    df = pd.concat([make_bars('EUR', 10, T), make_bars('EUR', 4, T + 200)])
+    with database_conn.engine.begin() as conn:
+        conn.execute(text(database_conn.insert_ignore_sql('fivesecondbar', BAR_COLUMNS)), df.to_dict('records'))
+    coverage = CoverageIndex()
+    coverage.add('EUR', T - 1000, T - 900)
+    # Small chunks, the intervals are joined across chunks
+    coverage.rebuild('EUR', chunksize=3)
+    assert coverage.intervals('EUR') == [(T - 50, T), (T + 180, T + 200)]
+    assert saved_intervals() == [['EUR', T - 50, T], ['EUR', T + 180, T + 200]]
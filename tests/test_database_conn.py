@@ -0,0 +1,84 @@
+"""
+Author: Rosenyoung
+DataBaseConn: the shared engine, configure() on existing users, statement builders and bar reads.
+
+Version 1.0 2026-10-18
+"""
+
+import time
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+from common import make_bars, setup_database
+from BatchWriter import BatchWriter
+from Coverage import CoverageIndex
+from DataBaseConn import BAR_COLUMNS, BAR_FIELDS, DataBaseConn, epoch_to_datetime
+
+
+def insert_bars(database_conn, df):
+    with database_conn.engine.begin() as conn:
+        conn.execute(text(database_conn.insert_ignore_sql('fivesecondbar', BAR_COLUMNS)), df.to_dict('records'))
+
+
+def count_bars(url):
+    DataBaseConn.configure(url=url)
+    return pd.read_sql("SELECT COUNT(*) AS n FROM fivesecondbar", DataBaseConn().engine)['n'].iloc[0]
+
+
+def test_objects_share_one_engine(database):
+    assert DataBaseConn().engine is DataBaseConn().engine
+
+
+def test_configure_applies_to_existing_users(database):
+    database_conn = DataBaseConn()
+    writer = BatchWriter(database_conn, database_conn.insert_ignore_sql('fivesecondbar', BAR_COLUMNS),
+                         flush_interval=0.05)
+    coverage = CoverageIndex(database_conn)
+    old_engine = database_conn.engine
+
+    second = setup_database()
+    assert database_conn.engine is not old_engine
+    writer.put(make_bars('EUR', 1, 1_700_000_000).to_dict('records')[0])
+    writer.flush()
+    coverage.add('EUR', 1_700_000_000, 1_700_000_005)
+    coverage.save()
+    writer.close()
+
+    assert writer.stats()['rows_written'] == 1
+    assert count_bars(second) == 1
+    assert count_bars(database) == 0
+
+
+def test_insert_ignore_and_upsert(database):
+    database_conn = DataBaseConn()
+    upsert = database_conn.upsert_sql('position', ['Account', 'Timestamp', 'Contract', 'Position', 'AvgCost'],
+                                      ['Position', 'AvgCost'])
+    row = {'Account': 'DU1', 'Timestamp': 1, 'Contract': 'EUR', 'Position': 1.0, 'AvgCost': 1.1}
+    with database_conn.engine.begin() as conn:
+        conn.execute(text(upsert), [row, {**row, 'Position': 2.0}])
+    positions = pd.read_sql("SELECT Position FROM position", database_conn.engine)
+    assert positions['Position'].tolist() == [2.0]
+
+    df = make_bars('EUR', 10, 1_700_000_000)
+    insert_bars(database_conn, df)
+    insert_bars(database_conn, df)
+    assert count_bars(database) == 10
+
+
+def test_read_historical_array_matches_the_dataframe(database):
+    database_conn = DataBaseConn()
+    insert_bars(database_conn, make_bars('EUR', 100, 1_700_000_000))
+    df = database_conn.read_historical_data(30, 'EUR')
+    array = database_conn.read_historical_array(30, 'EUR')
+    assert len(array) == 30
+    for field in BAR_FIELDS:
+        assert np.allclose(array[field], df[field].to_numpy())
+
+
+def test_epoch_to_datetime_matches_localtime():
+    epochs = np.arange(1_700_000_000, 1_700_000_000 + 86400 * 3, 3599)
+    expected = [pd.Timestamp(*time.localtime(epoch)[:6]) for epoch in epochs]
+    assert list(epoch_to_datetime(epochs)) == expected
+    assert epoch_to_datetime(epochs, local=False)[0] == pd.Timestamp(1_700_000_000, unit='s')
@@ -0,0 +1,83 @@
+"""
+Author: Rosenyoung
+FakeTWS and the clients end to end: real-time bars, limit orders against the replayed price and the position
+subscription.
+
+Version 1.0 2026-10-18
+"""
+
+import time
+
+import pandas as pd
+import pytest
+
+from common import make_bars
+
+
+def wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_real_time_bar_is_published_and_saved(dataapi, bars):
+    bar_queue = dataapi.subscribe(symbols=['EUR'])
+    dataapi.start_realtime_bars()
+    bar = bar_queue.get(timeout=10)
+    assert bar['DateTime'] == bars['EUR']['DateTime'].iloc[720]
+    dataapi.bar_writer.flush()
+
+    stored = pd.read_sql("SELECT DateTime, Close FROM fivesecondbar WHERE Contract = 'EUR'", dataapi.engine)
+    assert stored.set_index('DateTime').loc[bar['DateTime'], 'Close'] == pytest.approx(bar['Close'])
+    assert dataapi.ring('EUR').last_time >= bar['DateTime']
+
+
+def test_limit_order_rests_until_it_is_cancelled(orders):
+    # The bars are around 1.1, nobody sells at 0.5
+    handle = orders.place_orders('EUR', 'LMT', 'buy', 1000, 0.5)
+    assert not handle.wait(timeout=0.3)
+    assert handle.status == 'Submitted'
+    handle.cancel()
+    assert handle.result(timeout=5) == 'Cancelled'
+
+
+def test_marketable_limit_order_fills_at_the_market_price(orders, bars):
+    buy = orders.place_orders('EUR', 'LMT', 'buy', 1000, 2.0)
+    sell = orders.place_orders('EUR', 'MKTIFTCH', 'sell', 1000, 0.5)
+    assert buy.wait_filled(timeout=5) and sell.wait_filled(timeout=5)
+    # The last close before the replay
+    assert buy.avg_fill_price == pytest.approx(bars['EUR']['Close'].iloc[719])
+
+
+def test_limit_order_fills_when_a_replayed_bar_crosses_it(database):
+    from FakeTWS import FakeTWS
+    from DataAPI import DataAPI
+    from Orders import Orders
+
+    now = int(time.time())
+    df = make_bars('EUR', 15, now + 3600)
+    df['Close'] = [1.2] * 10 + [1.2, 1.15, 1.1, 1.05, 1.0]
+    server = FakeTWS(bars={'EUR': df}, speed=None, replay_start=int(df['DateTime'].iloc[10])).start()
+    dataapi = DataAPI('EUR', 'FX', client_id=1, port=server.port)
+    orders = Orders('FX', client_id=2, port=server.port)
+    try:
+        assert dataapi.control.wait(10) and orders.control.wait(10)
+        buy = orders.place_orders('EUR', 'LMT', 'buy', 1000, 1.08)
+        sell = orders.place_orders('EUR', 'LMT', 'sell', 1000, 1.3)
+        assert not buy.wait(timeout=0.3)
+        dataapi.start_realtime_bars()
+        assert buy.wait_filled(timeout=10)
+        assert buy.avg_fill_price == pytest.approx(1.05)
+        assert wait_until(lambda: server.stats()['bars_sent'] == 5)
+        assert sell.status == 'Submitted'
+    finally:
+        dataapi.disconnect()
+        orders.disconnect()
+        server.stop()
+
+
+def test_cancel_positions_stops_the_position_updates(orders, server):
+    # Orders loads its position book by reqPositions and sends cancelPositions on positionEnd
+    assert orders.position_book.wait_ready(timeout=5)
+    assert wait_until(lambda: len(server._position_sessions) == 0)
@@ -0,0 +1,97 @@
+"""
+Author: Rosenyoung
+HistoricalDataCache: same rows as the database, incremental reads, eviction, and the query outside the lock.
+
+Version 1.0 2026-10-18
+"""
+
+import threading
+
+from sqlalchemy import text
+
+from common import make_bars
+from DataBaseConn import BAR_COLUMNS, DataBaseConn
+from HistoricalCache import HistoricalDataCache
+
+END = 1_700_000_000
+
+
+def insert_bars(df):
+    database_conn = DataBaseConn()
+    with database_conn.engine.begin() as conn:
+        conn.execute(text(database_conn.insert_ignore_sql('fivesecondbar', BAR_COLUMNS)), df.to_dict('records'))
+
+
+def test_hit_reads_only_the_new_rows(database):
+    insert_bars(make_bars('EUR', 100, END))
+    cache = HistoricalDataCache()
+    assert len(cache.read_historical_data(50, 'EUR')) == 50
+    insert_bars(make_bars('EUR', 110, END + 50))
+
+    df = cache.read_historical_data(50, 'EUR')
+    assert df.equals(DataBaseConn().read_historical_data(50, 'EUR'))
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['rows_fetched']) == (1, 1, 60)
+
+
+def test_longer_window_is_a_miss(database):
+    insert_bars(make_bars('EUR', 100, END))
+    cache = HistoricalDataCache()
+    cache.read_historical_data(10, 'EUR')
+    assert len(cache.read_historical_data(80, 'EUR')) == 80
+    assert len(cache.read_historical_data(30, 'EUR')) == 30
+    assert (cache.stats()['hits'], cache.stats()['misses']) == (1, 2)
+
+
+def test_least_recently_used_symbol_is_evicted(database):
+    for symbol in ['EUR', 'GBP', 'AUD']:
+        insert_bars(make_bars(symbol, 10, END))
+    cache = HistoricalDataCache(max_symbols=2)
+    cache.read_historical_data(10, 'EUR')
+    cache.read_historical_data(10, 'GBP')
+    cache.read_historical_data(10, 'EUR')
+    cache.read_historical_data(10, 'AUD')
+    assert list(cache._entries) == ['EUR', 'AUD']
+    assert cache.stats()['evictions'] == 1
+
+    cache.invalidate('EUR')
+    assert cache.stats()['symbols'] == 1
+
+
+class BlockingConn(DataBaseConn):
+    # Blocks the full window reads until released
+    def __init__(self):
+        super().__init__()
+        self.reading = threading.Event()
+        self.release = threading.Event()
+
+    def read_historical_data(self, length=2880, symbol='EUR'):
+        self.reading.set()
+        self.release.wait(5)
+        return super().read_historical_data(length, symbol)
+
+
+def test_database_is_read_outside_the_lock(database):
+    insert_bars(make_bars('EUR', 100, END))
+    database_conn = BlockingConn()
+    cache = HistoricalDataCache(database_conn)
+    reader = threading.Thread(target=cache.read_historical_data, args=(50, 'EUR'))
+    reader.start()
+    assert database_conn.reading.wait(5)
+    # The lock is free while the query runs
+    assert cache._lock.acquire(timeout=1)
+    cache._lock.release()
+    database_conn.release.set()
+    reader.join(5)
+    assert cache.stats()['misses'] == 1
+
+
+def test_rows_cached_meanwhile_are_merged(database):
+    insert_bars(make_bars('EUR', 100, END))
+    cache = HistoricalDataCache()
+    old = DataBaseConn().read_historical_data(80, 'EUR').iloc[:-10]
+    # Another thread cached a shorter but newer window while this one read the older rows
+    cache.read_historical_data(20, 'EUR')
+    df, capacity = cache._merge('EUR', old, 80)
+    assert capacity == 80
+    assert df.equals(DataBaseConn().read_historical_data(80, 'EUR'))
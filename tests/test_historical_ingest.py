@@ -0,0 +1,77 @@
+"""
+Author: Rosenyoung
+Historical ingest of DataAPI against FakeTWS: requests end on historicalDataEnd or error, bars are saved once.
+
+Version 1.0 2026-10-18
+"""
+
+import threading
+import time
+
+import pandas as pd
+
+from common import make_bars
+from DataBaseConn import BAR_COLUMNS
+
+
+def test_saved_bars_are_not_saved_again(dataapi, bars):
+    dataapi.request_historical_bar()
+    assert dataapi.historical_to_database() == 720
+    assert dataapi.data == []
+    assert dataapi.historical_saved.is_set()
+    # Nothing new, and the bars already stored are not counted
+    assert dataapi.historical_to_database() == 0
+
+    stored = pd.read_sql("SELECT DateTime FROM fivesecondbar WHERE Contract = 'EUR' ORDER BY DateTime",
+                         dataapi.engine)
+    assert stored['DateTime'].tolist() == bars['EUR']['DateTime'].iloc[:720].tolist()
+    # The ring of the symbol is filled from the saved bars
+    assert dataapi.ring('EUR').last_time == bars['EUR']['DateTime'].iloc[719]
+
+
+def test_only_new_bars_are_counted(dataapi, bars):
+    dataapi.data.extend(bars['EUR'].iloc[:700][BAR_COLUMNS].values.tolist())
+    assert dataapi.historical_to_database() == 700
+    dataapi.data.extend(bars['EUR'].iloc[690:720][BAR_COLUMNS].values.tolist())
+    assert dataapi.historical_to_database() == 20
+
+
+def test_failed_request_ends_the_wait(dataapi):
+    # FakeTWS answers error 162 when there is no data, the request must not stay pending
+    req_id = dataapi.request_historical('EUR', 60, end_date_time='20000101 00:00:00')
+    start = time.monotonic()
+    assert dataapi.wait_historical(timeout=10)
+    assert time.monotonic() - start < 5
+    assert req_id not in dataapi.pending_historical
+    assert dataapi.data == []
+
+
+def test_callback_gets_the_bars_of_its_request(dataapi, bars):
+    results = []
+    done = threading.Event()
+
+    def callback(rows, error):
+        results.append((rows, error))
+        done.set()
+
+    dataapi.request_historical('EUR', 86400, callback=callback)
+    assert done.wait(10)
+    rows, error = results[0]
+    assert error is None
+    assert [int(row[1]) for row in rows] == bars['EUR']['DateTime'].iloc[:720].tolist()
+    # Bars of a request with a callback are not added to self.data
+    assert dataapi.data == []
+
+
+def test_unknown_symbol_is_rejected_before_sending(dataapi):
+    try:
+        dataapi.request_historical('XXX', 60)
+    except ValueError as err:
+        assert 'XXX' in str(err)
+    else:
+        raise AssertionError('ValueError expected')
+    assert not dataapi.pending_historical
+
+
+def test_make_bars_has_the_columns_of_fivesecondbar():
+    assert list(make_bars('EUR', 3, 1_700_000_000).columns) == BAR_COLUMNS
@@ -0,0 +1,61 @@
+"""
+Author: Rosenyoung
+Incremental indicators must agree with the pandas rolling mean they replace.
+
+Version 1.0 2026-10-18
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from Indicators import MovingAverageCross, RollingMean
+
+
+def test_rolling_mean_matches_pandas():
+    values = np.random.default_rng(3).normal(1.1, 0.01, 1000)
+    mean = RollingMean(20)
+    result = [mean.update(value) for value in values]
+    expected = pd.Series(values).rolling(20).mean()
+    assert result[:19] == [None] * 19
+    assert np.allclose(result[19:], expected[19:], rtol=0, atol=1e-12)
+
+
+def test_rolling_mean_is_ready_when_full():
+    mean = RollingMean(3)
+    assert not mean.ready and mean.value is None
+    for value in (1, 2, 3):
+        mean.update(value)
+    assert mean.ready
+    assert mean.update(10) == pytest.approx(5.0)
+
+
+def test_rolling_mean_rejects_empty_window():
+    with pytest.raises(ValueError):
+        RollingMean(0)
+
+
+def test_cross_matches_the_dataframe_signals():
+    close = pd.Series(1.1 + np.cumsum(np.random.default_rng(5).normal(0, 1e-4, 3000)))
+    short_ma, long_ma = close.rolling(5).mean(), close.rolling(30).mean()
+    expected_up = (short_ma > long_ma) & (short_ma.shift() < long_ma.shift())
+    expected_down = (short_ma < long_ma) & (short_ma.shift() > long_ma.shift())
+
+    cross = MovingAverageCross(5, 30)
+    up, down = [], []
+    for value in close:
+        cross.update(value)
+        up.append(cross.crossed_up())
+        down.append(cross.crossed_down())
+    assert up == expected_up.tolist()
+    assert down == expected_down.tolist()
+    assert any(up) and any(down)
+
+
+def test_cross_is_not_ready_before_two_long_averages():
+    cross = MovingAverageCross(2, 4)
+    for value in (1, 2, 3, 4):
+        cross.update(value)
+        assert not cross.ready
+    cross.update(5)
+    assert cross.ready
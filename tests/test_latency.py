@@ -0,0 +1,50 @@
+"""
+Author: Rosenyoung
+LatencyTracker: histogram percentiles, traces continued by order IDs, and the stage order of DataAPI.realtimeBar.
+
+Version 1.0 2026-10-18
+"""
+
+from Latency import LATENCY, LatencyHistogram, LatencyTracker
+
+
+def test_histogram_percentiles_within_the_bucket_resolution():
+    histogram = LatencyHistogram()
+    for value in range(1, 10001):
+        histogram.record(value * 1000)
+    summary = histogram.summary()
+    assert summary['count'] == 10000
+    assert abs(summary['p50_us'] - 5000) / 5000 < 0.07
+    assert abs(summary['p99_us'] - 9900) / 9900 < 0.07
+    assert summary['max_us'] == 10000
+
+
+def test_linked_order_continues_the_trace_of_its_bar():
+    tracker = LatencyTracker()
+    tracker.mark(('EUR', 1), 'bar_received', start=True)
+    tracker.mark(('EUR', 1), 'decision')
+    tracker.link(7, ('EUR', 1))
+    tracker.mark(7, 'order_sent')
+    tracker.mark(7, 'first_status', final=True)
+    # The trace is closed, later stages are ignored
+    tracker.mark(7, 'first_status')
+    assert set(tracker.snapshot()) == {'bar_received->decision', 'decision->order_sent', 'bar_received->order_sent',
+                                       'order_sent->first_status', 'bar_received->first_status'}
+    assert tracker.snapshot()['order_sent->first_status']['count'] == 1
+
+
+def test_bar_is_marked_published_before_subscribers_take_it(dataapi):
+    LATENCY.reset()
+    taken = []
+
+    def strategy(bar):
+        LATENCY.mark((bar['Contract'], bar['DateTime']), 'bar_dequeued')
+        taken.append(bar['DateTime'])
+
+    dataapi.subscribe(symbols=['EUR'], callback=strategy)
+    dataapi.req_symbols[9999] = 'EUR'
+    dataapi.realtimeBar(9999, 1_700_000_000, 1.1, 1.1, 1.1, 1.1, -1, 1.1, 0)
+    assert taken == [1_700_000_000]
+    stages = LATENCY.snapshot()
+    assert stages['bar_published->bar_dequeued']['count'] == 1
+    assert 'bar_dequeued->bar_published' not in stages
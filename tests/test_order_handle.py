@@ -0,0 +1,100 @@
+"""
+Author: Rosenyoung
+OrderHandle: waiting for fills, status and done callbacks, rejects, cancels and failing callbacks.
+
+Version 1.0 2026-10-18
+"""
+
+import threading
+
+import pytest
+
+from OrderHandle import OrderHandle
+
+
+def fill_later(handle, *statuses, delay=0.05):
+    # Send statuses (status, filled) from another thread, like the message thread of Orders
+    def send():
+        for status, filled in statuses:
+            handle.on_status(status, filled, handle.quantity - filled, 1.1, 1.1)
+    timer = threading.Timer(delay, send)
+    timer.start()
+    return timer
+
+
+def test_wait_filled_returns_after_the_fill():
+    handle = OrderHandle(1, 'EUR', 'BUY', 1000)
+    fill_later(handle, ('Submitted', 0), ('Filled', 1000))
+    assert handle.wait_filled(timeout=5)
+    assert handle.result(timeout=5) == 'Filled'
+    assert handle.done and handle.is_filled
+
+
+def test_wait_filled_for_a_partial_fill():
+    handle = OrderHandle(1, 'EUR', 'BUY', 1000)
+    fill_later(handle, ('Submitted', 400))
+    assert handle.wait_filled(400, timeout=5)
+    assert not handle.done
+    assert not handle.wait_filled(timeout=0.05)
+
+
+def test_wait_filled_returns_false_when_cancelled():
+    handle = OrderHandle(1, 'EUR', 'BUY', 1000)
+    fill_later(handle, ('Cancelled', 0))
+    assert not handle.wait_filled(timeout=5)
+    assert handle.result(timeout=0) == 'Cancelled'
+
+
+def test_result_times_out():
+    with pytest.raises(TimeoutError):
+        OrderHandle(1, 'EUR', 'BUY', 1000).result(timeout=0.01)
+
+
+def test_callbacks_run_on_changes_only():
+    handle = OrderHandle(1, 'EUR', 'BUY', 1000)
+    seen, done = [], []
+    handle.add_callback(lambda h: seen.append((h.status, h.filled)))
+    handle.add_done_callback(lambda h: done.append(h.status))
+    handle.on_status('Submitted', 0, 1000, 0.0, 0.0)
+    # A repeated status is not reported again
+    handle.on_status('Submitted', 0, 1000, 0.0, 0.0)
+    handle.on_status('Submitted', 500, 500, 1.1, 1.1)
+    handle.on_status('Filled', 1000, 0, 1.1, 1.1)
+    # Statuses after the end are ignored
+    handle.on_status('Filled', 1000, 0, 1.2, 1.2)
+    assert seen == [('PendingSubmit', 0.0), ('Submitted', 0.0), ('Submitted', 500.0), ('Filled', 1000.0)]
+    assert done == ['Filled']
+    assert handle.avg_fill_price == 1.1
+    # A done callback added later runs at once
+    handle.add_done_callback(lambda h: done.append('late'))
+    assert done == ['Filled', 'late']
+
+
+def test_reject_errors_finish_the_order():
+    handle = OrderHandle(1, 'EUR', 'BUY', 1000)
+    # A warning is not a reject
+    handle.on_error(399, 'Order message warning')
+    assert not handle.done
+    handle.on_error(103, 'Duplicate order id')
+    assert handle.result(timeout=0) == 'Rejected'
+    assert handle.error == (103, 'Duplicate order id')
+
+
+def test_cancel_calls_the_canceller_until_done():
+    cancelled = []
+    handle = OrderHandle(1, 'EUR', 'BUY', 1000, canceller=cancelled.append)
+    assert handle.cancel()
+    assert cancelled == [1]
+    handle.on_status('Cancelled', 0, 1000, 0.0, 0.0)
+    assert not handle.cancel()
+    assert not OrderHandle(2, 'EUR', 'BUY', 1000).cancel()
+
+
+def test_failing_callback_does_not_stop_the_others():
+    handle = OrderHandle(1, 'EUR', 'BUY', 1000)
+    seen = []
+    handle.add_callback(lambda h: 1 / 0 if h.status == 'Filled' else None)
+    handle.add_callback(lambda h: seen.append(h.status))
+    handle.on_status('Filled', 1000, 0, 1.1, 1.1)
+    assert seen == ['PendingSubmit', 'Filled']
+    assert handle.done
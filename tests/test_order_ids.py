@@ -0,0 +1,65 @@
+"""
+Author: Rosenyoung
+OrderIdAllocator: seeding by nextValidId, consecutive reservations, the timeout and unique IDs across threads.
+
+Version 1.0 2026-10-18
+"""
+
+import threading
+
+import pytest
+
+from OrderIds import OrderIdAllocator
+
+
+def test_ids_continue_from_next_valid_id():
+    allocator = OrderIdAllocator()
+    assert not allocator.ready and allocator.peek() is None
+    allocator.seed(100)
+    assert allocator.next_id() == 100
+    assert allocator.reserve(3) == range(101, 104)
+    assert allocator.peek() == 104
+
+
+def test_later_next_valid_id_never_moves_backwards():
+    allocator = OrderIdAllocator()
+    allocator.seed(100)
+    allocator.reserve(10)
+    allocator.seed(105)
+    assert allocator.next_id() == 110
+    allocator.seed(200)
+    assert allocator.next_id() == 200
+
+
+def test_reserve_times_out_without_next_valid_id():
+    with pytest.raises(TimeoutError):
+        OrderIdAllocator().next_id(timeout=0.05)
+
+
+def test_waiting_reservation_gets_the_seeded_id():
+    allocator = OrderIdAllocator()
+    result = []
+    thread = threading.Thread(target=lambda: result.append(allocator.next_id(timeout=5)))
+    thread.start()
+    allocator.seed(7)
+    thread.join(5)
+    assert result == [7]
+
+
+def test_threads_get_unique_ids():
+    allocator = OrderIdAllocator()
+    allocator.seed(1)
+    ids = []
+    lock = threading.Lock()
+
+    def allocate():
+        mine = [allocator.next_id() for _ in range(500)] + list(allocator.reserve(50))
+        with lock:
+            ids.extend(mine)
+
+    threads = [threading.Thread(target=allocate) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(ids) == list(range(1, 1 + 8 * 550))
@@ -0,0 +1,66 @@
+"""
+Author: Rosenyoung
+Orders against FakeTWS: order IDs, baskets, filled orders in the orderstatus table, statuses of done and
+unknown orders.
+
+Version 1.0 2026-10-18
+"""
+
+import pandas as pd
+import pytest
+
+
+def order_rows(orders):
+    orders.db_writer.flush()
+    return pd.read_sql("SELECT * FROM orderstatus ORDER BY OrderID", orders.engine)
+
+
+def test_market_order_is_filled_and_saved(orders):
+    handle = orders.place_orders('EUR', 'MKT', 'buy', 1000)
+    assert handle.wait_filled(timeout=10)
+
+    row = order_rows(orders).iloc[0]
+    assert row['OrderID'] == handle.order_id
+    assert (row['Contract'], row['Action'], row['Status']) == ('EUR', 'buy', 'Filled')
+    assert row['AmountFilled'] == 1000
+
+
+def test_status_of_a_done_order_updates_its_row(orders):
+    handle = orders.place_orders('EUR', 'MKT', 'sell', 1000)
+    assert handle.wait(timeout=10)
+    assert orders.get_handle(handle.order_id) is None
+    # A repeated Filled with the final average price
+    orders.orderStatus(handle.order_id, 'Filled', 1000, 0, 1.2345, 0, 0, 1.2345, orders.clientId, '', 0.0)
+
+    row = order_rows(orders).iloc[0]
+    assert (row['Contract'], row['Action'], row['Status']) == ('EUR', 'sell', 'Filled')
+    assert row['AvgFillPrice'] == 1.2345
+
+
+def test_status_of_an_unknown_order_writes_no_row(orders):
+    orders.orderStatus(999999, 'Filled', 1000, 0, 1.1, 0, 0, 1.1, 0, '', 0.0)
+    assert order_rows(orders).empty
+
+
+def test_order_ids_start_at_next_valid_id(orders, server):
+    first = orders.place_orders('EUR', 'MKT', 'buy', 1000)
+    handles = orders.place_basket([('EUR', 'MKT', 'buy', 1000), ('GBP', 'LMT', 'sell', 1000, 2.0)])
+    assert first.order_id == 1
+    assert [handle.order_id for handle in handles] == [2, 3]
+
+
+def test_invalid_basket_sends_nothing(orders, server):
+    with pytest.raises(Exception):
+        orders.place_basket([('EUR', 'MKT', 'buy', 1000), ('EUR', 'STP', 'sell', 1000)])
+    assert orders.order_ids.peek() == 1
+    assert server.stats()['orders'] == 0
+
+
+def test_basket_statuses_are_not_overtaken(orders):
+    # The fills of a basket arrive while it is being sent, no order may stay 'Submitted' in the database
+    handles = orders.place_basket([('EUR', 'MKT', 'buy', 1000)] * 50)
+    assert all(handle.wait_filled(timeout=10) for handle in handles)
+    orders.db_writer.flush()
+
+    statuses = pd.read_sql("SELECT Status, COUNT(*) AS n FROM orderstatus GROUP BY Status", orders.engine)
+    assert statuses.set_index('Status')['n'].to_dict() == {'Filled': 50}
@@ -0,0 +1,48 @@
+"""
+Author: Rosenyoung
+PositionBook: per account positions, totals over accounts and the first snapshot.
+
+Version 1.0 2026-10-18
+"""
+
+import threading
+import time
+
+from PositionBook import PositionBook
+
+
+def test_positions_per_account_and_total():
+    book = PositionBook()
+    book.update('DU1', 'EUR', 100000, 1.1)
+    book.update('DU2', 'EUR', -40000, 1.2)
+    book.update('DU1', 'GBP', 5, 1.3)
+    assert book.get('EUR') == 60000
+    assert book.get('EUR', 'DU2') == -40000
+    assert book.avg_cost('EUR', 'DU1') == 1.1
+    assert book.get('AUD') == 0.0
+
+
+def test_update_replaces_the_position_of_an_account():
+    book = PositionBook()
+    book.update('DU1', 'EUR', 100000, 1.1)
+    book.update('DU1', 'EUR', 30000, 1.15)
+    assert book.get('EUR') == 30000
+    assert book.snapshot() == {('DU1', 'EUR'): (30000.0, 1.15)}
+
+
+def test_ready_after_position_end():
+    book = PositionBook()
+    assert not book.wait_ready(0.01)
+    threading.Timer(0.05, book.mark_ready).start()
+    assert book.wait_ready(5)
+    assert book.ready
+
+
+def test_orders_book_follows_the_fills(orders):
+    assert orders.position_book.wait_ready(10)
+    handle = orders.place_orders('EUR', 'MKT', 'buy', 1000)
+    assert handle.wait_filled(timeout=10)
+    deadline = time.monotonic() + 5
+    while orders.position_book.get('EUR') != 1000 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert orders.position_book.get('EUR') == 1000
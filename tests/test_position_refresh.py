@@ -0,0 +1,91 @@
+"""
+Author: Rosenyoung
+PositionRefresher: only fills trigger, repeated final statuses are skipped, triggers are coalesced and at most one
+request is outstanding.
+
+Version 1.0 2026-10-18
+"""
+
+import time
+
+from PositionRefresh import PositionRefresher
+
+
+def wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.005)
+    return condition()
+
+
+def make_refresher(**kwargs):
+    requests = []
+    refresher = PositionRefresher(lambda: requests.append(time.monotonic()), **kwargs)
+    return refresher, requests
+
+
+def test_only_fills_trigger():
+    refresher, requests = make_refresher(debounce=0.01)
+    assert not refresher.on_order_status(1, 'PreSubmitted', 0)
+    assert not refresher.on_order_status(1, 'Submitted', 0)
+    assert refresher.on_order_status(1, 'Submitted', 500)
+    assert not refresher.on_order_status(1, 'Submitted', 500)
+    assert wait_until(lambda: len(requests) == 1)
+    assert refresher.stats()['skipped'] == 3
+    refresher.close()
+
+
+def test_duplicated_filled_sends_one_request():
+    refresher, requests = make_refresher(debounce=0.01)
+    assert refresher.on_order_status(1, 'Filled', 1000)
+    assert wait_until(lambda: len(requests) == 1)
+    refresher.on_position_end()
+    # TWS often repeats the final status
+    assert not refresher.on_order_status(1, 'Filled', 1000)
+    assert not refresher.on_order_status(1, 'Filled', 1000)
+    time.sleep(0.05)
+    assert len(requests) == 1
+    assert refresher.stats()['skipped'] == 2
+    refresher.close()
+
+
+def test_finished_orders_are_bounded():
+    refresher, requests = make_refresher(debounce=0.01, max_finished=2)
+    for order_id in range(1, 4):
+        refresher.on_order_status(order_id, 'Cancelled', 0)
+    assert list(refresher._finished) == [2, 3]
+    refresher.close()
+
+
+def test_fills_within_the_debounce_share_one_request():
+    refresher, requests = make_refresher(debounce=0.1)
+    for order_id in range(1, 6):
+        refresher.on_order_status(order_id, 'Filled', 1000)
+    assert wait_until(lambda: len(requests) == 1)
+    time.sleep(0.15)
+    assert len(requests) == 1
+    assert refresher.stats()['coalesced'] == 4
+    refresher.close()
+
+
+def test_fills_during_an_outstanding_request_cause_one_more():
+    refresher, requests = make_refresher(debounce=0.01)
+    refresher.on_order_status(1, 'Filled', 1000)
+    assert wait_until(lambda: refresher.outstanding)
+    refresher.on_order_status(2, 'Filled', 1000)
+    refresher.on_order_status(3, 'Filled', 1000)
+    time.sleep(0.05)
+    assert len(requests) == 1
+    refresher.on_position_end()
+    assert wait_until(lambda: len(requests) == 2)
+    refresher.close()
+
+
+def test_request_without_position_end_is_given_up():
+    refresher, requests = make_refresher(debounce=0.01, request_timeout=0.05)
+    refresher.refresh_now()
+    assert wait_until(lambda: refresher.outstanding)
+    refresher.trigger()
+    assert wait_until(lambda: len(requests) == 2)
+    assert refresher.stats()['timeouts'] >= 1
+    refresher.close()
@@ -0,0 +1,110 @@
+"""
+Author: Rosenyoung
+BarRollup: live updates against build, seeding of the open periods and no database reads in update().
+
+Version 1.0 2026-10-18
+"""
+
+import time
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+from common import make_bars
+from DataBaseConn import BAR_COLUMNS, DataBaseConn
+from Rollup import ROLLUP_COLUMNS, BarRollup, rollup_frame
+
+DAY = 1_700_000_000 - 1_700_000_000 % 86400
+FIELDS = ['Open', 'High', 'Low', 'Close', 'Volume', 'Average', 'Count', 'Bars', 'LastTime']
+
+
+def store_bars(df):
+    database_conn = DataBaseConn()
+    with database_conn.engine.begin() as conn:
+        conn.execute(text(database_conn.insert_ignore_sql('fivesecondbar', BAR_COLUMNS)), df.to_dict('records'))
+
+
+def upsert(rollup, rows):
+    with rollup.database_conn.engine.begin() as conn:
+        conn.execute(text(rollup.upsert_sql), rows)
+
+
+def test_rollup_frame_aggregates_the_periods():
+    df = make_bars('EUR', 24, DAY + 120)
+    df['Volume'] = np.arange(24) - 1
+    frame = rollup_frame(df, 60)
+    assert frame['DateTime'].tolist() == [DAY, DAY + 60]
+    first = df.iloc[:12]
+    assert frame.iloc[0][['Open', 'High', 'Low', 'Close']].tolist() == [
+        first['Open'].iloc[0], first['High'].max(), first['Low'].min(), first['Close'].iloc[-1]]
+    # Negative volumes of MIDPOINT bars count as 0
+    assert frame['Volume'].tolist() == [sum(range(11)), sum(range(11, 23))]
+    assert frame['Bars'].tolist() == [12, 12]
+    assert frame['LastTime'].tolist() == [DAY + 55, DAY + 115]
+
+
+def test_live_rollups_match_build(database):
+    # 1000 bars across hour boundaries, a gap inside
+    df = make_bars('EUR', 1000, DAY + 8000)
+    df = df.drop(index=range(400, 430)).reset_index(drop=True)
+    store_bars(df)
+
+    live = BarRollup()
+    latest = {}
+    for bar in df.to_dict('records'):
+        for row in live.update(bar):
+            latest[(row['Timeframe'], row['DateTime'])] = row
+    live_df = pd.DataFrame(list(latest.values())).sort_values(['Timeframe', 'DateTime']).reset_index(drop=True)
+
+    built = BarRollup()
+    assert built.build('EUR', DAY, DAY + 86400) == len(live_df)
+    built_df = pd.concat([built.read('EUR', timeframe, DAY) for timeframe in ['1d', '1h', '1m', '5m']])
+    built_df = built_df.sort_values(['Timeframe', 'DateTime']).reset_index(drop=True)
+    assert built_df['DateTime'].tolist() == live_df['DateTime'].tolist()
+    assert np.allclose(built_df[FIELDS].to_numpy(dtype=float), live_df[FIELDS].to_numpy(dtype=float))
+
+
+def test_seed_continues_the_saved_open_periods(database):
+    first = BarRollup()
+    bars = make_bars('EUR', 3, DAY + 15).to_dict('records')
+    for bar in bars[:2]:
+        upsert(first, first.update(bar))
+
+    second = BarRollup()
+    second.seed(['EUR'])
+    # update() does not read the database
+    second.database_conn = None
+    rows = {row['Timeframe']: row for row in second.update(bars[2])}
+    assert rows['1m']['Bars'] == 3
+    assert rows['1m']['Open'] == bars[0]['Open']
+    # A bar already rolled up is skipped
+    assert second.update(bars[1]) == []
+
+
+def test_seed_completes_an_earlier_open_period(database):
+    first = BarRollup(timeframes={'1m': 60})
+    upsert(first, first.update(make_bars('EUR', 1, DAY + 5).to_dict('records')[0]))
+
+    second = BarRollup(timeframes={'1m': 60})
+    second.seed(['EUR'])
+    rows = second.update(make_bars('EUR', 1, DAY + 65).to_dict('records')[0])
+    assert [(row['DateTime'], row['Complete']) for row in rows] == [(DAY, 1), (DAY + 60, 0)]
+
+
+def test_build_seeds_the_open_period(database):
+    today = int(time.time()) - int(time.time()) % 86400
+    bars = make_bars('EUR', 5, today + 25).to_dict('records')
+    store_bars(pd.DataFrame(bars[:4]))
+    rollup = BarRollup(timeframes={'1d': 86400})
+    rollup.build('EUR', today)
+    rollup.database_conn = None
+    row, = rollup.update(bars[4])
+    assert (row['DateTime'], row['Bars'], row['Complete']) == (today, 5, 0)
+    assert row['Open'] == bars[0]['Open']
+
+
+def test_rows_have_the_rollup_columns(database):
+    rollup = BarRollup()
+    for row in rollup.update(make_bars('EUR', 1, DAY + 5).to_dict('records')[0]):
+        assert list(row) == ROLLUP_COLUMNS
@@ -0,0 +1,112 @@
+"""
+Author: Rosenyoung
+StrategyHost against FakeTWS: warm-up from the ring or the cache, one dispatch per bar and strategy, and the
+orders and positions of every strategy.
+
+Version 1.0 2026-10-18
+"""
+
+import time
+
+import pytest
+from sqlalchemy import text
+
+from DataBaseConn import BAR_COLUMNS
+from StrategyHost import StrategyHost
+
+
+def wait_until(condition, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+class RecordingStrategy:
+    # Records the warm-up and the bars, places one order on the first bar if order is given
+    def __init__(self, symbol='EUR', history_length=100, order=None, fail=False):
+        self.symbol = symbol
+        self.history_length = history_length
+        self.order = order
+        self.fail = fail
+        self.history = None
+        self.bars = []
+        self.done = []
+
+    def warm_up(self, history):
+        self.history = history
+
+    def on_bar(self, bar, context):
+        self.bars.append(bar['DateTime'])
+        if self.fail:
+            raise RuntimeError('strategy failed')
+        if self.order is not None and len(self.bars) == 1:
+            context.place_order('MKT', *self.order)
+
+    def on_order_done(self, handle, context):
+        self.done.append(handle.status)
+
+
+@pytest.fixture
+def host(dataapi, orders):
+    host = StrategyHost(['EUR'], 'FX', data_api=dataapi, order_api=orders)
+    yield host
+    host.stop()
+
+
+def test_strategies_warm_up_from_the_ring(host, bars):
+    host.load_history()
+    strategy = RecordingStrategy()
+    context = host.add_strategy(strategy, name='first')
+    assert strategy.history['DateTime'].tolist() == bars['EUR']['DateTime'].iloc[620:720].tolist()
+    assert context.last_bar_time == bars['EUR']['DateTime'].iloc[719]
+    assert host.historical_cache.stats()['misses'] == 0
+
+
+def test_warm_up_reads_the_cache_without_history(host, bars):
+    database_conn = host.data_api.database_conn
+    with database_conn.engine.begin() as conn:
+        conn.execute(text(database_conn.insert_ignore_sql('fivesecondbar', BAR_COLUMNS)),
+                     bars['EUR'].iloc[:720].to_dict('records'))
+    strategy = RecordingStrategy()
+    host.add_strategy(strategy)
+    assert len(strategy.history) == 100
+    assert host.historical_cache.stats()['misses'] == 1
+
+
+def test_every_strategy_gets_every_bar_once(host, bars):
+    host.load_history()
+    first, second, failing = RecordingStrategy(), RecordingStrategy(), RecordingStrategy(fail=True)
+    host.add_strategy(first, name='first')
+    host.add_strategy(second, name='second')
+    context = host.add_strategy(failing, name='failing')
+    host.start()
+    assert wait_until(lambda: host.bars == 10)
+    expected = bars['EUR']['DateTime'].iloc[720:].tolist()
+    assert first.bars == second.bars == failing.bars == expected
+    assert host.stats()['dispatches'] == 30
+    assert context.errors == 10
+
+
+def test_orders_are_attributed_to_their_strategy(host):
+    host.load_history()
+    buyer = RecordingStrategy(order=('buy', 1000))
+    seller = RecordingStrategy(order=('sell', 400))
+    host.add_strategy(buyer, name='buyer')
+    host.add_strategy(seller, name='seller')
+    host.start()
+    assert wait_until(lambda: buyer.done == ['Filled'] and seller.done == ['Filled'])
+    strategies = host.stats()['strategies']
+    assert strategies['buyer']['position'] == 1000 and strategies['seller']['position'] == -400
+    assert strategies['buyer']['orders'] == 1 and strategies['buyer']['open_orders'] == 0
+
+
+def test_names_and_symbols_are_checked(host):
+    host.add_strategy(RecordingStrategy(), name='first')
+    with pytest.raises(ValueError):
+        host.add_strategy(RecordingStrategy(), name='first')
+    with pytest.raises(ValueError):
+        host.add_strategy(RecordingStrategy('GBP'))
+    host.remove_strategy('first')
+    assert host.contexts() == []
+    assert host.add_strategy(RecordingStrategy()).name == 'RecordingStrategy-1'
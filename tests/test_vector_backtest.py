@@ -0,0 +1,28 @@
+"""
+Author: Rosenyoung
+VectorBacktest must give the same result as the backtrader SmaStrategy of MA_Backtesting_Sample.
+
+Version 1.0 2026-10-18
+"""
+
+import pytest
+
+from common import make_bars
+
+pytest.importorskip('backtrader')
+
+from VectorBacktest import compare_with_backtrader, sweep
+
+
+def test_final_value_matches_backtrader():
+    df = make_bars('EUR', 3000, 1_700_000_000, seed=7)
+    result = compare_with_backtrader(df, short_window=10, long_window=60)
+    assert result['vectorized_trades'] > 0
+    assert result['vectorized_value'] == pytest.approx(result['backtrader_value'], abs=1e-6)
+
+
+def test_sweep_reports_every_pair():
+    df = make_bars('EUR', 3000, 1_700_000_000, seed=7)
+    results = sweep(df, [5, 10], [30, 60, 90])
+    assert len(results) == 6
+    assert {'pnl', 'trades', 'max_drawdown', 'final_value'} <= set(results.columns)